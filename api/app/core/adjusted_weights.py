@@ -0,0 +1,193 @@
+"""Pesos ajustados para idade padrão (60, 120 e 180 dias).
+
+Todas as pesagens de um rebanho são carregadas em arrays colunares (animal,
+idade em dias, peso), ordenados por animal e idade. O peso em cada idade alvo
+é obtido de uma vez para todos os animais: interpolação linear entre as duas
+pesagens que cercam a idade ou, fora do intervalo pesado, extrapolação pela
+taxa de ganho das duas pesagens mais próximas, limitada a
+MAX_EXTRAPOLATION_DAYS. Idades que continuam sem peso são completadas, se o
+animal já as atingiu, pela curva de crescimento gravada (app.core.growth_curves).
+Os resultados são gravados com um upsert em lote em
+`AnimalGeneticEvaluation.adjusted_weight_60d/120d/180d`.
+"""
+
+from datetime import date, datetime
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlmodel import Session, select
+
+from app.core import growth_models
+from app.core.db import bulk_upsert
+from app.models.animal import Animal
+from app.models.animal_measurements import WeightRecord
+from app.models.mating import AnimalGeneticEvaluation
+
+ADJUSTMENT_AGES = (60, 120, 180)
+# Distância máxima (dias) entre a idade alvo e a pesagem mais próxima para extrapolar
+MAX_EXTRAPOLATION_DAYS = 60
+
+
+def load_weight_columns(session: Session, *filters) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Pesagens dos animais filtrados em arrays: (ids dos animais, índice do animal, idade em dias, peso)"""
+    rows = session.exec(
+        select(WeightRecord.animal_id, Animal.birth_date, WeightRecord.measurement_date, WeightRecord.weight)
+        .join(Animal, Animal.id == WeightRecord.animal_id)
+        .where(*filters)
+    ).all()
+    if not rows:
+        empty = np.zeros(0)
+        return empty.astype(np.int64), empty.astype(np.int64), empty, empty
+    animal_id, birth_date, measurement_date, weight = zip(*rows)
+    age = np.array([m.toordinal() for m in measurement_date]) - np.array([b.toordinal() for b in birth_date])
+    ids, index = np.unique(np.array(animal_id, dtype=np.int64), return_inverse=True)
+    return ids, index, age.astype(float), np.array(weight, dtype=float)
+
+
+def standardized_weights(
+    index: np.ndarray,
+    age: np.ndarray,
+    weight: np.ndarray,
+    n_animals: int,
+    target_ages: Sequence[int] = ADJUSTMENT_AGES,
+) -> np.ndarray:
+    """Peso de cada animal em cada idade alvo (n_animals × len(target_ages)); NaN quando não estimável"""
+    result = np.full((n_animals, len(target_ages)), np.nan)
+    valid = age >= 0  # pesagens anteriores ao nascimento são erro de cadastro
+    index, age, weight = index[valid], age[valid], weight[valid]
+    if index.size == 0:
+        return result
+
+    order = np.lexsort((age, index))
+    index, age, weight = index[order], age[order], weight[order]
+    span = age.max() + max(target_ages) + 1
+    key = index * span + age
+    counts = np.bincount(index, minlength=n_animals)
+    end = np.cumsum(counts)
+    start = end - counts
+    animals = np.arange(n_animals)
+
+    def rate(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """Ganho diário entre as pesagens a e b (NaN se forem do mesmo dia)"""
+        days = age[b] - age[a]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(days > 0, (weight[b] - weight[a]) / days, np.nan)
+
+    for k, target in enumerate(target_ages):
+        # Primeira pesagem com idade >= alvo, dentro do bloco de cada animal
+        hi = np.searchsorted(key, animals * span + target)
+        has_hi = hi < end
+        has_lo = hi > start
+        hi_c = np.minimum(hi, len(age) - 1)
+        lo_c = np.maximum(hi - 1, 0)
+        values = np.full(n_animals, np.nan)
+
+        # Interpolação entre as pesagens que cercam a idade alvo (ou pesagem exata)
+        inner = has_hi & has_lo
+        values[inner] = weight[lo_c[inner]] + rate(lo_c[inner], hi_c[inner]) * (target - age[lo_c[inner]])
+        exact = has_hi & (age[hi_c] == target)
+        values[exact] = weight[hi_c[exact]]
+
+        # Alvo antes da primeira pesagem: taxa das duas primeiras
+        before = has_hi & ~has_lo & ~exact & (hi + 1 < end) & (age[hi_c] - target <= MAX_EXTRAPOLATION_DAYS)
+        nxt = np.minimum(hi_c + 1, len(age) - 1)
+        values[before] = weight[hi_c[before]] - rate(hi_c[before], nxt[before]) * (age[hi_c[before]] - target)
+
+        # Alvo depois da última pesagem: taxa das duas últimas
+        after = ~has_hi & has_lo & (hi - 2 >= start) & (target - age[lo_c] <= MAX_EXTRAPOLATION_DAYS)
+        prv = np.maximum(lo_c - 1, 0)
+        values[after] = weight[lo_c[after]] + rate(prv[after], lo_c[after]) * (target - age[lo_c[after]])
+
+        values[~(values > 0)] = np.nan
+        result[:, k] = values
+    return result
+
+
+def fill_from_curves(
+    session: Session,
+    ids: np.ndarray,
+    matrix: np.ndarray,
+    curves: Dict[int, Tuple[str, growth_models.CurveParameters]],
+    target_ages: Sequence[int] = ADJUSTMENT_AGES,
+) -> None:
+    """Completa as idades sem peso pela curva de crescimento do animal, se ele já atingiu a idade"""
+    gaps = [i for i in np.flatnonzero(np.isnan(matrix).any(axis=1)) if int(ids[i]) in curves]
+    if not gaps:
+        return
+    today = date.today()
+    birth_dates = dict(session.exec(
+        select(Animal.id, Animal.birth_date).where(Animal.id.in_([int(ids[i]) for i in gaps]))
+    ).all())
+    for i in gaps:
+        animal_id = int(ids[i])
+        _, curve = curves[animal_id]
+        age_today = (today - birth_dates[animal_id]).days
+        predicted = growth_models.curve(
+            curve.model, np.array(target_ages, dtype=float), curve.asymptotic_weight,
+            curve.integration_constant, curve.maturity_rate,
+        )
+        missing = np.isnan(matrix[i]) & (np.array(target_ages) <= age_today)
+        matrix[i, missing] = predicted[missing]
+
+
+def compute_herd_adjusted_weights(
+    session: Session,
+    herd_id: str,
+    animal_ids: Optional[Iterable[int]] = None,
+    curves: Optional[Dict[int, Tuple[str, growth_models.CurveParameters]]] = None,
+) -> Dict[int, Tuple[float, ...]]:
+    """Pesos ajustados (60/120/180 dias) dos animais ativos do rebanho, em uma passada vetorizada.
+
+    `animal_ids` restringe o cálculo a parte do rebanho (reavaliação incremental);
+    `curves` ({animal_id: (tipo, parâmetros)}) completa as idades não estimáveis.
+    """
+    filters = [Animal.herd_id == herd_id, Animal.status == "ativo"]
+    if animal_ids is not None:
+        filters.append(Animal.id.in_(list(animal_ids)))
+    ids, index, age, weight = load_weight_columns(session, *filters)
+    matrix = standardized_weights(index, age, weight, len(ids))
+    if curves:
+        fill_from_curves(session, ids, matrix, curves)
+    matrix = np.round(matrix, 2)
+    return {
+        int(animal_id): tuple(None if np.isnan(v) else float(v) for v in row)
+        for animal_id, row in zip(ids, matrix)
+    }
+
+
+def persist_adjusted_weights(session: Session, herd_id: str, weights: Dict[int, Tuple[float, ...]]) -> None:
+    """Grava os pesos ajustados com um upsert em lote, criando a avaliação dos animais que ainda não têm.
+
+    Não faz commit: a gravação entra na mesma transação da avaliação.
+    """
+    if not weights:
+        return
+    columns = [f"adjusted_weight_{days}d" for days in ADJUSTMENT_AGES]
+    now = datetime.utcnow()
+    rows = [
+        {
+            "animal_id": animal_id,
+            "herd_id": herd_id,
+            "inbreeding_coefficient": 0.0,
+            "number_of_offspring": 0,
+            "last_evaluation_date": date.today(),
+            "created_at": now,
+            "updated_at": now,
+            **dict(zip(columns, values)),
+        }
+        for animal_id, values in weights.items()
+    ]
+    # Avaliações existentes só têm os pesos ajustados atualizados
+    bulk_upsert(session, AnimalGeneticEvaluation, rows, ["animal_id"], columns + ["updated_at"])
+
+
+def update_herd_adjusted_weights(
+    session: Session,
+    herd_id: str,
+    animal_ids: Optional[Iterable[int]] = None,
+    curves: Optional[Dict[int, Tuple[str, growth_models.CurveParameters]]] = None,
+) -> Dict[int, Tuple[float, ...]]:
+    """Calcula e grava os pesos ajustados do rebanho; retorna {animal_id: (60d, 120d, 180d)}"""
+    weights = compute_herd_adjusted_weights(session, herd_id, animal_ids, curves)
+    persist_adjusted_weights(session, herd_id, weights)
+    return weights
@@ -37,10 +37,59 @@ def init_db() -> None:
         events,
     )
     SQLModel.metadata.create_all(engine)
+    add_missing_columns()
     
     # Criar índices para otimização
     create_performance_indexes()
 
+def add_missing_columns():
+    """
+    Adiciona em tabelas já existentes as colunas novas dos modelos.
+    create_all só cria tabelas inexistentes; colunas novas com valor padrão
+    escalar recebem esse valor nas linhas antigas.
+    """
+    from sqlalchemy import inspect
+    
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as connection:
+        for table in SQLModel.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+                default = column.default.arg if column.default is not None and column.default.is_scalar else None
+                if isinstance(default, bool):
+                    ddl += f" DEFAULT {int(default)}"
+                elif isinstance(default, (int, float)):
+                    ddl += f" DEFAULT {default}"
+                elif isinstance(default, str):
+                    ddl += " DEFAULT '" + default.replace("'", "''") + "'"
+                connection.execute(text(ddl))
+
+def bulk_upsert(session: Session, model, rows: list, index_elements: list, update_columns: list) -> None:
+    """
+    INSERT ... ON CONFLICT (index_elements) DO UPDATE em lote (PostgreSQL e SQLite).
+    Executado como um único comando com executemany; não faz commit.
+    """
+    if not rows:
+        return
+    if session.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    # Insert do Core (tabela), para não ser quebrado em grupos pelo bulk insert do ORM
+    statement = insert(model.__table__)
+    statement = statement.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={column: statement.excluded[column] for column in update_columns},
+    )
+    session.execute(statement, rows)
+
 # Cache global para propriedades do usuário (evita queries repetidas)
 _user_properties_cache = {}
 
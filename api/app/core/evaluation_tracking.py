@@ -0,0 +1,120 @@
+"""Rastreamento de animais com avaliação genética desatualizada.
+
+Cada `AnimalGeneticEvaluation` guarda o momento da última avaliação
+(`evaluated_at`) e os parâmetros usados (`evaluation_settings`). Um animal
+precisa ser reavaliado quando:
+
+- nunca foi avaliado;
+- foi marcado por `mark_for_reevaluation` (pesagem alterada/excluída,
+  genealogia editada, manejo reprodutivo alterado ou excluído);
+- a avaliação anterior usou outro método, herdabilidade ou idade de ajuste;
+- recebeu pesagens novas depois da avaliação;
+- ganhou crias (manejo reprodutivo ou animal com ele como pai/mãe) depois da avaliação.
+
+Inclusões são detectadas pelo `created_at` dos registros; alterações e
+exclusões precisam ser marcadas explicitamente pelos routers, como já é feito
+com a endogamia (`invalidate_inbreeding`).
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Sequence, Set
+
+from sqlalchemy import update
+from sqlmodel import Session, func, or_, select
+
+from app.core.pedigree_index import get_pedigree_index
+from app.models.animal import Animal
+from app.models.animal_measurements import WeightRecord
+from app.models.mating import AnimalGeneticEvaluation
+from app.models.reproductive_management import ReproductiveManagement
+
+REASONS = ("not_evaluated", "marked", "settings_changed", "new_weights", "new_offspring")
+
+
+def evaluation_settings(method: str, heritability: float, weight_adjustment_days: int) -> str:
+    """Assinatura dos parâmetros de uma avaliação"""
+    return f"{method};{heritability:g};{weight_adjustment_days}"
+
+
+def mark_for_reevaluation(session: Session, animal_ids: Iterable[Optional[int]]) -> None:
+    """Marca os animais para a próxima avaliação incremental (não faz commit)"""
+    animal_ids = [a for a in set(animal_ids) if a is not None]
+    if animal_ids:
+        session.exec(
+            update(AnimalGeneticEvaluation)
+            .where(AnimalGeneticEvaluation.animal_id.in_(animal_ids))
+            .values(evaluated_at=None)
+        )
+
+
+def pending_evaluation(session: Session, animals: Sequence[Animal], settings: str) -> Dict[str, Set[int]]:
+    """Animais que precisam ser reavaliados, agrupados pelo motivo (ver REASONS)"""
+    ids = [a.id for a in animals]
+    evaluated: Dict[int, datetime] = {}
+    reasons: Dict[str, Set[int]] = {reason: set() for reason in REASONS}
+    rows = session.exec(
+        select(AnimalGeneticEvaluation.animal_id, AnimalGeneticEvaluation.evaluated_at,
+               AnimalGeneticEvaluation.evaluation_settings)
+        .where(AnimalGeneticEvaluation.animal_id.in_(ids))
+    ).all()
+    for animal_id, evaluated_at, previous_settings in rows:
+        if evaluated_at is None:
+            if previous_settings is not None:
+                reasons["marked"].add(animal_id)
+            continue
+        if previous_settings != settings:
+            reasons["settings_changed"].add(animal_id)
+        else:
+            evaluated[animal_id] = evaluated_at
+    reasons["not_evaluated"] = {
+        a for a in ids if a not in evaluated and a not in reasons["settings_changed"] and a not in reasons["marked"]
+    }
+    if not evaluated:
+        return reasons
+
+    tracked = list(evaluated)
+    oldest = min(evaluated.values())
+
+    # Pesagens incluídas depois da avaliação
+    for animal_id, created_at in session.exec(
+        select(WeightRecord.animal_id, func.max(WeightRecord.created_at))
+        .where(WeightRecord.animal_id.in_(tracked))
+        .where(WeightRecord.created_at > oldest)
+        .group_by(WeightRecord.animal_id)
+    ).all():
+        if created_at > evaluated[animal_id]:
+            reasons["new_weights"].add(animal_id)
+
+    # Crias novas: manejos reprodutivos e animais cadastrados com o animal como pai/mãe
+    births = session.exec(
+        select(ReproductiveManagement.sire_id, ReproductiveManagement.dam_id, ReproductiveManagement.created_at)
+        .where(ReproductiveManagement.created_at > oldest)
+        .where(or_(ReproductiveManagement.sire_id.in_(tracked), ReproductiveManagement.dam_id.in_(tracked)))
+    ).all()
+    births += session.exec(
+        select(Animal.father_id, Animal.mother_id, Animal.created_at)
+        .where(Animal.created_at > oldest)
+        .where(or_(Animal.father_id.in_(tracked), Animal.mother_id.in_(tracked)))
+    ).all()
+    for sire_id, dam_id, created_at in births:
+        for parent in (sire_id, dam_id):
+            if parent in evaluated and created_at > evaluated[parent]:
+                reasons["new_offspring"].add(parent)
+    return reasons
+
+
+def with_relatives(session: Session, animals: Sequence[Animal], animal_ids: Set[int]) -> Set[int]:
+    """Os animais informados mais seus pais e filhos, restritos ao conjunto `animals`"""
+    if not animal_ids:
+        return set()
+    candidates = {a.id for a in animals}
+    result = set(animal_ids)
+    for animal in animals:
+        if animal.id in animal_ids:
+            result.update(p for p in (animal.father_id, animal.mother_id) if p in candidates)
+    # Filhos pelo índice da genealogia em memória
+    for property_id in {a.property_id for a in animals if a.id in animal_ids}:
+        index = get_pedigree_index(session, property_id)
+        for animal_id in animal_ids:
+            result.update(index.offspring_ids(animal_id))
+    return result & candidates
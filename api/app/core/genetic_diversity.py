@@ -0,0 +1,209 @@
+"""Diversidade genética do rebanho a partir da genealogia.
+
+Todos os indicadores saem de passadas vetorizadas sobre os arrays da
+genealogia (`app.core.pedigree.Pedigree`), geração a geração, sem laços por par
+de animais:
+
+- Gerações completas equivalentes (t): soma de (1/2)^g sobre os ancestrais
+  conhecidos, t_i = ½·[(1 + t_pai) + (1 + t_mãe)], só para os pais conhecidos
+- Taxa de endogamia individual: ΔF_i = 1 - (1 - F_i)^(1/(t_i - 1)) (Gutiérrez et
+  al., 2009), para animais com t > 1; tamanho efetivo Ne = 1 / (2·ΔF médio)
+- Coancestria média da população de referência: x'Ax / 2 com x = 1/n nos
+  animais (método indireto de Colleau, na tabela de parentesco em cache da
+  propriedade, app.core.kinship, que também fornece a genealogia e a endogamia)
+- Equivalentes genômicos dos fundadores: f_g = 1 / (2·coancestria média)
+- Número efetivo de fundadores: f_e = 1 / Σ p_k², com p_k a contribuição
+  esperada do fundador k à população de referência (pai ou mãe desconhecido
+  conta como meia contribuição do próprio animal)
+- Índice de completude da genealogia (MacCluer et al., 1983) em
+  PEDIGREE_COMPLETENESS_GENERATIONS gerações: 2·C_pai·C_mãe / (C_pai + C_mãe),
+  com C a média, por geração, da fração de ancestrais conhecidos daquele lado
+
+A população de referência são os animais ativos do rebanho (ou da
+propriedade); a tabela por ano de nascimento inclui todos os animais. Os
+resultados ficam em cache pela versão dos dados dos rebanhos
+(app.core.herd_versions).
+"""
+
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from sqlmodel import Session, select
+
+from app.core.breeding_simulation import census_effective_size
+from app.core.kinship import get_kinship
+from app.core.pedigree import Pedigree
+from app.models.animal import Animal
+from app.models.farm import Herd
+
+PEDIGREE_COMPLETENESS_GENERATIONS = 5
+
+
+def equivalent_generations(pedigree: Pedigree) -> np.ndarray:
+    """Gerações completas equivalentes de cada posição da genealogia (posição 0 = desconhecido)"""
+    sire, dam = pedigree.sire, pedigree.dam
+    t = np.zeros(len(pedigree.ids))
+    for rows in pedigree.levels():
+        s, d = sire[rows], dam[rows]
+        t[rows] = 0.5 * ((s > 0) * (1.0 + t[s]) + (d > 0) * (1.0 + t[d]))
+    return t
+
+
+def pedigree_completeness(pedigree: Pedigree, generations: int = PEDIGREE_COMPLETENESS_GENERATIONS) -> np.ndarray:
+    """Índice de completude de MacCluer (0-1) de cada posição da genealogia"""
+    sire, dam = pedigree.sire, pedigree.dam
+    # known[i, g]: fração de ancestrais conhecidos do animal i na geração g (g = 0: o próprio animal)
+    known = np.zeros((len(pedigree.ids), generations))
+    for rows in pedigree.levels():
+        known[rows, 0] = 1.0
+        known[rows, 1:] = 0.5 * (known[sire[rows], :-1] + known[dam[rows], :-1])
+    paternal = known[sire].mean(axis=1)
+    maternal = known[dam].mean(axis=1)
+    total = paternal + maternal
+    return np.divide(2.0 * paternal * maternal, total, out=np.zeros_like(total), where=total > 0)
+
+
+def founder_contributions(pedigree: Pedigree, positions: np.ndarray) -> np.ndarray:
+    """Contribuição genética esperada de cada fundador à população de referência (soma 1)"""
+    sire, dam = pedigree.sire, pedigree.dam
+    q = np.zeros(len(pedigree.ids))
+    if len(positions) == 0:
+        return q
+    np.add.at(q, positions, 1.0 / len(positions))
+    # Dos mais novos para os mais antigos, cada animal passa metade do que recebeu a cada pai
+    for rows in reversed(pedigree.levels()):
+        half = 0.5 * q[rows]
+        np.add.at(q, sire[rows], half)
+        np.add.at(q, dam[rows], half)
+    # A metade enviada a um pai desconhecido fica com o animal, como fundador
+    contributions = 0.5 * q * ((sire == 0).astype(float) + (dam == 0))
+    contributions[0] = 0.0
+    return contributions
+
+
+def _rate_of_inbreeding(F: np.ndarray, t: np.ndarray) -> np.ndarray:
+    """ΔF individual (NaN para animais com t <= 1, sem gerações suficientes)"""
+    delta = np.full(len(F), np.nan)
+    deep = t > 1.0
+    delta[deep] = 1.0 - (1.0 - F[deep]) ** (1.0 / (t[deep] - 1.0))
+    return delta
+
+
+def _percent(value: float, digits: int = 3) -> Optional[float]:
+    return round(float(value) * 100, digits) if np.isfinite(value) else None
+
+
+def compute_diversity(session: Session, property_id: str, herd_id: Optional[str] = None) -> Dict:
+    """Indicadores de diversidade do rebanho (ou da propriedade inteira, sem herd_id)"""
+    kinship = get_kinship(session, property_id)
+    pedigree, F = kinship.pedigree, kinship.inbreeding
+    statement = select(Animal.id, Animal.gender, Animal.status, Animal.birth_date).where(
+        Animal.property_id == property_id
+    )
+    if herd_id is not None:
+        statement = statement.where(Animal.herd_id == herd_id)
+    position = pedigree.position
+    # Animais incluídos depois do parentesco em cache ficam de fora até a próxima carga
+    animals = [row for row in session.exec(statement).all() if row.id in position]
+
+    positions = np.array([position[row.id] for row in animals], dtype=np.int64)
+    active = np.array([row.status == "ativo" for row in animals], dtype=bool)
+    male = np.array([row.gender == "M" for row in animals], dtype=bool)
+    years = np.array([row.birth_date.year for row in animals], dtype=np.int64)
+
+    t = equivalent_generations(pedigree)
+    completeness = pedigree_completeness(pedigree)
+    delta = _rate_of_inbreeding(F, t)
+
+    reference = positions[active]
+    contributions = founder_contributions(pedigree, reference)
+    mean_coancestry = 0.5 * kinship.mean_relationship(reference)
+    reference_delta = delta[reference]
+    rate = np.nanmean(reference_delta) if np.isfinite(reference_delta).any() else np.nan
+
+    result = {
+        "reference_animals": int(len(reference)),
+        "mean_inbreeding": _percent(F[reference].mean()) if len(reference) else None,
+        "mean_coancestry": _percent(mean_coancestry) if len(reference) else None,
+        "rate_of_inbreeding": _percent(rate),
+        "effective_size": round(float(1.0 / (2.0 * rate)), 1) if np.isfinite(rate) and rate > 0 else None,
+        "census_effective_size": census_effective_size(
+            int((active & male).sum()), int((active & ~male).sum())
+        ),
+        "founders": int(np.count_nonzero(contributions)),
+        "effective_founders": round(float(1.0 / (contributions ** 2).sum()), 1) if len(reference) else None,
+        "founder_genome_equivalents": (
+            round(float(1.0 / (2.0 * mean_coancestry)), 1) if mean_coancestry > 0 else None
+        ),
+        "mean_equivalent_generations": round(float(t[reference].mean()), 2) if len(reference) else None,
+        "mean_pedigree_completeness": _percent(completeness[reference].mean(), 2) if len(reference) else None,
+    }
+
+    # Por ano de nascimento, com todos os animais (ativos ou não)
+    by_year = []
+    if len(animals):
+        unique_years, group = np.unique(years, return_inverse=True)
+        counts = np.bincount(group)
+        deep = np.isfinite(delta[positions])
+        deep_counts = np.bincount(group, weights=deep, minlength=len(unique_years))
+        sums = {
+            key: np.bincount(group, weights=values, minlength=len(unique_years))
+            for key, values in (
+                ("F", F[positions]),
+                ("t", t[positions]),
+                ("pci", completeness[positions]),
+                ("delta", np.where(deep, delta[positions], 0.0)),
+            )
+        }
+        for k, year in enumerate(unique_years):
+            rate_year = sums["delta"][k] / deep_counts[k] if deep_counts[k] else np.nan
+            by_year.append({
+                "year": int(year),
+                "animals": int(counts[k]),
+                "mean_inbreeding": _percent(sums["F"][k] / counts[k]),
+                "rate_of_inbreeding": _percent(rate_year),
+                "mean_equivalent_generations": round(float(sums["t"][k] / counts[k]), 2),
+                "pedigree_completeness": _percent(sums["pci"][k] / counts[k], 2),
+            })
+    result["by_birth_year"] = by_year
+    return result
+
+
+# Relatórios em cache: ("herd" | "property", id) -> (versão dos dados, resultado)
+_diversity_cache: Dict[Tuple[str, str], Tuple[Tuple, Dict]] = {}
+_diversity_cache_lock = threading.Lock()
+
+
+def _cached(key: Tuple[str, str], version: Tuple, compute) -> Dict:
+    with _diversity_cache_lock:
+        cached = _diversity_cache.get(key)
+    if cached is not None and cached[0] == version:
+        return {**cached[1], "cached": True}
+    result = compute()
+    with _diversity_cache_lock:
+        _diversity_cache[key] = (version, result)
+    return {**result, "cached": False}
+
+
+def _property_versions(session: Session, property_id: str) -> Tuple:
+    """Versão dos dados de cada rebanho da propriedade, que compartilham a genealogia"""
+    return tuple(tuple(row) for row in session.exec(
+        select(Herd.id, Herd.data_version).where(Herd.property_id == property_id).order_by(Herd.id)
+    ).all())
+
+
+def get_herd_diversity(session: Session, herd: Herd) -> Dict:
+    """Diversidade do rebanho, recalculada quando a versão de algum rebanho da propriedade muda.
+
+    A endogamia e os ancestrais vêm da genealogia da propriedade inteira, então
+    um pai ou avô em outro rebanho também altera o resultado.
+    """
+    version = _property_versions(session, herd.property_id)
+    return _cached(("herd", herd.id), version, lambda: compute_diversity(session, herd.property_id, herd.id))
+
+
+def get_property_diversity(session: Session, property_id: str) -> Dict:
+    """Diversidade da propriedade, recalculada quando a versão de algum dos seus rebanhos muda"""
+    version = _property_versions(session, property_id)
+    return _cached(("property", property_id), version, lambda: compute_diversity(session, property_id))
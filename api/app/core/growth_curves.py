@@ -0,0 +1,272 @@
+"""Curvas de crescimento por animal e por rebanho.
+
+Os modelos e o ajuste estão em `app.core.growth_models`. Tipos de curva:
+
+- `individual`: animais ativos com pelo menos MIN_WEIGHINGS pesagens cobrindo
+  MIN_SPAN_DAYS dias, ajustados pelos três modelos (fica o de menor erro);
+- `herd_scaled`: demais animais com pesagens (ou com ajuste individual
+  rejeitado): forma da curva do rebanho do mesmo sexo, com o peso adulto
+  reescalado às pesagens do animal em forma fechada;
+- `herd`: uma curva por rebanho e sexo com todas as pesagens do rebanho, usada
+  para os animais sem pesagens.
+
+Só são reajustados os animais cujas pesagens mudaram desde o último ajuste
+(número de pesagens ou última inclusão/alteração); lotes grandes vão para o
+pool de processos de `nsga2`. Os parâmetros ficam em `growth_curve` e em
+memória por versão dos dados do rebanho (app.core.herd_versions), de modo que o
+peso previsto em qualquer idade é só a avaliação da fórmula.
+"""
+
+import math
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlmodel import Session, delete, func, select
+
+from app.core import growth_models
+from app.core.db import bulk_upsert
+from app.core.growth_models import CurveParameters
+from app.core.herd_versions import herd_data_version
+from app.models.animal import Animal
+from app.models.animal_measurements import WeightRecord
+from app.models.mating import GrowthCurve
+
+# Pesagens e intervalo de idades mínimos para o ajuste individual
+MIN_WEIGHINGS = 4
+MIN_SPAN_DAYS = 180
+# Animais a reajustar a partir dos quais o ajuste vai para o pool de processos
+PARALLEL_MIN_ANIMALS = 2000
+PARALLEL_BATCH_SIZE = 500
+
+CURVE_COLUMNS = [
+    "herd_id", "gender", "model", "source", "asymptotic_weight", "integration_constant",
+    "maturity_rate", "rmse", "weights_count", "weights_updated_at", "fitted_at", "updated_at",
+]
+
+
+def _weighings(session: Session, *filters) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    """Pesagens (idade em dias, peso) por animal, em uma consulta; pesagens antes do nascimento são ignoradas"""
+    rows = session.exec(
+        select(WeightRecord.animal_id, Animal.birth_date, WeightRecord.measurement_date, WeightRecord.weight)
+        .join(Animal, Animal.id == WeightRecord.animal_id)
+        .where(*filters)
+        .order_by(WeightRecord.animal_id)
+    ).all()
+    result: Dict[int, Tuple[List[float], List[float]]] = {}
+    for animal_id, birth_date, measurement_date, weight in rows:
+        age = (measurement_date - birth_date).days
+        if age >= 0:
+            ages, weights = result.setdefault(animal_id, ([], []))
+            ages.append(float(age))
+            weights.append(float(weight))
+    return {a: (np.array(ages), np.array(weights)) for a, (ages, weights) in result.items()}
+
+
+def _fit(batch: List[Tuple[int, np.ndarray, np.ndarray]], executor=None) -> Dict[int, Optional[CurveParameters]]:
+    """Ajuste individual do lote, no pool de processos quando o lote é grande"""
+    if executor is None or len(batch) < PARALLEL_MIN_ANIMALS:
+        return dict(growth_models.fit_animals(batch))
+    chunks = max(os.cpu_count() or 1, math.ceil(len(batch) / PARALLEL_BATCH_SIZE))
+    size = math.ceil(len(batch) / chunks)
+    futures = [executor.submit(growth_models.fit_animals, batch[i:i + size]) for i in range(0, len(batch), size)]
+    try:
+        return {animal_id: fit for future in futures for animal_id, fit in future.result()}
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def _parameters(row) -> CurveParameters:
+    return CurveParameters(row.model, row.asymptotic_weight, row.integration_constant, row.maturity_rate, row.rmse)
+
+
+def update_growth_curves(session: Session, herd_id: str, full: bool = False, executor=None) -> Dict[str, int]:
+    """Reajusta as curvas do rebanho cujas pesagens mudaram (todas com full=True); retorna as quantidades"""
+    now = datetime.utcnow()
+    written = False
+
+    # Curvas do rebanho por sexo, com as pesagens de todos os animais do rebanho
+    herd_rows = {
+        row.gender: row for row in session.exec(
+            select(GrowthCurve).where(GrowthCurve.herd_id == herd_id).where(GrowthCurve.animal_id.is_(None))
+        ).all()
+    }
+    herd_curves = {gender: _parameters(row) for gender, row in herd_rows.items()}
+    refit_genders = set()
+    for gender, count, updated_at in session.exec(
+        select(Animal.gender, func.count(WeightRecord.id), func.max(WeightRecord.updated_at))
+        .join(WeightRecord, WeightRecord.animal_id == Animal.id)
+        .where(Animal.herd_id == herd_id)
+        .group_by(Animal.gender)
+    ).all():
+        stored = herd_rows.get(gender)
+        if not full and stored is not None and (stored.weights_count, stored.weights_updated_at) == (count, updated_at):
+            continue
+        refit_genders.add(gender)
+        series = _weighings(session, Animal.herd_id == herd_id, Animal.gender == gender)
+        age = np.concatenate([ages for ages, _ in series.values()]) if series else np.zeros(0)
+        weight = np.concatenate([weights for _, weights in series.values()]) if series else np.zeros(0)
+        fit = growth_models.fit_curve(age, weight) if len(age) >= MIN_WEIGHINGS else None
+        session.exec(
+            delete(GrowthCurve)
+            .where(GrowthCurve.herd_id == herd_id)
+            .where(GrowthCurve.animal_id.is_(None))
+            .where(GrowthCurve.gender == gender)
+        )
+        herd_curves.pop(gender, None)
+        if fit is not None:
+            herd_curves[gender] = fit
+            session.add(GrowthCurve(
+                herd_id=herd_id, gender=gender, model=fit.model, source="herd",
+                asymptotic_weight=fit.asymptotic_weight, integration_constant=fit.integration_constant,
+                maturity_rate=fit.maturity_rate, rmse=fit.rmse, weights_count=count,
+                weights_updated_at=updated_at, fitted_at=now,
+            ))
+        written = True
+
+    # Animais ativos com pesagens alteradas desde o último ajuste
+    stored = {
+        animal_id: (count, updated_at, source)
+        for animal_id, count, updated_at, source in session.exec(
+            select(GrowthCurve.animal_id, GrowthCurve.weights_count, GrowthCurve.weights_updated_at, GrowthCurve.source)
+            .join(Animal, Animal.id == GrowthCurve.animal_id)
+            .where(Animal.herd_id == herd_id)
+        ).all()
+    }
+    signatures = session.exec(
+        select(Animal.id, Animal.gender, func.count(WeightRecord.id), func.max(WeightRecord.updated_at))
+        .join(WeightRecord, WeightRecord.animal_id == Animal.id)
+        .where(Animal.herd_id == herd_id)
+        .where(Animal.status == "ativo")
+        .group_by(Animal.id, Animal.gender)
+    ).all()
+    gender_of = {}
+    stale = set()
+    for animal_id, gender, count, updated_at in signatures:
+        gender_of[animal_id] = gender
+        previous = stored.get(animal_id)
+        if (
+            full or previous is None or previous[:2] != (count, updated_at)
+            or (previous[2] == "herd_scaled" and gender in refit_genders)
+        ):
+            stale.add(animal_id)
+    signature_of = {animal_id: (count, updated_at) for animal_id, _, count, updated_at in signatures}
+    # Animais que ficaram sem pesagens (ou deixaram de estar ativos) passam a usar a curva do rebanho
+    removed = [animal_id for animal_id in stored if animal_id not in signature_of]
+    if removed:
+        session.exec(delete(GrowthCurve).where(GrowthCurve.animal_id.in_(removed)))
+        written = True
+
+    counts = {"individual": 0, "herd_scaled": 0, "not_fitted": 0}
+    if stale:
+        series = {
+            animal_id: values
+            for animal_id, values in _weighings(session, Animal.herd_id == herd_id, Animal.status == "ativo").items()
+            if animal_id in stale
+        }
+        candidates = [
+            (animal_id, ages, weights) for animal_id, (ages, weights) in series.items()
+            if len(ages) >= MIN_WEIGHINGS and ages.max() - ages.min() >= MIN_SPAN_DAYS
+        ]
+        fits = _fit(candidates, executor)
+        rows = []
+        for animal_id, (ages, weights) in series.items():
+            fit, source = fits.get(animal_id), "individual"
+            if fit is None and gender_of[animal_id] in herd_curves:
+                fit, source = growth_models.scale_curve(herd_curves[gender_of[animal_id]], ages, weights), "herd_scaled"
+            if fit is None:
+                counts["not_fitted"] += 1
+                continue
+            counts[source] += 1
+            count, updated_at = signature_of[animal_id]
+            rows.append({
+                "animal_id": animal_id,
+                "herd_id": herd_id,
+                "gender": gender_of[animal_id],
+                "model": fit.model,
+                "source": source,
+                "asymptotic_weight": fit.asymptotic_weight,
+                "integration_constant": fit.integration_constant,
+                "maturity_rate": fit.maturity_rate,
+                "rmse": fit.rmse,
+                "weights_count": count,
+                "weights_updated_at": updated_at,
+                "fitted_at": now,
+                "created_at": now,
+                "updated_at": now,
+            })
+        bulk_upsert(session, GrowthCurve, rows, ["animal_id"], CURVE_COLUMNS)
+        written = written or bool(rows)
+    if written:
+        session.commit()
+        with _curves_cache_lock:
+            _curves_cache.pop(herd_id, None)
+    return {
+        **counts,
+        "unchanged": len(signatures) - len(stale),
+        "removed": len(removed),
+        "herd_curves": len(refit_genders),
+    }
+
+
+def load_animal_curves(session: Session, herd_id: str) -> Dict[int, Tuple[str, CurveParameters]]:
+    """Curvas gravadas dos animais do rebanho: {animal_id: (tipo, parâmetros)}, sem reajuste"""
+    return {
+        row.animal_id: (row.source, _parameters(row))
+        for row in session.exec(
+            select(GrowthCurve).join(Animal, Animal.id == GrowthCurve.animal_id).where(Animal.herd_id == herd_id)
+        ).all()
+    }
+
+
+class HerdCurves:
+    """Curvas de um rebanho em memória"""
+
+    def __init__(self, animals: Dict[int, Tuple[str, CurveParameters]], herd: Dict[str, CurveParameters]):
+        self.animals = animals
+        self.herd = herd
+
+    def for_animal(self, animal_id: int, gender: str) -> Tuple[Optional[str], Optional[CurveParameters]]:
+        """Curva do animal ou, se ele não tiver pesagens, a do rebanho para o sexo"""
+        if animal_id in self.animals:
+            return self.animals[animal_id]
+        if gender in self.herd:
+            return "herd", self.herd[gender]
+        return None, None
+
+
+# Curvas por rebanho: herd_id -> (versão dos dados, curvas)
+_curves_cache: Dict[str, Tuple[int, HerdCurves]] = {}
+_curves_cache_lock = threading.Lock()
+
+
+def get_growth_curves(session: Session, herd_id: str, executor=None) -> HerdCurves:
+    """Curvas do rebanho, reajustando só os animais com pesagens novas quando a versão dos dados muda"""
+    version = herd_data_version(session, herd_id)
+    with _curves_cache_lock:
+        cached = _curves_cache.get(herd_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    update_growth_curves(session, herd_id, executor=executor)
+    curves = HerdCurves(
+        load_animal_curves(session, herd_id),
+        {
+            row.gender: _parameters(row) for row in session.exec(
+                select(GrowthCurve).where(GrowthCurve.herd_id == herd_id).where(GrowthCurve.animal_id.is_(None))
+            ).all()
+        },
+    )
+    with _curves_cache_lock:
+        _curves_cache[herd_id] = (version, curves)
+    return curves
+
+
+def predict(curve: CurveParameters, ages: Sequence[float]) -> np.ndarray:
+    """Peso previsto (kg) nas idades informadas (dias)"""
+    return growth_models.curve(
+        curve.model, np.asarray(ages, dtype=float), curve.asymptotic_weight,
+        curve.integration_constant, curve.maturity_rate,
+    )
@@ -0,0 +1,170 @@
+"""Modelos não lineares de crescimento (peso × idade em dias).
+
+- Gompertz: W(t) = A·exp(-b·exp(-k·t))
+- Brody: W(t) = A·(1 - b·exp(-k·t))
+- Logístico: W(t) = A / (1 + b·exp(-k·t))
+
+A é o peso adulto (assíntota), b a constante de integração e k a taxa de
+maturidade (1/dia). Cada conjunto de pesagens é ajustado pelos três modelos
+(Levenberg-Marquardt vetorizado sobre todos os animais do lote, com jacobiano
+analítico) e fica o de menor erro. Ajustes que encostam no limite do peso
+adulto são descartados: com pesagens só da fase inicial a assíntota não é
+estimável.
+
+Assim como `nsga2`, este módulo não importa nada de `app`: `fit_animals` roda
+nos processos filhos (spawn) do pool compartilhado.
+"""
+
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+MODELS = ("gompertz", "brody", "logistic")
+
+# Peso adulto aceito: entre 0,8 e MAX_ASYMPTOTE_RATIO × a maior pesagem
+MAX_ASYMPTOTE_RATIO = 4.0
+# Limites de b por modelo e de k (1/dia)
+B_BOUNDS = {"gompertz": (1e-3, 20.0), "brody": (1e-3, 1.0), "logistic": (1e-3, 500.0)}
+K_BOUNDS = (1e-5, 0.2)
+
+
+class CurveParameters(NamedTuple):
+    """Curva ajustada"""
+    model: str
+    asymptotic_weight: float
+    integration_constant: float
+    maturity_rate: float
+    rmse: float
+
+
+def curve(model: str, age, A: float, b: float, k: float) -> np.ndarray:
+    """Peso previsto nas idades `age` (dias)"""
+    decay = np.exp(-k * np.asarray(age, dtype=float))
+    if model == "gompertz":
+        return A * np.exp(-b * decay)
+    if model == "brody":
+        return A * (1.0 - b * decay)
+    if model == "logistic":
+        return A / (1.0 + b * decay)
+    raise ValueError(f"Modelo desconhecido: {model}")
+
+
+def _jacobian(model: str, t: np.ndarray, A: np.ndarray, b: np.ndarray, k: np.ndarray) -> np.ndarray:
+    """Derivadas parciais de W em relação a (A, b, k); parâmetros por animal (n × 1), idades n × m"""
+    decay = np.exp(-k * t)
+    if model == "gompertz":
+        w = np.exp(-b * decay)
+        return np.stack([w, -A * w * decay, A * w * b * t * decay], axis=-1)
+    if model == "brody":
+        return np.stack([1.0 - b * decay, -A * decay, A * b * t * decay], axis=-1)
+    d = 1.0 + b * decay
+    return np.stack([1.0 / d, -A * decay / d ** 2, A * b * t * decay / d ** 2], axis=-1)
+
+
+def _sse(model: str, t: np.ndarray, w: np.ndarray, mask: np.ndarray, params: np.ndarray) -> np.ndarray:
+    A, b, k = (params[:, j:j + 1] for j in range(3))
+    return (((curve(model, t, A, b, k) - w) * mask) ** 2).sum(axis=1)
+
+
+def fit_model(
+    model: str,
+    t: np.ndarray,
+    w: np.ndarray,
+    mask: np.ndarray,
+    iterations: int = 60,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Ajusta o modelo a todos os animais de uma vez (Levenberg-Marquardt vetorizado).
+
+    `t`, `w` e `mask` são n × m (pesagens de cada animal completadas com mask=0).
+    Parâmetros iniciais: busca em grade de (b, k) com A em forma fechada.
+    Retorna os parâmetros (n × 3, NaN quando o ajuste é rejeitado) e o RMSE.
+    """
+    heaviest = np.where(mask > 0, w, -np.inf).max(axis=1)
+    lower = np.column_stack([0.8 * heaviest, np.full(len(w), B_BOUNDS[model][0]), np.full(len(w), K_BOUNDS[0])])
+    upper = np.column_stack([
+        MAX_ASYMPTOTE_RATIO * heaviest, np.full(len(w), B_BOUNDS[model][1]), np.full(len(w), K_BOUNDS[1])
+    ])
+
+    # Grade de (b, k): para cada par o A ótimo é Σw·f / Σf², com f a curva de A = 1
+    b_grid = np.geomspace(B_BOUNDS[model][0] * 10, B_BOUNDS[model][1] * 0.9, 10)
+    k_grid = np.geomspace(1e-4, 0.05, 12)
+    params = np.zeros((len(w), 3))
+    best = np.full(len(w), np.inf)
+    for b in b_grid:
+        for k in k_grid:
+            unit = curve(model, t, 1.0, b, k) * mask
+            A = np.clip((unit * w).sum(axis=1) / np.maximum((unit * unit).sum(axis=1), 1e-12), lower[:, 0], upper[:, 0])
+            sse = (((A[:, None] * unit) - w * mask) ** 2).sum(axis=1)
+            better = sse < best
+            best[better] = sse[better]
+            params[better] = np.column_stack([A, np.full(len(w), b), np.full(len(w), k)])[better]
+
+    damping = np.full(len(w), 1e-3)
+    for _ in range(iterations):
+        A, b, k = (params[:, j:j + 1] for j in range(3))
+        J = _jacobian(model, t, A, b, k) * mask[:, :, None]
+        residual = (w - curve(model, t, A, b, k)) * mask
+        JTJ = np.einsum("nmi,nmj->nij", J, J)
+        gradient = np.einsum("nmi,nm->ni", J, residual)
+        diagonal = np.einsum("nii->ni", JTJ) + 1e-12
+        system = JTJ + damping[:, None, None] * (diagonal[:, :, None] * np.eye(3))
+        try:
+            step = np.linalg.solve(system, gradient[:, :, None])[:, :, 0]
+        except np.linalg.LinAlgError:
+            break
+        candidate = np.clip(params + step, lower, upper)
+        sse = _sse(model, t, w, mask, candidate)
+        improved = np.isfinite(sse) & (sse < best)
+        params[improved] = candidate[improved]
+        best[improved] = sse[improved]
+        damping = np.where(improved, damping / 3.0, damping * 4.0)
+        if np.all(damping > 1e8):
+            break
+
+    rmse = np.sqrt(best / mask.sum(axis=1))
+    rejected = (params[:, 0] >= 0.999 * upper[:, 0]) | ~np.isfinite(rmse)
+    params[rejected] = np.nan
+    rmse[rejected] = np.nan
+    return params, rmse
+
+
+def _padded(batch: Sequence[Tuple[int, np.ndarray, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Pesagens dos animais em matrizes n × m (m = maior número de pesagens)"""
+    m = max(len(age) for _, age, _ in batch)
+    t = np.zeros((len(batch), m))
+    w = np.zeros((len(batch), m))
+    mask = np.zeros((len(batch), m))
+    for i, (_, age, weight) in enumerate(batch):
+        t[i, :len(age)] = age
+        w[i, :len(age)] = weight
+        mask[i, :len(age)] = 1.0
+    return t, w, mask
+
+
+def fit_animals(batch: Sequence[Tuple[int, np.ndarray, np.ndarray]]) -> List[Tuple[int, Optional[CurveParameters]]]:
+    """Melhor curva (menor RMSE) de cada animal do lote; função de topo para rodar no processo filho"""
+    if not batch:
+        return []
+    t, w, mask = _padded(batch)
+    fits = {model: fit_model(model, t, w, mask) for model in MODELS}
+    result = []
+    for i, (animal_id, _, _) in enumerate(batch):
+        best = None
+        for model, (params, rmse) in fits.items():
+            if np.isfinite(rmse[i]) and (best is None or rmse[i] < best.rmse):
+                best = CurveParameters(model, *(float(p) for p in params[i]), float(rmse[i]))
+        result.append((animal_id, best))
+    return result
+
+
+def fit_curve(age: np.ndarray, weight: np.ndarray) -> Optional[CurveParameters]:
+    """Melhor curva para um conjunto de pesagens (ex.: todas as do rebanho); None se nenhum ajuste for aceitável"""
+    return fit_animals([(0, np.asarray(age, dtype=float), np.asarray(weight, dtype=float))])[0][1]
+
+
+def scale_curve(shape: CurveParameters, age: np.ndarray, weight: np.ndarray) -> CurveParameters:
+    """Curva do rebanho com o peso adulto reescalado às pesagens do animal (mínimos quadrados, forma fechada)"""
+    unit = curve(shape.model, age, 1.0, shape.integration_constant, shape.maturity_rate)
+    A = float(np.dot(unit, weight) / np.dot(unit, unit))
+    rmse = float(np.sqrt(np.mean((A * unit - weight) ** 2)))
+    return CurveParameters(shape.model, A, shape.integration_constant, shape.maturity_rate, rmse)
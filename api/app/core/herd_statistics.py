@@ -0,0 +1,220 @@
+"""Estatísticas de peso materializadas por rebanho.
+
+Para cada rebanho, grupo de contemporâneos (sexo, ano e trimestre de
+nascimento) e período de pesagem, a tabela `herd_weight_statistics` guarda
+número de pesagens, soma e soma dos quadrados dos pesos. As somas são
+atualizadas a cada pesagem incluída, alterada ou excluída, de modo que média e
+variância do rebanho saem de uma consulta pequena, sem varrer as pesagens a
+cada animal avaliado.
+"""
+
+from datetime import date, datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlmodel import Session, delete, func, select
+
+from app.core.db import engine
+from app.models.animal import Animal
+from app.models.animal_measurements import WeightRecord
+from app.models.mating import HerdWeightStatistics
+
+
+class WeightStats(NamedTuple):
+    """Resumo de um conjunto de pesagens"""
+    count: int
+    mean: float
+    variance: float
+
+
+def contemporary_group_key(gender: str, birth_date: date) -> str:
+    """Grupo de contemporâneos dentro do rebanho: sexo, ano e trimestre de nascimento"""
+    return f"{gender}-{birth_date.year}-T{(birth_date.month - 1) // 3 + 1}"
+
+
+def summarize(count: int, total: float, squares: float) -> WeightStats:
+    """Média e variância amostral a partir das somas"""
+    if count <= 0:
+        return WeightStats(0, 0.0, 0.0)
+    mean = total / count
+    variance = max(squares - count * mean * mean, 0.0) / (count - 1) if count > 1 else 0.0
+    return WeightStats(count, mean, variance)
+
+
+def _apply(
+    session: Session,
+    herd_id: Optional[str],
+    group: str,
+    period: str,
+    count: int,
+    total: float,
+    squares: float,
+) -> None:
+    """Soma (ou subtrai, com valores negativos) pesagens à linha do grupo; não faz commit"""
+    if herd_id is None or count == 0:
+        return
+    row = session.exec(
+        select(HerdWeightStatistics)
+        .where(HerdWeightStatistics.herd_id == herd_id)
+        .where(HerdWeightStatistics.contemporary_group == group)
+        .where(HerdWeightStatistics.measurement_period == period)
+    ).first()
+    if row is None:
+        row = HerdWeightStatistics(herd_id=herd_id, contemporary_group=group, measurement_period=period)
+    row.count += count
+    row.weight_sum += total
+    row.weight_sum_squares += squares
+    row.updated_at = datetime.utcnow()
+    if row.count <= 0:
+        if row.id is not None:
+            session.delete(row)
+        return
+    session.add(row)
+
+
+def add_weight(session: Session, animal: Animal, measurement_period: str, weight: float) -> None:
+    """Inclui uma pesagem nas estatísticas do rebanho do animal"""
+    group = contemporary_group_key(animal.gender, animal.birth_date)
+    _apply(session, animal.herd_id, group, measurement_period, 1, weight, weight * weight)
+
+
+def remove_weight(session: Session, animal: Animal, measurement_period: str, weight: float) -> None:
+    """Retira uma pesagem das estatísticas do rebanho do animal"""
+    group = contemporary_group_key(animal.gender, animal.birth_date)
+    _apply(session, animal.herd_id, group, measurement_period, -1, -weight, -weight * weight)
+
+
+def _animal_totals(session: Session, animal_id: int) -> List[Tuple[str, int, float, float]]:
+    """Pesagens do animal agregadas por período: (período, n, soma, soma dos quadrados)"""
+    return session.exec(
+        select(
+            WeightRecord.measurement_period,
+            func.count(WeightRecord.id),
+            func.sum(WeightRecord.weight),
+            func.sum(WeightRecord.weight * WeightRecord.weight),
+        )
+        .where(WeightRecord.animal_id == animal_id)
+        .group_by(WeightRecord.measurement_period)
+    ).all()
+
+
+def move_animal(
+    session: Session,
+    animal: Animal,
+    old_herd_id: Optional[str],
+    old_gender: str,
+    old_birth_date: date,
+) -> None:
+    """Transfere as pesagens do animal para o novo rebanho/grupo após alteração do cadastro"""
+    old_group = contemporary_group_key(old_gender, old_birth_date)
+    new_group = contemporary_group_key(animal.gender, animal.birth_date)
+    if (old_herd_id, old_group) == (animal.herd_id, new_group):
+        return
+    for period, count, total, squares in _animal_totals(session, animal.id):
+        _apply(session, old_herd_id, old_group, period, -count, -total, -squares)
+        _apply(session, animal.herd_id, new_group, period, count, total, squares)
+
+
+def remove_animal(session: Session, animal: Animal) -> None:
+    """Retira todas as pesagens do animal (exclusão do animal)"""
+    group = contemporary_group_key(animal.gender, animal.birth_date)
+    for period, count, total, squares in _animal_totals(session, animal.id):
+        _apply(session, animal.herd_id, group, period, -count, -total, -squares)
+
+
+def rebuild_herd_statistics(session: Session, herd_id: Optional[str] = None) -> int:
+    """Recalcula do zero as estatísticas de um rebanho (ou de todos) em uma única passada.
+
+    Retorna o número de linhas gravadas.
+    """
+    rows = session.exec(
+        select(
+            Animal.herd_id,
+            Animal.gender,
+            Animal.birth_date,
+            WeightRecord.measurement_period,
+            func.count(WeightRecord.id),
+            func.sum(WeightRecord.weight),
+            func.sum(WeightRecord.weight * WeightRecord.weight),
+        )
+        .join(WeightRecord, WeightRecord.animal_id == Animal.id)
+        .where(Animal.herd_id == herd_id if herd_id is not None else Animal.herd_id.is_not(None))
+        .group_by(Animal.herd_id, Animal.gender, Animal.birth_date, WeightRecord.measurement_period)
+    ).all()
+    totals: Dict[Tuple[str, str, str], List[float]] = {}
+    for herd, gender, birth_date, period, count, total, squares in rows:
+        key = (herd, contemporary_group_key(gender, birth_date), period)
+        acc = totals.setdefault(key, [0, 0.0, 0.0])
+        acc[0] += count
+        acc[1] += total
+        acc[2] += squares
+
+    statement = delete(HerdWeightStatistics)
+    if herd_id is not None:
+        statement = statement.where(HerdWeightStatistics.herd_id == herd_id)
+    session.exec(statement)
+    for (herd, group, period), (count, total, squares) in totals.items():
+        session.add(HerdWeightStatistics(
+            herd_id=herd,
+            contemporary_group=group,
+            measurement_period=period,
+            count=count,
+            weight_sum=total,
+            weight_sum_squares=squares,
+        ))
+    session.commit()
+    return len(totals)
+
+
+def ensure_herd_statistics() -> None:
+    """Preenche a tabela na primeira execução, quando já existem pesagens cadastradas"""
+    with Session(engine) as session:
+        if session.exec(select(HerdWeightStatistics.id).limit(1)).first() is not None:
+            return
+        if session.exec(select(WeightRecord.id).limit(1)).first() is None:
+            return
+        rebuild_herd_statistics(session)
+
+
+def herd_weight_statistics(
+    session: Session,
+    herd_ids: Iterable[Optional[str]],
+    measurement_period: Optional[str] = None,
+) -> Dict[str, WeightStats]:
+    """Resumo das pesagens de cada rebanho (opcionalmente de um período), em uma consulta"""
+    herd_ids = [h for h in set(herd_ids) if h is not None]
+    if not herd_ids:
+        return {}
+    statement = (
+        select(
+            HerdWeightStatistics.herd_id,
+            func.sum(HerdWeightStatistics.count),
+            func.sum(HerdWeightStatistics.weight_sum),
+            func.sum(HerdWeightStatistics.weight_sum_squares),
+        )
+        .where(HerdWeightStatistics.herd_id.in_(herd_ids))
+        .group_by(HerdWeightStatistics.herd_id)
+    )
+    if measurement_period is not None:
+        statement = statement.where(HerdWeightStatistics.measurement_period == measurement_period)
+    return {herd: summarize(count, total, squares) for herd, count, total, squares in session.exec(statement).all()}
+
+
+def herd_group_statistics(session: Session, herd_id: str) -> List[Dict]:
+    """Estatísticas de cada grupo de contemporâneos e período do rebanho (para relatórios)"""
+    rows = session.exec(
+        select(HerdWeightStatistics)
+        .where(HerdWeightStatistics.herd_id == herd_id)
+        .order_by(HerdWeightStatistics.contemporary_group, HerdWeightStatistics.measurement_period)
+    ).all()
+    result = []
+    for row in rows:
+        stats = summarize(row.count, row.weight_sum, row.weight_sum_squares)
+        result.append({
+            "contemporary_group": row.contemporary_group,
+            "measurement_period": row.measurement_period,
+            "count": stats.count,
+            "mean": round(stats.mean, 3),
+            "variance": round(stats.variance, 3),
+            "std_dev": round(stats.variance ** 0.5, 3),
+        })
+    return result
@@ -0,0 +1,43 @@
+"""Versão dos dados de cada rebanho.
+
+`Herd.data_version` é incrementada a cada escrita em animais, pesagens,
+manejo reprodutivo ou avaliação genética do rebanho. Resultados derivados
+(simulações de acasalamento, indicadores) guardam a versão com que foram
+calculados e deixam de ser reaproveitados assim que ela muda, sem precisar
+rastrear cada alteração individualmente.
+"""
+
+from typing import Iterable, Optional
+
+from sqlalchemy import update
+from sqlmodel import Session, or_, select
+
+from app.models.animal import Animal
+from app.models.farm import Herd
+
+
+def bump_herd_version(
+    session: Session,
+    herd_ids: Iterable[Optional[str]] = (),
+    animal_ids: Iterable[Optional[int]] = (),
+) -> None:
+    """Incrementa a versão dos rebanhos informados e dos rebanhos dos animais (não faz commit)"""
+    herd_ids = [h for h in set(herd_ids) if h is not None]
+    animal_ids = [a for a in set(animal_ids) if a is not None]
+    conditions = []
+    if herd_ids:
+        conditions.append(Herd.id.in_(herd_ids))
+    if animal_ids:
+        conditions.append(Herd.id.in_(select(Animal.herd_id).where(Animal.id.in_(animal_ids))))
+    if conditions:
+        session.exec(
+            update(Herd)
+            .where(or_(*conditions))
+            .values(data_version=Herd.data_version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def herd_data_version(session: Session, herd_id: str) -> int:
+    """Versão atual dos dados do rebanho (0 se o rebanho não existe)"""
+    return session.exec(select(Herd.data_version).where(Herd.id == herd_id)).first() or 0
@@ -0,0 +1,221 @@
+"""Execução das simulações de acasalamento em segundo plano.
+
+A simulação é enviada para um pool local de threads e o próprio registro
+`MatingSimulationParameters` funciona como registro do job (status,
+percentual concluído, erro e resumo do resultado). Cada job abre sua própria
+sessão com o banco, de modo que a requisição que o criou termina na hora e não
+prende um worker do uvicorn nem a sessão da requisição.
+"""
+
+import hashlib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from app.core import mating_engine
+from app.core.db import engine
+from app.models.animal import Animal
+from app.models.mating import MatingSimulationParameters, MatingRecommendation
+
+# Simulações executadas ao mesmo tempo; o NSGA-II já distribui cada uma entre os núcleos
+MAX_WORKERS = 2
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class JobCancelled(Exception):
+    """Cancelamento solicitado durante a execução"""
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_cancel_events: Dict[int, threading.Event] = {}
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="mating-job")
+        return _executor
+
+
+def shutdown_jobs() -> None:
+    """Encerra o pool de jobs (chamado no shutdown da aplicação)"""
+    global _executor
+    with _executor_lock:
+        for event in _cancel_events.values():
+            event.set()
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def submit_simulation(simulation_id: int) -> None:
+    """Enfileira a execução de uma simulação já gravada com status "queued" """
+    with _executor_lock:
+        _cancel_events[simulation_id] = threading.Event()
+    _get_executor().submit(run_simulation_job, simulation_id)
+
+
+def submit_task(function: Callable, *args) -> None:
+    """Enfileira outra tarefa de segundo plano no mesmo pool (ex.: estimação de componentes de variância)"""
+    _get_executor().submit(function, *args)
+
+
+def simulation_cache_key(
+    params: dict,
+    male_ids: Iterable[int],
+    female_ids: Iterable[int],
+    seed: Optional[int],
+    data_version: int,
+) -> str:
+    """Hash dos parâmetros da simulação, dos animais selecionados e da versão dos dados do rebanho"""
+    params = {key: value for key, value in params.items() if key != "observations"}
+    payload = json.dumps(
+        [params, sorted(male_ids), sorted(female_ids), seed, data_version],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def find_cached_simulation(session: Session, cache_key: str) -> Optional[MatingSimulationParameters]:
+    """Simulação mais recente com a mesma chave, concluída ou ainda em andamento"""
+    return session.exec(
+        select(MatingSimulationParameters)
+        .where(MatingSimulationParameters.cache_key == cache_key)
+        .where(MatingSimulationParameters.status.in_(ACTIVE_STATUSES + ("completed",)))
+        .order_by(MatingSimulationParameters.id.desc())
+    ).first()
+
+
+def cancel_simulation(session: Session, simulation: MatingSimulationParameters) -> bool:
+    """Solicita o cancelamento; retorna False se o job já terminou"""
+    if simulation.status not in ACTIVE_STATUSES:
+        return False
+    with _executor_lock:
+        event = _cancel_events.get(simulation.id)
+    if event is not None:
+        event.set()
+    if simulation.status == "queued" or event is None:
+        # Ainda não começou (ou não pertence a este processo): cancela direto
+        _finish(session, simulation, "cancelled")
+    return True
+
+
+def recover_interrupted_jobs() -> None:
+    """Marca como falhos os jobs que ficaram pendentes em uma execução anterior do servidor"""
+    with Session(engine) as session:
+        pending = session.exec(
+            select(MatingSimulationParameters).where(MatingSimulationParameters.status.in_(ACTIVE_STATUSES))
+        ).all()
+        for simulation in pending:
+            simulation.error = "Interrompida pelo reinício do servidor"
+            _finish(session, simulation, "failed")
+
+
+def _finish(session: Session, simulation: MatingSimulationParameters, status: str) -> None:
+    simulation.status = status
+    simulation.finished_at = datetime.utcnow()
+    simulation.updated_at = simulation.finished_at
+    if status == "completed":
+        simulation.progress = 100.0
+    session.add(simulation)
+    session.commit()
+
+
+def run_simulation_job(simulation_id: int) -> None:
+    """Executa a simulação e grava recomendações, progresso e resultado"""
+    with _executor_lock:
+        cancel_event = _cancel_events.get(simulation_id) or threading.Event()
+
+    with Session(engine) as session:
+        simulation = session.get(MatingSimulationParameters, simulation_id)
+        if simulation is None or simulation.status != "queued":
+            return
+        simulation.status = "running"
+        simulation.started_at = datetime.utcnow()
+        session.add(simulation)
+        session.commit()
+
+        reported = [0.0]
+
+        def progress(percent: float) -> None:
+            if cancel_event.is_set():
+                raise JobCancelled()
+            # Grava apenas avanços de pelo menos 1 ponto percentual, em sessão separada
+            # para não expirar os objetos carregados pela simulação
+            if percent - reported[0] >= 1.0:
+                reported[0] = percent
+                with Session(engine) as progress_session:
+                    progress_session.exec(
+                        update(MatingSimulationParameters)
+                        .where(MatingSimulationParameters.id == simulation_id)
+                        .values(progress=round(percent, 1), updated_at=datetime.utcnow())
+                    )
+                    progress_session.commit()
+
+        try:
+            male_ids = json.loads(simulation.selected_male_ids or "[]")
+            female_ids = json.loads(simulation.selected_female_ids or "[]")
+            males = session.exec(select(Animal).where(Animal.id.in_(male_ids)).where(Animal.gender == "M")).all()
+            females = session.exec(select(Animal).where(Animal.id.in_(female_ids)).where(Animal.gender == "F")).all()
+            progress(5.0)
+
+            result = {}
+            if simulation.selection_method == "nsga2":
+                recommendations_data, pareto_front = mating_engine.simulate_pareto(
+                    males=males,
+                    females=females,
+                    session=session,
+                    heritability=simulation.heritability,
+                    weight_adjustment_days=simulation.weight_adjustment_days,
+                    max_female_percentage_per_male=simulation.max_female_percentage_per_male,
+                    seed=simulation.seed,
+                    progress=progress,
+                )
+                result["pareto_front"] = pareto_front
+            else:
+                recommendations_data = mating_engine.simulate(
+                    males=males,
+                    females=females,
+                    session=session,
+                    heritability=simulation.heritability,
+                    weight_adjustment_days=simulation.weight_adjustment_days,
+                    max_female_percentage_per_male=simulation.max_female_percentage_per_male,
+                    selection_method=simulation.selection_method,
+                    progress=progress,
+                )
+            progress(95.0)
+
+            for rec_data in recommendations_data:
+                session.add(MatingRecommendation(
+                    simulation_id=simulation.id,
+                    property_id=simulation.property_id,
+                    herd_id=simulation.herd_id,
+                    sire_id=rec_data['sire'].id,
+                    dam_id=rec_data['dam'].id,
+                    predicted_offspring_index=rec_data['predicted_index'],
+                    predicted_inbreeding=rec_data['predicted_inbreeding'],
+                    predicted_dep=rec_data['predicted_dep'],
+                    predicted_genetic_gain=rec_data['objective_score']
+                ))
+            result["total_recommendations"] = len(recommendations_data)
+            simulation.result = json.dumps(result)
+            _finish(session, simulation, "completed")
+        except JobCancelled:
+            session.rollback()
+            _finish(session, simulation, "cancelled")
+        except Exception as e:
+            session.rollback()
+            simulation.error = str(e) or e.__class__.__name__
+            _finish(session, simulation, "failed")
+        finally:
+            with _executor_lock:
+                _cancel_events.pop(simulation_id, None)
@@ -0,0 +1,139 @@
+"""Parentesco (matriz de relacionamento aditivo) para o módulo de acasalamento.
+
+A matriz A nunca é montada por inteiro: as colunas necessárias são obtidas
+pelo método indireto de Colleau (2002), A·x = T D T'·x, resolvendo os dois
+sistemas triangulares geração a geração com NumPy. Cada coluna custa O(n) e
+fica em cache por propriedade, de modo que a coancestria de qualquer par
+reprodutor × matriz já calculado é uma consulta O(1).
+"""
+
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlmodel import Session
+
+from app.core.pedigree import Pedigree, compute_inbreeding
+
+
+class KinshipTable:
+    """Colunas da matriz de relacionamento aditivo de uma genealogia, sob demanda"""
+
+    def __init__(self, pedigree: Pedigree, inbreeding: np.ndarray):
+        self.pedigree = pedigree
+        self.inbreeding = inbreeding
+        F = inbreeding.copy()
+        F[0] = -1.0  # pai desconhecido
+        # Variância da amostragem mendeliana (diagonal de D em A = T D T')
+        self.D = 0.5 - 0.25 * (F[pedigree.sire] + F[pedigree.dam])
+        self.D[0] = 0.0
+        self._columns: Dict[int, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def _solve(self, X: np.ndarray) -> np.ndarray:
+        """Calcula A·X pelo método indireto de Colleau"""
+        sire, dam = self.pedigree.sire, self.pedigree.dam
+        levels = self.pedigree.levels()
+        Y = X.copy()
+        # T'·X: contribuições dos filhos para os pais, da geração mais nova para a mais antiga
+        for rows in reversed(levels):
+            half = 0.5 * Y[rows]
+            np.add.at(Y, sire[rows], half)
+            np.add.at(Y, dam[rows], half)
+            Y[0] = 0.0
+        Y *= self.D[:, None]
+        # T·Y: cada animal recebe metade de cada pai, da geração mais antiga para a mais nova
+        for rows in levels:
+            Y[rows] += 0.5 * (Y[sire[rows]] + Y[dam[rows]])
+        return Y
+
+    def warm(self, animal_ids: Iterable[int]) -> None:
+        """Calcula (em lote) as colunas de A dos animais que ainda não estão em cache"""
+        positions = [
+            self.pedigree.position[a] for a in set(animal_ids)
+            if a in self.pedigree.position and self.pedigree.position[a] not in self._columns
+        ]
+        if not positions:
+            return
+        X = np.zeros((len(self.pedigree.ids), len(positions)))
+        X[positions, np.arange(len(positions))] = 1.0
+        Z = self._solve(X)
+        with self._lock:
+            for k, pos in enumerate(positions):
+                self._columns[pos] = Z[:, k].copy()
+
+    def relationship(self, a_id: int, b_id: int) -> float:
+        """Relacionamento aditivo a(i, j); O(1) quando a coluna de um dos animais está em cache"""
+        pa = self.pedigree.position.get(a_id)
+        pb = self.pedigree.position.get(b_id)
+        if pa is None or pb is None:
+            return 1.0 if a_id == b_id else 0.0
+        if pa not in self._columns and pb not in self._columns:
+            self.warm([a_id])
+        column = self._columns.get(pa)
+        return float(column[pb]) if column is not None else float(self._columns[pb][pa])
+
+    def mean_relationship(self, positions: np.ndarray) -> float:
+        """Relacionamento aditivo médio do grupo (todos os pares, inclusive cada animal consigo mesmo).
+
+        x'A·x com x = 1/n nas posições do grupo: um único produto A·x, sem montar A.
+        """
+        if len(positions) == 0:
+            return 0.0
+        x = np.zeros((len(self.pedigree.ids), 1))
+        x[positions, 0] = 1.0 / len(positions)
+        return float(x[:, 0] @ self._solve(x)[:, 0])
+
+    def offspring_inbreeding(self, sire_id: int, dam_id: int) -> float:
+        """Endogamia esperada da progênie (fração 0-1) = coancestria dos pais = a(s, d) / 2"""
+        return 0.5 * self.relationship(sire_id, dam_id)
+
+    def offspring_inbreeding_matrix(self, sire_ids: List[int], dam_ids: List[int]) -> np.ndarray:
+        """Endogamia esperada da progênie (fração 0-1) para todos os pares reprodutor × matriz"""
+        self.warm(sire_ids)
+        position = self.pedigree.position
+        dam_pos = np.array([position.get(d, -1) for d in dam_ids], dtype=np.int64)
+        known_dam = dam_pos >= 0
+        result = np.zeros((len(sire_ids), len(dam_ids)))
+        for k, sire_id in enumerate(sire_ids):
+            pos = position.get(sire_id)
+            if pos is not None:
+                result[k, known_dam] = 0.5 * self._columns[pos][dam_pos[known_dam]]
+        return result
+
+    def offspring_inbreeding_pairs(self, sire_ids: List[int], dam_ids: List[int]) -> np.ndarray:
+        """Endogamia esperada da progênie (fração 0-1) de cada par (reprodutor, matriz) informado"""
+        self.warm(sire_ids)
+        position = self.pedigree.position
+        result = np.zeros(len(sire_ids))
+        for k, (sire_id, dam_id) in enumerate(zip(sire_ids, dam_ids)):
+            sire, dam = position.get(sire_id), position.get(dam_id)
+            if sire is not None and dam is not None:
+                result[k] = 0.5 * self._columns[sire][dam]
+        return result
+
+
+# Cache global de parentesco por propriedade (invalidado quando a genealogia muda)
+_kinship_cache: Dict[str, KinshipTable] = {}
+_kinship_cache_lock = threading.Lock()
+
+
+def get_kinship(session: Session, property_id: str) -> KinshipTable:
+    """Tabela de parentesco da propriedade, carregada uma vez e mantida em cache"""
+    with _kinship_cache_lock:
+        table = _kinship_cache.get(property_id)
+    if table is None:
+        pedigree, F = compute_inbreeding(session, property_id)
+        table = KinshipTable(pedigree, F)
+        with _kinship_cache_lock:
+            _kinship_cache[property_id] = table
+    return table
+
+
+def clear_kinship_cache(property_id: Optional[str] = None) -> None:
+    """Descarta o parentesco em cache (de uma propriedade ou de todas)"""
+    with _kinship_cache_lock:
+        if property_id:
+            _kinship_cache.pop(property_id, None)
+        else:
+            _kinship_cache.clear()
@@ -0,0 +1,554 @@
+"""Motor de simulação de acasalamento.
+
+Carrega as métricas genéticas (DEP, índice e endogamia) de cada candidato uma
+única vez para uma tabela em memória e pontua todos os pares a partir dela,
+sem consultas ao banco dentro do laço reprodutor × matriz.
+
+A distribuição das matrizes entre os reprodutores pode ser gulosa (maior score
+primeiro), ótima, resolvendo o problema de transporte com capacidade por
+reprodutor (método `optimal_allocation`), ou multiobjetivo, com a fronteira de
+Pareto ganho genético × endogamia obtida pelo NSGA-II (método `nsga2`).
+"""
+
+import math
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlmodel import Session, select
+
+from app.models.animal import Animal
+from app.models.animal_measurements import WeightRecord
+from app.models.mating import AnimalGeneticEvaluation
+from app.core import nsga2
+from app.core.adjusted_weights import ADJUSTMENT_AGES
+from app.core.herd_statistics import herd_weight_statistics
+from app.core.herd_versions import herd_data_version
+from app.core.kinship import get_kinship
+from app.core.pedigree import get_inbreeding
+
+
+class GeneticTable:
+    """Tabela em memória com as métricas genéticas de um conjunto de animais"""
+
+    def __init__(self, animals: Sequence[Animal], dep: np.ndarray, inbreeding: np.ndarray, index: np.ndarray):
+        self.animals = list(animals)
+        self.position: Dict[int, int] = {a.id: i for i, a in enumerate(self.animals)}
+        self.dep = dep
+        self.inbreeding = inbreeding
+        self.index = index
+
+    def __len__(self) -> int:
+        return len(self.animals)
+
+
+def _stored_deps(session: Session, ids: Sequence[int], weight_adjustment_days: int) -> Dict[int, Tuple[str, float]]:
+    """Método e DEP gravados pela avaliação genética (BLUP ou simplificada) na mesma idade de ajuste"""
+    rows = session.exec(
+        select(AnimalGeneticEvaluation.animal_id, AnimalGeneticEvaluation.evaluation_settings, AnimalGeneticEvaluation.dep)
+        .where(AnimalGeneticEvaluation.animal_id.in_(ids))
+        .where(AnimalGeneticEvaluation.dep.is_not(None))
+        # evaluation_settings = "método;h²;dias" (app.core.evaluation_tracking)
+        .where(AnimalGeneticEvaluation.evaluation_settings.endswith(f";{weight_adjustment_days}"))
+    ).all()
+    return {animal_id: (settings.split(";", 1)[0], dep) for animal_id, settings, dep in rows}
+
+
+def _blup_deps(
+    animals: Sequence[Animal],
+    session: Session,
+    weight_adjustment_days: int,
+    stored: Dict[int, Tuple[str, float]],
+) -> np.ndarray:
+    """DEP na escala do BLUP (kg) para todos os animais.
+
+    Animais sem DEP do modelo animal (p. ex. cadastrados depois da avaliação)
+    recebem a média da DEP dos pais, a predição do BLUP para quem não tem
+    registro próprio; pai ou mãe desconhecido ou sem avaliação conta como 0.
+    """
+    deps = {animal_id: dep for animal_id, (method, dep) in stored.items() if method == "blup"}
+    parents = {
+        parent for a in animals if a.id not in deps
+        for parent in (a.father_id, a.mother_id) if parent is not None and parent not in deps
+    }
+    if parents:
+        deps.update({
+            animal_id: dep
+            for animal_id, (method, dep) in _stored_deps(session, list(parents), weight_adjustment_days).items()
+            if method == "blup"
+        })
+    return np.array([
+        deps[a.id] if a.id in deps
+        else round((deps.get(a.father_id, 0.0) + deps.get(a.mother_id, 0.0)) / 2, 3)
+        for a in animals
+    ], dtype=float)
+
+
+def _load_deps(
+    animals: Sequence[Animal],
+    session: Session,
+    weight_adjustment_days: int,
+    use_evaluations: bool = True,
+) -> np.ndarray:
+    """DEP de todos os animais com consultas em lote.
+
+    Com `use_evaluations`, vale a DEP gravada pela avaliação genética do animal.
+    Se algum animal tem DEP do BLUP nessa idade de ajuste, todos ficam na escala
+    do BLUP, em kg (`_blup_deps`), sem misturar com o DEP simplificado, que é
+    relativo à média. Caso contrário, o DEP simplificado (pesos ajustados,
+    pesagens e médias por rebanho) fica para os animais ainda sem avaliação.
+    """
+    stored = _stored_deps(session, [a.id for a in animals], weight_adjustment_days) if use_evaluations else {}
+    if any(method == "blup" for method, _ in stored.values()):
+        return _blup_deps(animals, session, weight_adjustment_days, stored)
+    stored = {animal_id: dep for animal_id, (_, dep) in stored.items()}
+    ids = [a.id for a in animals if a.id not in stored]
+    birth = {a.id: a.birth_date for a in animals}
+
+    # Peso ajustado já calculado para a idade alvo (adjusted_weights), quando existir
+    best: Dict[int, tuple] = {}
+    if ids and weight_adjustment_days in ADJUSTMENT_AGES:
+        column = getattr(AnimalGeneticEvaluation, f"adjusted_weight_{weight_adjustment_days}d")
+        precomputed = session.exec(
+            select(AnimalGeneticEvaluation.animal_id, column)
+            .where(AnimalGeneticEvaluation.animal_id.in_(ids))
+            .where(column.is_not(None))
+        ).all()
+        best = {animal_id: (0, weight) for animal_id, weight in precomputed}
+
+    # Demais animais: pesagem mais próxima da idade alvo
+    missing = [animal_id for animal_id in ids if animal_id not in best]
+    rows = session.exec(
+        select(WeightRecord.animal_id, WeightRecord.measurement_date, WeightRecord.weight)
+        .where(WeightRecord.animal_id.in_(missing))
+        .order_by(WeightRecord.animal_id, WeightRecord.measurement_date)
+    ).all() if missing else []
+    for animal_id, measurement_date, weight in rows:
+        diff = abs((measurement_date - birth[animal_id]).days - weight_adjustment_days)
+        current = best.get(animal_id)
+        if current is None or diff < current[0]:
+            best[animal_id] = (diff, weight)
+
+    # Média de peso por rebanho, das estatísticas materializadas (app.core.herd_statistics)
+    herd_stats = herd_weight_statistics(session, {a.herd_id for a in animals if a.id in best})
+    herd_avg = {herd_id: stats.mean for herd_id, stats in herd_stats.items()}
+
+    dep = np.zeros(len(animals))
+    for i, animal in enumerate(animals):
+        if animal.id in stored:
+            dep[i] = stored[animal.id]
+            continue
+        if animal.id not in best:
+            continue
+        avg_weight = herd_avg.get(animal.herd_id) or 0.0
+        if avg_weight == 0:
+            continue
+        dep[i] = round((best[animal.id][1] - avg_weight) / avg_weight, 3)
+    return dep
+
+
+def build_genetic_table(
+    animals: Sequence[Animal],
+    session: Session,
+    heritability: float,
+    weight_adjustment_days: int,
+    use_evaluations: bool = True,
+) -> GeneticTable:
+    """Carrega DEP, endogamia e índice de seleção de cada animal exatamente uma vez.
+
+    `use_evaluations=False` ignora as DEPs gravadas e calcula o DEP simplificado
+    de todos (usado pela própria avaliação simplificada).
+    """
+    animals = list(animals)
+    dep = _load_deps(animals, session, weight_adjustment_days, use_evaluations)
+    coefficients = get_inbreeding(session, animals)
+    # Endogamia em percentual, como no restante do módulo
+    inbreeding = np.round(np.array([coefficients.get(a.id, 0.0) for a in animals]) * 100, 3)
+    # Índice de seleção: I = (DEP * h²) - (F% * 0.01)
+    index = np.round(dep * heritability - inbreeding * 0.01, 3)
+    return GeneticTable(animals, dep, inbreeding, index)
+
+
+def predicted_inbreeding_matrix(session: Session, males: Sequence[Animal], females: Sequence[Animal]) -> np.ndarray:
+    """Endogamia prevista (%) da progênie para todos os pares, pela coancestria dos pais"""
+    kinship = get_kinship(session, males[0].property_id)
+    matrix = kinship.offspring_inbreeding_matrix([a.id for a in males], [a.id for a in females])
+    return np.round(matrix * 100, 3)
+
+
+def pair_metrics(
+    sire_dep: np.ndarray,
+    dam_dep: np.ndarray,
+    sire_index: np.ndarray,
+    dam_index: np.ndarray,
+    inbreeding: np.ndarray,
+) -> Dict[str, np.ndarray]:
+    """Métricas previstas da progênie (arrays com broadcasting; endogamia em %)"""
+    predicted_dep = (sire_dep + dam_dep) / 2
+    predicted_index = (sire_index + dam_index) / 2
+    # Score = índice - (endogamia * peso_penalizacao)
+    objective = predicted_index - inbreeding * 0.5
+    return {
+        "predicted_dep": predicted_dep,
+        "predicted_index": predicted_index,
+        "predicted_inbreeding": inbreeding,
+        "objective_score": objective,
+    }
+
+
+def score_pairs(sires: GeneticTable, dams: GeneticTable, inbreeding: np.ndarray) -> Dict[str, np.ndarray]:
+    """Calcula as métricas de todos os pares (M × F) a partir das tabelas em memória"""
+    return pair_metrics(
+        sires.dep[:, None], dams.dep[None, :], sires.index[:, None], dams.index[None, :], inbreeding
+    )
+
+
+def greedy_allocation(objective: np.ndarray, max_females_per_male: int) -> List[tuple]:
+    """Atribui matrizes aos reprodutores pelo maior score respeitando a capacidade"""
+    n_males, n_females = objective.shape
+    # Ordenação estável preserva o desempate por ordem (reprodutor, matriz)
+    order = np.argsort(-objective, axis=None, kind="stable")
+    male_count = np.zeros(n_males, dtype=np.int64)
+    assigned = np.zeros(n_females, dtype=bool)
+    pairs = []
+    for flat in order:
+        m, f = divmod(int(flat), n_females)
+        if assigned[f] or male_count[m] >= max_females_per_male:
+            continue
+        pairs.append((m, f))
+        assigned[f] = True
+        male_count[m] += 1
+        if len(pairs) == n_females:
+            break
+    return pairs
+
+
+def _predecessor_cycle(pred: List[int]) -> Optional[List[int]]:
+    """Primeiro ciclo do grafo de predecessores (cada nó tem no máximo um), na ordem das arestas"""
+    state = [0] * len(pred)  # 0 = não visitado, 1 = no caminho atual, 2 = concluído
+    for start in range(len(pred)):
+        path = []
+        node = start
+        while node >= 0 and state[node] == 0:
+            state[node] = 1
+            path.append(node)
+            node = pred[node]
+        if node >= 0 and state[node] == 1:
+            cycle = path[path.index(node):]
+            cycle.reverse()
+            return cycle
+        for visited in path:
+            state[visited] = 2
+    return None
+
+
+def optimal_allocation(objective: np.ndarray, max_females_per_male: int, tolerance: float = 1e-9) -> List[tuple]:
+    """Distribuição ótima das matrizes, maximizando a soma dos scores com capacidade por reprodutor.
+
+    É um problema de transporte (fluxo de custo mínimo). Parte da solução gulosa,
+    que já é viável, e cancela ciclos de custo negativo no grafo residual
+    compacto de reprodutores: a aresta u → v custa a menor perda de score ao
+    transferir uma matriz (ou uma vaga livre) de u para v. Sem ciclo negativo a
+    solução é ótima. O grafo tem apenas M + 1 nós (o nó extra reúne as matrizes
+    que ficam sem reprodutor quando a capacidade total é menor que o número de
+    matrizes), então cada iteração custa O(M²) mais a atualização das arestas
+    que saem dos reprodutores envolvidos.
+    """
+    n_males, n_females = objective.shape
+    unassigned = n_males  # nó das matrizes sem reprodutor
+    n_nodes = n_males + 1
+    nodes = np.arange(n_nodes)
+    gain = np.vstack([objective, np.zeros((1, n_females))])
+
+    owner = np.full(n_females, unassigned, dtype=np.int64)
+    for m, f in greedy_allocation(objective, max_females_per_male):
+        owner[f] = m
+    free_slots = np.zeros(n_nodes, dtype=np.int64)
+    free_slots[:n_males] = max_females_per_male - np.bincount(owner, minlength=n_nodes)[:n_males]
+
+    # Matrizes só podem sobrar quando a capacidade total não cobre todas
+    closed = np.zeros((n_nodes, n_nodes), dtype=bool)
+    closed[nodes, nodes] = True
+    closed[:, unassigned] = n_males * max_females_per_male >= n_females
+
+    # cost[u, v]: menor perda ao transferir de u para v; moved[u, v]: matriz transferida (-1 = vaga livre)
+    cost = np.full((n_nodes, n_nodes), np.inf)
+    moved = np.full((n_nodes, n_nodes), -1, dtype=np.int64)
+
+    def refresh(node: int, targets: np.ndarray) -> None:
+        """Recalcula as arestas node → targets a partir das matrizes atuais do nó"""
+        members = np.flatnonzero(owner == node)
+        row_cost = np.full(targets.size, np.inf)
+        row_moved = np.full(targets.size, -1, dtype=np.int64)
+        if members.size:
+            loss = gain[node, members][None, :] - gain[np.ix_(targets, members)]
+            best = loss.argmin(axis=1)
+            row_cost = loss[np.arange(targets.size), best]
+            row_moved = members[best]
+        if free_slots[node] > 0:
+            cheaper = row_cost > 0
+            row_cost[cheaper] = 0.0
+            row_moved[cheaper] = -1
+        row_cost[closed[node, targets]] = np.inf
+        cost[node, targets] = row_cost
+        moved[node, targets] = row_moved
+
+    for node in range(n_nodes):
+        refresh(node, nodes)
+
+    while True:
+        # Bellman-Ford a partir de todos os nós; com distâncias iniciais zero, qualquer
+        # ciclo no grafo de predecessores é um ciclo negativo e pode ser cancelado já
+        dist = np.zeros(n_nodes)
+        pred = np.full(n_nodes, -1, dtype=np.int64)
+        cycle = None
+        for _ in range(n_nodes):
+            candidates = dist[:, None] + cost
+            best = candidates.argmin(axis=0)
+            new_dist = candidates[best, nodes]
+            updated = np.flatnonzero(new_dist < dist - tolerance)
+            if updated.size == 0:
+                break
+            dist[updated] = new_dist[updated]
+            pred[updated] = best[updated]
+            cycle = _predecessor_cycle(pred.tolist())
+            if cycle and sum(cost[u, cycle[(k + 1) % len(cycle)]] for k, u in enumerate(cycle)) < -tolerance:
+                break
+            cycle = None
+        if not cycle:
+            break
+
+        # Cada aresta do ciclo transfere uma matriz (ou vaga) de u para v
+        transfers = [(u, cycle[(k + 1) % len(cycle)]) for k, u in enumerate(cycle)]
+        females = [int(moved[u, v]) for u, v in transfers]
+        for (u, v), f in zip(transfers, females):
+            if f < 0:
+                free_slots[u] -= 1
+                free_slots[v] += 1
+            else:
+                owner[f] = v
+        # Só mudam as arestas que saem dos nós do ciclo: as que usavam o item que saiu
+        # são recalculadas; o item que entrou só pode baratear as demais
+        for (u, v), f in zip(transfers, females):
+            stale = np.flatnonzero(moved[u] == f) if f >= 0 or free_slots[u] == 0 else np.empty(0, dtype=np.int64)
+            if stale.size:
+                refresh(u, stale)
+            if f >= 0:
+                loss = gain[v, f] - gain[:, f]
+            else:
+                loss = np.zeros(n_nodes)
+            cheaper = (loss < cost[v]) & ~closed[v]
+            cost[v, cheaper] = loss[cheaper]
+            moved[v, cheaper] = f
+
+    pairs = [(int(owner[f]), f) for f in range(n_females) if owner[f] != unassigned]
+    # Mesma ordem da saída gulosa: maior score primeiro
+    pairs.sort(key=lambda pair: -objective[pair])
+    return pairs
+
+
+def allocate(objective: np.ndarray, max_females_per_male: int, selection_method: Optional[str] = None) -> List[tuple]:
+    """Escolhe o método de distribuição conforme o `selection_method` da simulação"""
+    if selection_method == "optimal_allocation":
+        return optimal_allocation(objective, max_females_per_male)
+    return greedy_allocation(objective, max_females_per_male)
+
+
+def _prepare(
+    males: Sequence[Animal],
+    females: Sequence[Animal],
+    session: Session,
+    heritability: float,
+    weight_adjustment_days: int,
+    max_female_percentage_per_male: float,
+):
+    """Tabelas genéticas, métricas de todos os pares e capacidade por reprodutor"""
+    sires = build_genetic_table(males, session, heritability, weight_adjustment_days)
+    dams = build_genetic_table(females, session, heritability, weight_adjustment_days)
+    metrics = score_pairs(sires, dams, predicted_inbreeding_matrix(session, sires.animals, dams.animals))
+    max_females_per_male = math.ceil(len(dams) * (max_female_percentage_per_male / 100))
+    return sires, dams, metrics, max_females_per_male
+
+
+def _recommendations(sires: GeneticTable, dams: GeneticTable, metrics: Dict[str, np.ndarray], pairs) -> List[dict]:
+    """Converte pares (posição do reprodutor, posição da matriz) no formato do router"""
+    recommendations = []
+    for m, f in pairs:
+        recommendations.append({
+            'sire': sires.animals[m],
+            'dam': dams.animals[f],
+            'sire_dep': float(sires.dep[m]),
+            'dam_dep': float(dams.dep[f]),
+            'predicted_dep': float(metrics["predicted_dep"][m, f]),
+            'predicted_index': float(metrics["predicted_index"][m, f]),
+            'predicted_inbreeding': float(metrics["predicted_inbreeding"][m, f]),
+            'objective_score': float(metrics["objective_score"][m, f]),
+        })
+    return recommendations
+
+
+def simulate(
+    males: Sequence[Animal],
+    females: Sequence[Animal],
+    session: Session,
+    heritability: float,
+    weight_adjustment_days: int,
+    max_female_percentage_per_male: float,
+    selection_method: Optional[str] = None,
+    progress: Optional[Callable[[float], None]] = None,
+) -> List[dict]:
+    """Executa a simulação completa e retorna as recomendações no formato do router.
+
+    `progress(percentual)` é chamado entre as etapas (carga das métricas e distribuição).
+    """
+    sires, dams, metrics, max_females_per_male = _prepare(
+        males, females, session, heritability, weight_adjustment_days, max_female_percentage_per_male
+    )
+    if progress is not None:
+        progress(50.0)
+    pairs = allocate(metrics["objective_score"], max_females_per_male, selection_method)
+    if progress is not None:
+        progress(90.0)
+    return _recommendations(sires, dams, metrics, pairs)
+
+
+def simulate_pareto(
+    males: Sequence[Animal],
+    females: Sequence[Animal],
+    session: Session,
+    heritability: float,
+    weight_adjustment_days: int,
+    max_female_percentage_per_male: float,
+    seed: Optional[int] = None,
+    progress: Optional[Callable[[float], None]] = None,
+) -> Tuple[List[dict], List[dict]]:
+    """Simulação multiobjetivo (NSGA-II): ganho genético × endogamia média da progênie.
+
+    Retorna as recomendações do plano de compromisso (mais próximo do ponto
+    ideal) e a fronteira de Pareto completa, do maior para o menor ganho.
+    `progress(percentual)` é chamado a cada época do otimizador.
+    """
+    sires, dams, metrics, max_females_per_male = _prepare(
+        males, females, session, heritability, weight_adjustment_days, max_female_percentage_per_male
+    )
+    if progress is not None:
+        progress(20.0)
+    gain, inbreeding = metrics["predicted_index"], metrics["predicted_inbreeding"]
+
+    # Extremos e compromisso conhecidos entram na população inicial de todas as ilhas
+    initial_plans = []
+    for pairs in (
+        greedy_allocation(metrics["objective_score"], max_females_per_male),
+        optimal_allocation(metrics["objective_score"], max_females_per_male),
+        optimal_allocation(gain, max_females_per_male),
+        optimal_allocation(-inbreeding, max_females_per_male),
+    ):
+        plan = np.full(len(dams), len(sires), dtype=np.int64)
+        for m, f in pairs:
+            plan[f] = m
+        initial_plans.append(plan)
+
+    plans = nsga2.pareto_front(
+        gain,
+        inbreeding,
+        max_females_per_male,
+        initial_plans=initial_plans,
+        seed=nsga2.DEFAULT_SEED if seed is None else seed,
+        on_epoch=(lambda done, total: progress(20.0 + 70.0 * done / total)) if progress is not None else None,
+    )
+    selected = nsga2.compromise_plan(plans)
+
+    front = []
+    for k, plan in enumerate(plans):
+        assigned = np.flatnonzero(plan["assignment"] >= 0)
+        front.append({
+            "plan": k,
+            "genetic_gain": round(plan["genetic_gain"], 3),
+            "mean_inbreeding": round(plan["mean_inbreeding"], 3),
+            "selected": k == selected,
+            "pairs": [[sires.animals[plan["assignment"][f]].id, dams.animals[f].id] for f in assigned],
+        })
+
+    assignment = plans[selected]["assignment"]
+    pairs = [(int(assignment[f]), int(f)) for f in np.flatnonzero(assignment >= 0)]
+    pairs.sort(key=lambda pair: -metrics["objective_score"][pair])
+    return _recommendations(sires, dams, metrics, pairs), front
+
+
+# Tabela genética dos animais ativos de cada rebanho, para avaliar pares sem
+# novas consultas: herd_id -> (versão dos dados, h², dias de ajuste, tabela)
+_herd_tables: Dict[str, Tuple[int, float, int, GeneticTable]] = {}
+_herd_tables_lock = threading.Lock()
+
+
+def herd_genetic_table(
+    session: Session,
+    herd_id: str,
+    heritability: float,
+    weight_adjustment_days: int,
+) -> GeneticTable:
+    """Tabela genética do rebanho, recarregada quando os dados ou os parâmetros mudam"""
+    version = herd_data_version(session, herd_id)
+    with _herd_tables_lock:
+        cached = _herd_tables.get(herd_id)
+    if cached is not None and cached[:3] == (version, heritability, weight_adjustment_days):
+        return cached[3]
+    animals = session.exec(
+        select(Animal).where(Animal.herd_id == herd_id).where(Animal.status == "ativo")
+    ).all()
+    # A tabela sobrevive à sessão da requisição
+    for animal in animals:
+        session.expunge(animal)
+    table = build_genetic_table(animals, session, heritability, weight_adjustment_days)
+    with _herd_tables_lock:
+        _herd_tables[herd_id] = (version, heritability, weight_adjustment_days, table)
+    return table
+
+
+def evaluate_pairs(
+    session: Session,
+    herd_id: str,
+    pairs: Sequence[Tuple[int, int]],
+    heritability: float,
+    weight_adjustment_days: int,
+) -> Tuple[List[dict], List[str]]:
+    """Métricas previstas de pares (reprodutor, matriz) avulsos, com as fórmulas da simulação.
+
+    Usa a tabela genética do rebanho e o parentesco em cache; retorna os
+    resultados e os erros dos pares inválidos.
+    """
+    table = herd_genetic_table(session, herd_id, heritability, weight_adjustment_days)
+    valid: List[Tuple[int, int]] = []
+    errors: List[str] = []
+    for sire_id, dam_id in pairs:
+        sire = table.position.get(sire_id)
+        dam = table.position.get(dam_id)
+        if sire is None or dam is None:
+            errors.append(f"Animal ativo não encontrado no rebanho (Sire: {sire_id}, Dam: {dam_id})")
+        elif table.animals[sire].gender != "M" or table.animals[dam].gender != "F":
+            errors.append(f"Par inválido: reprodutor {sire_id} deve ser macho e matriz {dam_id} fêmea")
+        else:
+            valid.append((sire, dam))
+    if not valid:
+        return [], errors
+
+    sires = np.array([m for m, _ in valid])
+    dams = np.array([f for _, f in valid])
+    kinship = get_kinship(session, table.animals[0].property_id)
+    inbreeding = np.round(kinship.offspring_inbreeding_pairs(
+        [table.animals[m].id for m in sires], [table.animals[f].id for f in dams]
+    ) * 100, 3)
+    metrics = pair_metrics(table.dep[sires], table.dep[dams], table.index[sires], table.index[dams], inbreeding)
+    results = []
+    for k, (m, f) in enumerate(valid):
+        results.append({
+            "sire_id": table.animals[m].id,
+            "dam_id": table.animals[f].id,
+            "sire_dep": float(table.dep[m]),
+            "dam_dep": float(table.dep[f]),
+            "predicted_dep": round(float(metrics["predicted_dep"][k]), 3),
+            "predicted_index": round(float(metrics["predicted_index"][k]), 3),
+            "predicted_inbreeding": float(metrics["predicted_inbreeding"][k]),
+            "objective_score": round(float(metrics["objective_score"][k]), 3),
+        })
+    return results, errors
@@ -0,0 +1,292 @@
+"""Otimização multiobjetivo de planos de acasalamento (NSGA-II).
+
+Cada indivíduo é um plano completo: o reprodutor atribuído a cada matriz
+(ou o nó "sem reprodutor" quando a capacidade total não cobre todas). Os dois
+objetivos são o ganho genético médio (índice predito da progênie, maximizar) e
+a endogamia média da progênie (minimizar); a capacidade por reprodutor é
+mantida por um operador de reparo.
+
+A população é dividida em ilhas que evoluem em paralelo em um
+ProcessPoolExecutor, trocando seus melhores planos a cada época (migração em
+anel). As sementes são derivadas de (semente, ilha, época), então o resultado
+depende apenas da semente e da configuração, nunca do número de núcleos ou da
+ordem de execução dos processos.
+
+Este módulo não importa nada de `app` para que os processos filhos (spawn)
+iniciem rápido.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Configuração padrão do otimizador
+ISLANDS = 4
+POPULATION_PER_ISLAND = 60
+GENERATIONS = 150
+MIGRATION_INTERVAL = 25
+MIGRANTS = 4
+CROSSOVER_RATE = 0.9
+DEFAULT_SEED = 42
+
+
+class MatingProblem:
+    """Matrizes reprodutor × matriz dos dois objetivos e capacidade de cada nó"""
+
+    def __init__(self, gain: np.ndarray, inbreeding: np.ndarray, max_females_per_male: int):
+        n_males, n_females = gain.shape
+        total = n_males * max_females_per_male
+        capacity = [max_females_per_male] * n_males
+        if total < n_females:
+            # Nó extra para as matrizes que ficam sem reprodutor (não entram nas médias)
+            capacity.append(n_females - total)
+        self.n_males = n_males
+        self.n_females = n_females
+        self.capacity = np.array(capacity, dtype=np.int64)
+        self.assigned = min(n_females, total)
+        padding = np.zeros((len(capacity) - n_males, n_females))
+        self.gain = np.vstack([gain, padding])
+        self.inbreeding = np.vstack([inbreeding, padding])
+
+    def evaluate(self, population: np.ndarray) -> np.ndarray:
+        """Objetivos (em minimização) de toda a população: [-ganho médio, endogamia média]"""
+        columns = np.arange(self.n_females)
+        gain = self.gain[population, columns].sum(axis=1) / self.assigned
+        inbreeding = self.inbreeding[population, columns].sum(axis=1) / self.assigned
+        return np.column_stack([-gain, inbreeding])
+
+    def random_plans(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        """Planos aleatórios viáveis: cada plano é uma permutação das vagas disponíveis"""
+        slots = np.repeat(np.arange(len(self.capacity)), self.capacity)
+        plans = [rng.permutation(slots)[:self.n_females] for _ in range(size)]
+        return np.array(plans, dtype=np.int64).reshape(size, self.n_females)
+
+    def repair(self, population: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """Move matrizes excedentes de reprodutores acima da capacidade para vagas livres"""
+        n_nodes = len(self.capacity)
+        for plan in population:
+            excess = np.bincount(plan, minlength=n_nodes) - self.capacity
+            if not (excess > 0).any():
+                continue
+            released = [
+                rng.choice(np.flatnonzero(plan == node), count, replace=False)
+                for node, count in enumerate(excess) if count > 0
+            ]
+            released = np.concatenate(released)
+            free = np.repeat(np.arange(n_nodes), np.maximum(-excess, 0))
+            plan[released] = rng.choice(free, released.size, replace=False)
+        return population
+
+
+def non_dominated_sort(objectives: np.ndarray) -> np.ndarray:
+    """Rank de Pareto de cada indivíduo (0 = fronteira não dominada)"""
+    le = (objectives[:, None, :] <= objectives[None, :, :]).all(axis=2)
+    lt = (objectives[:, None, :] < objectives[None, :, :]).any(axis=2)
+    dominates = le & lt
+    dominated_by = dominates.sum(axis=0)
+    rank = np.full(len(objectives), -1, dtype=np.int64)
+    current = np.flatnonzero(dominated_by == 0)
+    level = 0
+    while current.size:
+        rank[current] = level
+        dominated_by = dominated_by - dominates[current].sum(axis=0)
+        dominated_by[rank >= 0] = -1
+        current = np.flatnonzero(dominated_by == 0)
+        level += 1
+    return rank
+
+
+def crowding_distance(objectives: np.ndarray, rank: np.ndarray) -> np.ndarray:
+    """Distância de aglomeração dentro de cada fronteira"""
+    distance = np.zeros(len(objectives))
+    for level in np.unique(rank):
+        members = np.flatnonzero(rank == level)
+        if members.size <= 2:
+            distance[members] = np.inf
+            continue
+        for k in range(objectives.shape[1]):
+            values = objectives[members, k]
+            order = np.argsort(values, kind="stable")
+            span = values[order[-1]] - values[order[0]]
+            distance[members[order[[0, -1]]]] = np.inf
+            if span > 0:
+                distance[members[order[1:-1]]] += (values[order[2:]] - values[order[:-2]]) / span
+    return distance
+
+
+def _survivors(objectives: np.ndarray, size: int):
+    """Seleção elitista do NSGA-II: menor rank e, no empate, maior distância de aglomeração.
+
+    Retorna os índices mantidos com seus ranks e distâncias (reusados no torneio).
+    """
+    rank = non_dominated_sort(objectives)
+    distance = crowding_distance(objectives, rank)
+    keep = np.lexsort((-distance, rank))[:size]
+    return keep, rank[keep], distance[keep]
+
+
+def _offspring(
+    problem: MatingProblem,
+    population: np.ndarray,
+    rank: np.ndarray,
+    distance: np.ndarray,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    """Torneio binário, cruzamento uniforme, mutação por troca e reparo"""
+    size, n_females = population.shape
+    a, b = rng.integers(size, size=(2, size))
+    a_wins = (rank[a] < rank[b]) | ((rank[a] == rank[b]) & (distance[a] >= distance[b]))
+    parents = population[np.where(a_wins, a, b)]
+
+    children = parents.copy()
+    mates = np.roll(parents, 1, axis=0)
+    cross = rng.random(size) < CROSSOVER_RATE
+    mask = (rng.random((size, n_females)) < 0.5) & cross[:, None]
+    children[mask] = mates[mask]
+
+    # Mutação: troca os reprodutores de pares de matrizes
+    swaps = max(1, n_females // 50)
+    rows = np.repeat(np.arange(size), swaps)
+    i = rng.integers(n_females, size=rows.size)
+    j = rng.integers(n_females, size=rows.size)
+    children[rows, i], children[rows, j] = children[rows, j], children[rows, i]
+    return problem.repair(children, rng)
+
+
+def _seed(seed: int, island: int, epoch: int) -> np.random.Generator:
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(island, epoch)))
+
+
+def evolve_island(
+    problem: MatingProblem,
+    population: Optional[np.ndarray],
+    initial_plans: np.ndarray,
+    generations: int,
+    population_size: int,
+    seed: int,
+    island: int,
+    epoch: int,
+) -> np.ndarray:
+    """Executa `generations` gerações de uma ilha (função de topo para rodar no processo filho)"""
+    rng = _seed(seed, island, epoch)
+    if population is None:
+        extra = max(population_size - len(initial_plans), 0)
+        population = np.vstack([initial_plans[:population_size], problem.random_plans(rng, extra)])
+    objectives = problem.evaluate(population)
+    rank = non_dominated_sort(objectives)
+    distance = crowding_distance(objectives, rank)
+    for _ in range(generations):
+        children = _offspring(problem, population, rank, distance, rng)
+        merged = np.vstack([population, children])
+        merged_objectives = np.vstack([objectives, problem.evaluate(children)])
+        keep, rank, distance = _survivors(merged_objectives, population_size)
+        population, objectives = merged[keep], merged_objectives[keep]
+    return population
+
+
+# Pool de processos compartilhado pela API (criado sob demanda)
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Pool com um processo por núcleo; os processos usam spawn por segurança com threads"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def shutdown_executor() -> None:
+    """Encerra o pool de processos (chamado no shutdown da aplicação)"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def pareto_front(
+    gain: np.ndarray,
+    inbreeding: np.ndarray,
+    max_females_per_male: int,
+    initial_plans: Sequence[Sequence[int]] = (),
+    seed: int = DEFAULT_SEED,
+    islands: int = ISLANDS,
+    population_size: int = POPULATION_PER_ISLAND,
+    generations: int = GENERATIONS,
+    migration_interval: int = MIGRATION_INTERVAL,
+    on_epoch: Optional[Callable[[int, int], None]] = None,
+) -> List[Dict]:
+    """Fronteira de Pareto de planos de acasalamento (ganho genético × endogamia).
+
+    `initial_plans` são planos conhecidos (ex.: distribuição gulosa ou ótima)
+    injetados em todas as ilhas; o nó "sem reprodutor" é o índice `n_males`.
+    Retorna os planos não dominados do maior para o menor ganho, cada um com
+    `assignment` (reprodutor de cada matriz ou -1), `genetic_gain` e
+    `mean_inbreeding`. `on_epoch(concluídas, total)` é chamado ao fim de cada
+    época; uma exceção lançada por ele interrompe a otimização.
+    """
+    problem = MatingProblem(gain, inbreeding, max_females_per_male)
+    initial = np.array(initial_plans, dtype=np.int64).reshape(-1, problem.n_females)
+    executor = get_executor()
+    populations: List[Optional[np.ndarray]] = [None] * islands
+    epochs = max(1, -(-generations // migration_interval))
+
+    for epoch in range(epochs):
+        span = min(migration_interval, generations - epoch * migration_interval) if generations else 0
+        futures = [
+            executor.submit(evolve_island, problem, populations[k], initial, span, population_size, seed, k, epoch)
+            for k in range(islands)
+        ]
+        try:
+            populations = [future.result() for future in futures]
+        finally:
+            for future in futures:
+                future.cancel()
+        if on_epoch is not None:
+            on_epoch(epoch + 1, epochs)
+        if islands > 1 and epoch < epochs - 1:
+            # Migração em anel: os melhores de cada ilha substituem os piores da seguinte
+            best = [p[:MIGRANTS] for p in populations]
+            for k in range(islands):
+                populations[k] = np.vstack([populations[k][:-MIGRANTS], best[k - 1]])
+
+    merged = np.unique(np.vstack(populations), axis=0)
+    objectives = problem.evaluate(merged)
+    front = np.flatnonzero(non_dominated_sort(objectives) == 0)
+    # Planos distintos podem ter os mesmos objetivos; mantém um por ponto da fronteira
+    _, unique = np.unique(objectives[front].round(9), axis=0, return_index=True)
+    front = front[unique]
+    front = front[np.argsort(objectives[front, 0], kind="stable")]
+
+    plans = []
+    for k in front:
+        assignment = np.where(merged[k] < problem.n_males, merged[k], -1)
+        plans.append({
+            "assignment": assignment,
+            "genetic_gain": float(-objectives[k, 0]),
+            "mean_inbreeding": float(objectives[k, 1]),
+        })
+    return plans
+
+
+def compromise_plan(plans: Sequence[Dict]) -> int:
+    """Plano da fronteira mais próximo do ponto ideal (objetivos normalizados)"""
+    gain = np.array([p["genetic_gain"] for p in plans])
+    inbreeding = np.array([p["mean_inbreeding"] for p in plans])
+
+    def normalize(values: np.ndarray) -> np.ndarray:
+        span = values.max() - values.min()
+        return (values - values.min()) / span if span > 0 else np.zeros_like(values)
+
+    distance = np.hypot(1 - normalize(gain), normalize(inbreeding))
+    return int(np.argmin(distance))
@@ -0,0 +1,278 @@
+"""Genealogia e coeficientes de endogamia.
+
+Carrega a genealogia de uma propriedade em arrays indexados por inteiros
+(pais sempre antes dos filhos) e calcula a endogamia exata de todos os animais
+pelo algoritmo de Meuwissen & Luo (1992). Os coeficientes ficam persistidos na
+tabela `animal_inbreeding`, de modo que novos animais são calculados de forma
+incremental a partir dos valores já gravados dos ancestrais.
+"""
+
+import math
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import insert
+from sqlmodel import Session, select, delete
+
+from app.core.pedigree_index import get_pedigree_index
+from app.models.animal import Animal
+from app.models.mating import AnimalInbreeding
+
+
+class Pedigree:
+    """Genealogia em arrays: posição 0 representa o pai/mãe desconhecido.
+
+    Os animais ocupam as posições 1..n em ordem topológica (ancestrais antes
+    dos descendentes), e `sire`/`dam` guardam a posição de cada pai.
+    """
+
+    def __init__(self, ids: np.ndarray, sire: np.ndarray, dam: np.ndarray, external: Optional[Set[int]] = None):
+        self.ids = ids
+        self.sire = sire
+        self.dam = dam
+        # Ancestrais cadastrados em outras propriedades
+        self.external: Set[int] = external or set()
+        self.position: Dict[int, int] = {int(a): i for i, a in enumerate(ids) if i > 0}
+        self._levels: Optional[List[np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return len(self.ids) - 1
+
+    def levels(self) -> List[np.ndarray]:
+        """Posições agrupadas por geração (profundidade), da mais antiga para a mais nova"""
+        if self._levels is None:
+            sire, dam = self.sire.tolist(), self.dam.tolist()
+            depth = [0] * len(sire)
+            for i in range(1, len(sire)):
+                depth[i] = max(depth[sire[i]] if sire[i] else 0, depth[dam[i]] if dam[i] else 0) + 1
+            depth_arr = np.array(depth)
+            order = np.argsort(depth_arr[1:], kind="stable") + 1
+            bounds = np.searchsorted(depth_arr[order], np.arange(1, depth_arr.max() + 2))
+            self._levels = [order[a:b] for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+        return self._levels
+
+    def descendants(self, animal_ids: Iterable[int]) -> Set[int]:
+        """IDs dos animais informados e de todos os seus descendentes"""
+        marked = [False] * len(self.ids)
+        for animal_id in animal_ids:
+            if animal_id in self.position:
+                marked[self.position[animal_id]] = True
+        # Como a ordem é topológica, uma única varredura propaga a marcação
+        sire, dam = self.sire.tolist(), self.dam.tolist()
+        for i in range(1, len(self.ids)):
+            if marked[sire[i]] or marked[dam[i]]:
+                marked[i] = True
+        return {int(a) for a in self.ids[np.array(marked)]}
+
+
+def _topological_order(ids: List[int], father: List[int], mother: List[int]) -> List[int]:
+    """Ordena os animais por geração (profundidade na genealogia)"""
+    n = len(ids)
+    pos = {a: i for i, a in enumerate(ids)}
+    s = np.array([pos.get(f, -1) if f else -1 for f in father], dtype=np.int64)
+    d = np.array([pos.get(m, -1) if m else -1 for m in mother], dtype=np.int64)
+    depth = np.zeros(n, dtype=np.int64)
+    padded = np.zeros(n + 1, dtype=np.int64)
+    # Cada iteração propaga uma geração; ciclos (erro de cadastro) são limitados a n iterações
+    for _ in range(n):
+        padded[:n] = depth
+        padded[n] = -1
+        new_depth = np.maximum(padded[s], padded[d]) + 1
+        if np.array_equal(new_depth, depth):
+            break
+        depth = new_depth
+    return list(np.argsort(depth, kind="stable"))
+
+
+def load_pedigree(session: Session, property_id: str) -> Pedigree:
+    """Carrega a genealogia completa dos animais de uma propriedade.
+
+    Pais cadastrados em outras propriedades também são incluídos, para que a
+    endogamia considere todos os ancestrais conhecidos.
+    """
+    rows = {
+        a_id: (f_id, m_id)
+        for a_id, f_id, m_id in session.exec(
+            select(Animal.id, Animal.father_id, Animal.mother_id).where(Animal.property_id == property_id)
+        ).all()
+    }
+    external: Set[int] = set()
+    missing = {p for f, m in rows.values() for p in (f, m) if p and p not in rows}
+    while missing:
+        found = session.exec(
+            select(Animal.id, Animal.father_id, Animal.mother_id).where(Animal.id.in_(missing))
+        ).all()
+        for a_id, f_id, m_id in found:
+            rows[a_id] = (f_id, m_id)
+            external.add(a_id)
+        missing = {p for _, f, m in found for p in (f, m) if p and p not in rows}
+
+    ids = list(rows)
+    father = [rows[a][0] if rows[a][0] in rows else None for a in ids]
+    mother = [rows[a][1] if rows[a][1] in rows else None for a in ids]
+    order = _topological_order(ids, father, mother)
+
+    n = len(ids)
+    ordered_ids = np.zeros(n + 1, dtype=np.int64)
+    ordered_ids[1:] = [ids[i] for i in order]
+    position = {int(a): i for i, a in enumerate(ordered_ids) if i > 0}
+    sire = np.zeros(n + 1, dtype=np.int64)
+    dam = np.zeros(n + 1, dtype=np.int64)
+    for new_pos, old_pos in enumerate(order, start=1):
+        f, m = father[old_pos], mother[old_pos]
+        sire[new_pos] = position[f] if f else 0
+        dam[new_pos] = position[m] if m else 0
+        # Registro inconsistente (pai posterior ao filho) é tratado como desconhecido
+        if sire[new_pos] >= new_pos:
+            sire[new_pos] = 0
+        if dam[new_pos] >= new_pos:
+            dam[new_pos] = 0
+    return Pedigree(ordered_ids, sire, dam, external)
+
+
+def meuwissen_luo(pedigree: Pedigree, known: Optional[np.ndarray] = None) -> np.ndarray:
+    """Coeficientes de endogamia (fração 0-1) pelo algoritmo de Meuwissen & Luo (1992).
+
+    `known` traz coeficientes já calculados (NaN para os que faltam); apenas os
+    animais sem valor são calculados, usando os valores conhecidos dos ancestrais.
+    """
+    # Listas Python são bem mais rápidas que arrays NumPy para acesso elemento a elemento
+    sire, dam = pedigree.sire.tolist(), pedigree.dam.tolist()
+    n = len(sire)
+    F = [math.nan] * n if known is None else [float(f) for f in known]
+    F[0] = -1.0
+    # Variância da amostragem mendeliana: D_i = 1/2 - 1/4 (F_s + F_d), com F = -1 para desconhecidos
+    D = [0.0] * n
+    L = [0.0] * n
+
+    for i in range(1, n):
+        s, d = sire[i], dam[i]
+        D[i] = 0.5 - 0.25 * (F[s] + F[d])
+        if not math.isnan(F[i]):
+            continue
+        if s == 0 or d == 0:
+            F[i] = 0.0
+            continue
+        if s == sire[i - 1] and d == dam[i - 1] and not math.isnan(F[i - 1]):
+            # Irmãos completos têm a mesma endogamia
+            F[i] = F[i - 1]
+            continue
+
+        # Ancestrais do animal, percorridos do mais novo para o mais antigo
+        ancestors = {i}
+        stack = [s, d]
+        while stack:
+            j = stack.pop()
+            if j and j not in ancestors:
+                ancestors.add(j)
+                stack.append(sire[j])
+                stack.append(dam[j])
+
+        # F_i = soma(L_j² D_j) - 1, onde L_j é a contribuição genética do ancestral j
+        fi = -1.0
+        L[i] = 1.0
+        for j in sorted(ancestors, reverse=True):
+            lj = L[j]
+            if lj:
+                half = 0.5 * lj
+                L[sire[j]] += half
+                L[dam[j]] += half
+                fi += lj * lj * D[j]
+                L[j] = 0.0
+        L[0] = 0.0
+        F[i] = fi
+
+    F[0] = 0.0
+    return np.array(F)
+
+
+def _stored_inbreeding(session: Session, property_id: str, pedigree: Pedigree) -> Dict[int, float]:
+    """Coeficientes já gravados para os animais da genealogia"""
+    stored = dict(session.exec(
+        select(AnimalInbreeding.animal_id, AnimalInbreeding.coefficient)
+        .join(Animal, Animal.id == AnimalInbreeding.animal_id)
+        .where(Animal.property_id == property_id)
+    ).all())
+    # Ancestrais cadastrados em outras propriedades
+    external = [a for a in pedigree.external if a not in stored]
+    if external:
+        stored.update(session.exec(
+            select(AnimalInbreeding.animal_id, AnimalInbreeding.coefficient)
+            .where(AnimalInbreeding.animal_id.in_(external))
+        ).all())
+    return {a: f for a, f in stored.items() if a in pedigree.position}
+
+
+def compute_inbreeding(session: Session, property_id: str, full: bool = False) -> Tuple[Pedigree, np.ndarray]:
+    """Atualiza a tabela de endogamia da propriedade e retorna a genealogia e F por posição.
+
+    Por padrão calcula apenas os animais ainda sem coeficiente gravado (novas
+    crias ou genealogias alteradas); `full=True` recalcula todos.
+    """
+    pedigree = load_pedigree(session, property_id)
+    stored = _stored_inbreeding(session, property_id, pedigree)
+    if full:
+        # Mantém apenas os ancestrais de outras propriedades como valores conhecidos
+        session.exec(delete(AnimalInbreeding).where(AnimalInbreeding.animal_id.in_(
+            select(Animal.id).where(Animal.property_id == property_id)
+        )))
+        stored = {a: f for a, f in stored.items() if a in pedigree.external}
+
+    known = np.full(len(pedigree.ids), np.nan)
+    for animal_id, coefficient in stored.items():
+        known[pedigree.position[animal_id]] = coefficient
+    F = meuwissen_luo(pedigree, known)
+
+    now = datetime.utcnow()
+    new_rows = [
+        {"animal_id": int(a), "coefficient": float(F[i]), "created_at": now, "updated_at": now}
+        for i, a in enumerate(pedigree.ids)
+        if i > 0 and int(a) not in stored
+    ]
+    if new_rows:
+        session.execute(insert(AnimalInbreeding), new_rows)
+    # Sem gravação não há commit: ele expiraria os objetos já carregados pela sessão do chamador
+    if full or new_rows:
+        session.commit()
+
+    return pedigree, F
+
+
+def update_inbreeding(session: Session, property_id: str, full: bool = False) -> Dict[int, float]:
+    """Atualiza a tabela de endogamia da propriedade e retorna {animal_id: F}"""
+    pedigree, F = compute_inbreeding(session, property_id, full=full)
+    return {int(a): float(F[i]) for i, a in enumerate(pedigree.ids) if i > 0}
+
+
+def invalidate_inbreeding(session: Session, property_id: str, animal_ids: Iterable[int]) -> Set[int]:
+    """Remove os coeficientes dos animais informados e de seus descendentes.
+
+    Deve ser chamado quando a genealogia de um animal muda; os valores são
+    recalculados na próxima chamada de `update_inbreeding`. Retorna os animais afetados.
+    """
+    animal_ids = list(animal_ids)
+    affected = get_pedigree_index(session, property_id).descendant_ids(animal_ids)
+    affected.update(animal_ids)
+    if affected:
+        session.exec(delete(AnimalInbreeding).where(AnimalInbreeding.animal_id.in_(affected)))
+        session.commit()
+    return affected
+
+
+def get_inbreeding(session: Session, animals: Iterable[Animal]) -> Dict[int, float]:
+    """Endogamia (fração 0-1) dos animais informados, lida da tabela persistida.
+
+    Animais ainda sem coeficiente disparam o cálculo incremental da propriedade.
+    """
+    animals = list(animals)
+    ids = [a.id for a in animals]
+    result = dict(session.exec(
+        select(AnimalInbreeding.animal_id, AnimalInbreeding.coefficient)
+        .where(AnimalInbreeding.animal_id.in_(ids))
+    ).all())
+    wanted = set(ids)
+    for property_id in {a.property_id for a in animals if a.id not in result}:
+        coefficients = update_inbreeding(session, property_id)
+        result.update({a: f for a, f in coefficients.items() if a in wanted})
+    return result
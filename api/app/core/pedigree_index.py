@@ -0,0 +1,226 @@
+"""Índice da genealogia em memória, por propriedade.
+
+Cada animal ocupa uma posição inteira; `sire`/`dam` guardam a posição dos pais
+(-1 = desconhecido) e `children` a lista de filhos de cada posição. O índice é
+carregado sob demanda (uma consulta, mais uma por geração de ancestrais
+cadastrados em outras propriedades) e mantido atualizado pelos endpoints de
+cadastro de animais, de modo que árvores de ancestrais, descendentes e a
+invalidação da endogamia não consultam o banco animal a animal.
+"""
+
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Set
+
+from sqlmodel import Session, select
+
+from app.models.animal import Animal
+
+# Colunas do cadastro exibidas nas árvores
+LABEL_FIELDS = ("earring_identification", "name", "gender")
+
+
+class PedigreeIndex:
+    """Arrays de pais e listas de filhos de uma genealogia, indexados por posição"""
+
+    def __init__(self):
+        self.ids: List[Optional[int]] = []
+        self.position: Dict[int, int] = {}
+        self.sire: List[int] = []
+        self.dam: List[int] = []
+        self.children: List[List[int]] = []
+        self.labels: List[Optional[tuple]] = []
+        self.lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.position)
+
+    def __contains__(self, animal_id: int) -> bool:
+        return animal_id in self.position
+
+    def _slot(self, animal_id: int) -> int:
+        pos = self.position.get(animal_id)
+        if pos is None:
+            pos = len(self.ids)
+            self.position[animal_id] = pos
+            self.ids.append(animal_id)
+            self.sire.append(-1)
+            self.dam.append(-1)
+            self.children.append([])
+            self.labels.append(None)
+        return pos
+
+    def set_animal(self, animal_id: int, father_id: Optional[int], mother_id: Optional[int], label: tuple) -> None:
+        """Inclui ou atualiza um animal e seus pais (pais ausentes do índice viram posições sem cadastro)"""
+        with self.lock:
+            pos = self._slot(animal_id)
+            self._detach(pos)
+            self.labels[pos] = label
+            for parents, parent_id in ((self.sire, father_id), (self.dam, mother_id)):
+                if parent_id is None or parent_id == animal_id:
+                    continue
+                parent = self._slot(parent_id)
+                parents[pos] = parent
+                self.children[parent].append(pos)
+
+    def remove(self, animal_id: int) -> None:
+        """Retira o animal; os filhos passam a ter o pai/mãe desconhecido"""
+        with self.lock:
+            pos = self.position.pop(animal_id, None)
+            if pos is None:
+                return
+            self._detach(pos)
+            for child in self.children[pos]:
+                if self.sire[child] == pos:
+                    self.sire[child] = -1
+                if self.dam[child] == pos:
+                    self.dam[child] = -1
+            self.children[pos] = []
+            self.ids[pos] = None
+            self.labels[pos] = None
+
+    def _detach(self, pos: int) -> None:
+        for parents in (self.sire, self.dam):
+            parent = parents[pos]
+            if parent >= 0:
+                self.children[parent].remove(pos)
+                parents[pos] = -1
+
+    def _node(self, pos: int) -> dict:
+        label = self.labels[pos] or (None,) * len(LABEL_FIELDS)
+        return {"id": self.ids[pos], **dict(zip(LABEL_FIELDS, label))}
+
+    def ancestors(self, animal_id: int, generations: int) -> Optional[dict]:
+        """Árvore de ancestrais até `generations` gerações acima (pai e mãe aninhados)"""
+        with self.lock:
+            pos = self.position.get(animal_id)
+            if pos is None:
+                return None
+
+            def tree(p: int, depth: int) -> dict:
+                node = self._node(p)
+                for key, parents in (("father", self.sire), ("mother", self.dam)):
+                    parent = parents[p]
+                    node[key] = tree(parent, depth + 1) if parent >= 0 and depth < generations else None
+                return node
+
+            return tree(pos, 0)
+
+    def descendants(self, animal_id: int, generations: Optional[int] = None) -> List[dict]:
+        """Descendentes em largura, com a geração de cada um (1 = filhos)"""
+        with self.lock:
+            pos = self.position.get(animal_id)
+            if pos is None:
+                return []
+            seen = {pos}
+            queue = deque([(pos, 0)])
+            result = []
+            while queue:
+                p, depth = queue.popleft()
+                if generations is not None and depth >= generations:
+                    continue
+                for child in self.children[p]:
+                    if child in seen:
+                        continue
+                    seen.add(child)
+                    node = self._node(child)
+                    node["generation"] = depth + 1
+                    node["father_id"] = self.ids[self.sire[child]] if self.sire[child] >= 0 else None
+                    node["mother_id"] = self.ids[self.dam[child]] if self.dam[child] >= 0 else None
+                    result.append(node)
+                    queue.append((child, depth + 1))
+            return result
+
+    def descendant_ids(self, animal_ids) -> Set[int]:
+        """IDs de todos os descendentes dos animais informados (sem incluí-los)"""
+        with self.lock:
+            stack = [self.position[a] for a in animal_ids if a in self.position]
+            seen: Set[int] = set()
+            while stack:
+                for child in self.children[stack.pop()]:
+                    if child not in seen:
+                        seen.add(child)
+                        stack.append(child)
+            return {self.ids[p] for p in seen}
+
+    def offspring_ids(self, animal_id: int) -> List[int]:
+        with self.lock:
+            pos = self.position.get(animal_id)
+            return [self.ids[c] for c in self.children[pos]] if pos is not None else []
+
+
+def _label(row) -> tuple:
+    return tuple(getattr(row, field) for field in LABEL_FIELDS)
+
+
+def load_pedigree_index(session: Session, property_id: str) -> PedigreeIndex:
+    """Monta o índice da propriedade, incluindo ancestrais cadastrados em outras propriedades"""
+    columns = (Animal.id, Animal.father_id, Animal.mother_id, *(getattr(Animal, f) for f in LABEL_FIELDS))
+    index = PedigreeIndex()
+    rows = session.exec(select(*columns).where(Animal.property_id == property_id)).all()
+    requested: Set[int] = set()
+    while rows:
+        for row in rows:
+            index.set_animal(row.id, row.father_id, row.mother_id, _label(row))
+        # Pais ainda sem cadastro no índice (outras propriedades)
+        missing = [a for a, pos in index.position.items() if index.labels[pos] is None and a not in requested]
+        requested.update(missing)
+        rows = session.exec(select(*columns).where(Animal.id.in_(missing))).all() if missing else []
+    # Pais que não existem mais no cadastro são tratados como desconhecidos
+    for animal_id in [a for a, pos in index.position.items() if index.labels[pos] is None]:
+        index.remove(animal_id)
+    return index
+
+
+# Índices carregados, por propriedade
+_indexes: Dict[str, PedigreeIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_pedigree_index(session: Session, property_id: str) -> PedigreeIndex:
+    """Índice da genealogia da propriedade, carregado na primeira consulta e mantido em memória"""
+    with _indexes_lock:
+        index = _indexes.get(property_id)
+    if index is None:
+        index = load_pedigree_index(session, property_id)
+        with _indexes_lock:
+            index = _indexes.setdefault(property_id, index)
+    return index
+
+
+def index_animal(animal: Animal, previous_property_id: Optional[str] = None) -> None:
+    """Atualiza os índices carregados após inclusão ou alteração de um animal.
+
+    Se um pai ainda não está no índice (ex.: cadastrado em outra propriedade),
+    o índice é descartado e recarregado na próxima consulta.
+    """
+    with _indexes_lock:
+        if previous_property_id and previous_property_id != animal.property_id:
+            old = _indexes.get(previous_property_id)
+            if old is not None and animal.id in old:
+                # O animal passa a ser ancestral externo: mais simples recarregar
+                _indexes.pop(previous_property_id, None)
+        for property_id, index in list(_indexes.items()):
+            if property_id != animal.property_id and animal.id not in index:
+                continue
+            parents = [p for p in (animal.father_id, animal.mother_id) if p is not None]
+            if any(p not in index for p in parents):
+                _indexes.pop(property_id, None)
+                continue
+            index.set_animal(animal.id, animal.father_id, animal.mother_id, _label(animal))
+
+
+def unindex_animal(animal_id: int) -> None:
+    """Retira o animal excluído de todos os índices carregados"""
+    with _indexes_lock:
+        for index in _indexes.values():
+            index.remove(animal_id)
+
+
+def clear_pedigree_index(property_id: Optional[str] = None) -> None:
+    """Descarta os índices (de uma propriedade ou de todos), ex.: após importação direta no banco"""
+    with _indexes_lock:
+        if property_id:
+            _indexes.pop(property_id, None)
+        else:
+            _indexes.clear()
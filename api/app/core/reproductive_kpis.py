@@ -0,0 +1,167 @@
+"""Indicadores de eficiência reprodutiva.
+
+Todos os manejos reprodutivos do rebanho são lidos em uma consulta e
+convertidos em arrays; cada manejo recebe seus valores (parto, número de crias,
+desmame, intervalo desde o parto anterior da matriz, idade da matriz no
+primeiro parto) e os indicadores são somados com `np.bincount` por matriz,
+reprodutor, ano e rebanho, sem laços por registro.
+
+- Fertilidade: partos / coberturas concluídas (parição "sim" ou "não"), em %
+- Prolificidade: crias por parto (tipo de parto simples=1 ... quadruplo=4)
+- Desmame: partos com data de desmame / partos, em %
+- Intervalo entre partos: dias entre partos consecutivos da matriz (atribuído
+  ao segundo parto)
+- Idade ao primeiro parto: meses entre o nascimento da matriz e o primeiro parto
+  registrado
+
+O ano de cada manejo é o da cobertura. Os resultados ficam em cache por
+rebanho e versão dos dados (app.core.herd_versions).
+"""
+
+import threading
+from typing import Dict, List, Tuple
+
+import numpy as np
+from sqlmodel import Session, select
+
+from app.core.herd_versions import herd_data_version
+from app.models.animal import Animal
+from app.models.reproductive_management import ReproductiveManagement
+
+# Crias por tipo de parto
+LITTER_SIZE = {"simples": 1, "duplo": 2, "triplo": 3, "quadruplo": 4}
+
+DAYS_PER_MONTH = 30.4375
+
+
+def _day_numbers(values) -> np.ndarray:
+    """Datas como número de dias (NaN quando ausente)"""
+    return np.array([v.toordinal() if v is not None else np.nan for v in values], dtype=float)
+
+
+def _aggregate(keys: np.ndarray, columns: Dict[str, np.ndarray]) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Soma de cada coluna e contagem de valores válidos por chave (valores NaN são ignorados)"""
+    labels, group = np.unique(keys, return_inverse=True)
+    totals = {}
+    for name, values in columns.items():
+        valid = ~np.isnan(values)
+        totals[name] = np.bincount(group[valid], weights=values[valid], minlength=len(labels))
+        totals[name + "_n"] = np.bincount(group[valid], minlength=len(labels))
+    return labels, totals
+
+
+def _indicators(totals: Dict[str, np.ndarray], k: int) -> Dict:
+    def mean(name: str, digits: int = 2):
+        n = totals[name + "_n"][k]
+        return round(float(totals[name][k] / n), digits) if n else None
+
+    def rate(numerator: str, denominator: str):
+        d = totals[denominator][k]
+        return round(float(totals[numerator][k] / d * 100), 2) if d else None
+
+    return {
+        "coverages": int(totals["coverage_n"][k]),
+        "concluded_coverages": int(totals["concluded"][k]),
+        "kiddings": int(totals["kidding"][k]),
+        "kids_born": int(totals["kids"][k]),
+        "weaned": int(totals["weaned"][k]),
+        "fertility_rate": rate("kidding", "concluded"),
+        "prolificacy": mean("kids"),
+        "weaning_rate": rate("weaned", "kidding"),
+        "kidding_interval_days": mean("interval", 1),
+        "age_at_first_kidding_months": mean("first_age", 1),
+    }
+
+
+def compute_reproductive_kpis(session: Session, herd_id: str) -> Dict:
+    """Indicadores do rebanho: geral, por ano, por reprodutor e por matriz"""
+    rows = session.exec(
+        select(
+            ReproductiveManagement.dam_id,
+            ReproductiveManagement.sire_id,
+            ReproductiveManagement.coverage_date,
+            ReproductiveManagement.parturition_status,
+            ReproductiveManagement.birth_date,
+            ReproductiveManagement.childbirth_type,
+            ReproductiveManagement.weaning_date,
+            Animal.birth_date,
+        )
+        .outerjoin(Animal, Animal.id == ReproductiveManagement.dam_id)
+        .where(ReproductiveManagement.herd_id == herd_id)
+    ).all()
+    if not rows:
+        return {"herd": None, "by_year": [], "by_sire": [], "by_dam": []}
+
+    dam, sire, coverage, status, birth, litter, weaning, dam_birth = zip(*rows)
+    dam = np.array(dam, dtype=np.int64)
+    sire = np.array(sire, dtype=np.int64)
+    year = np.array([c.year for c in coverage], dtype=np.int64)
+    status = np.array(status, dtype=object)
+    kidded = status == "sim"
+    birth_day = np.where(kidded, _day_numbers(birth), np.nan)
+
+    # Intervalo entre partos: partos ordenados por matriz e data, diferença entre vizinhos da mesma matriz
+    interval = np.full(len(rows), np.nan)
+    first_age = np.full(len(rows), np.nan)
+    births = np.flatnonzero(~np.isnan(birth_day))
+    if len(births):
+        births = births[np.lexsort((birth_day[births], dam[births]))]
+        same_dam = dam[births][1:] == dam[births][:-1]
+        interval[births[1:][same_dam]] = np.diff(birth_day[births])[same_dam]
+        first = births[np.concatenate([[True], ~same_dam])]
+        first_age[first] = (birth_day[first] - _day_numbers([dam_birth[i] for i in first])) / DAYS_PER_MONTH
+
+    columns = {
+        "coverage": np.ones(len(rows)),
+        "concluded": np.where(np.isin(status, ("sim", "não")), 1.0, 0.0),
+        "kidding": kidded.astype(float),
+        "kids": np.array([LITTER_SIZE.get(t, 1) if k else np.nan for t, k in zip(litter, kidded)], dtype=float),
+        "weaned": np.array([1.0 if k and w is not None else 0.0 for w, k in zip(weaning, kidded)]),
+        "interval": interval,
+        "first_age": first_age,
+    }
+
+    def grouped(keys: np.ndarray, key_name: str) -> List[Dict]:
+        labels, totals = _aggregate(keys, columns)
+        return [{key_name: int(label), **_indicators(totals, k)} for k, label in enumerate(labels)]
+
+    _, herd_totals = _aggregate(np.zeros(len(rows), dtype=np.int64), columns)
+    by_sire = grouped(sire, "sire_id")
+    by_dam = grouped(dam, "dam_id")
+
+    # Identificação de reprodutores e matrizes em uma consulta
+    ids = {row["sire_id"] for row in by_sire} | {row["dam_id"] for row in by_dam}
+    labels = {
+        animal_id: (earring, name)
+        for animal_id, earring, name in session.exec(
+            select(Animal.id, Animal.earring_identification, Animal.name).where(Animal.id.in_(ids))
+        ).all()
+    }
+    for key, items in (("sire_id", by_sire), ("dam_id", by_dam)):
+        for row in items:
+            row["earring_identification"], row["name"] = labels.get(row[key], (None, None))
+
+    return {
+        "herd": _indicators(herd_totals, 0),
+        "by_year": grouped(year, "year"),
+        "by_sire": by_sire,
+        "by_dam": by_dam,
+    }
+
+
+# Indicadores por rebanho: herd_id -> (versão dos dados, resultado)
+_kpi_cache: Dict[str, Tuple[int, Dict]] = {}
+_kpi_cache_lock = threading.Lock()
+
+
+def get_reproductive_kpis(session: Session, herd_id: str) -> Dict:
+    """Indicadores do rebanho, recalculados apenas quando a versão dos dados muda"""
+    version = herd_data_version(session, herd_id)
+    with _kpi_cache_lock:
+        cached = _kpi_cache.get(herd_id)
+    if cached is not None and cached[0] == version:
+        return {**cached[1], "data_version": version, "cached": True}
+    result = compute_reproductive_kpis(session, herd_id)
+    with _kpi_cache_lock:
+        _kpi_cache[herd_id] = (version, result)
+    return {**result, "data_version": version, "cached": False}
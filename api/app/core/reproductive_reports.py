@@ -0,0 +1,166 @@
+"""Relatórios reprodutivos do módulo de acasalamento.
+
+Cada relatório é uma única consulta: a previsão de partos resolve os nomes de
+matriz e reprodutor por join, e as coberturas por reprodutor usam agregação
+condicional sobre `ReproductiveManagement` agrupada por `sire_id`. O resumo por
+reprodutor também pode ser lido de `reproducer_coverage_summary`, recalculado
+no máximo uma vez por dia para cada rebanho.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import case, insert
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, and_, delete, func, select
+
+from app.models.animal import Animal
+from app.models.reproductive_management import ReproducerCoverageSummary, ReproductiveManagement
+
+# Duração média da gestação de caprinos e ovinos (dias)
+GESTATION_DAYS = 152
+
+# Categorias consideradas reprodutores no relatório de coberturas
+REPRODUCER_CATEGORIES = ("reprodutor", "marrão")
+
+
+def birth_predictions(
+    session: Session,
+    herd_id: str,
+    coverage_from: Optional[date] = None,
+    coverage_to: Optional[date] = None,
+    birth_from: Optional[date] = None,
+    birth_to: Optional[date] = None,
+) -> List[Dict]:
+    """Coberturas em andamento com data prevista de parto, filtráveis por data de cobertura ou de parto"""
+    Sire = aliased(Animal)
+    Dam = aliased(Animal)
+    statement = (
+        select(
+            ReproductiveManagement.id,
+            ReproductiveManagement.dam_id,
+            Dam.name,
+            ReproductiveManagement.sire_id,
+            Sire.name,
+            ReproductiveManagement.coverage_date,
+        )
+        .outerjoin(Dam, Dam.id == ReproductiveManagement.dam_id)
+        .outerjoin(Sire, Sire.id == ReproductiveManagement.sire_id)
+        .where(ReproductiveManagement.herd_id == herd_id)
+        .where(ReproductiveManagement.parturition_status == "em_andamento")
+        .order_by(ReproductiveManagement.coverage_date, ReproductiveManagement.id)
+    )
+    # A janela de parto vira janela de cobertura, para usar o índice de coverage_date
+    gestation = timedelta(days=GESTATION_DAYS)
+    if birth_from is not None:
+        coverage_from = max(filter(None, (coverage_from, birth_from - gestation)))
+    if birth_to is not None:
+        coverage_to = min(filter(None, (coverage_to, birth_to - gestation)))
+    if coverage_from is not None:
+        statement = statement.where(ReproductiveManagement.coverage_date >= coverage_from)
+    if coverage_to is not None:
+        statement = statement.where(ReproductiveManagement.coverage_date <= coverage_to)
+
+    today = date.today()
+    predictions = []
+    for management_id, dam_id, dam_name, sire_id, sire_name, coverage_date in session.exec(statement).all():
+        predicted_date = coverage_date + gestation
+        predictions.append({
+            "reproductive_management_id": management_id,
+            "dam_id": dam_id,
+            "dam_name": dam_name,
+            "sire_id": sire_id,
+            "sire_name": sire_name,
+            "coverage_date": coverage_date,
+            "predicted_birth_date": predicted_date,
+            "days_until_birth": (predicted_date - today).days,
+        })
+    return predictions
+
+
+def _coverage_row(sire_id: int, sire_name: Optional[str], coverages: int, births: int, ongoing: int) -> Dict:
+    coverages, births, ongoing = coverages or 0, births or 0, ongoing or 0
+    return {
+        "sire_id": sire_id,
+        "sire_name": sire_name,
+        "total_coverages": coverages,
+        "total_births": births,
+        "total_ongoing": ongoing,
+        "birth_rate": round(births / coverages * 100, 2) if coverages > 0 else 0.0,
+    }
+
+
+def coverage_by_reproducer(
+    session: Session,
+    herd_id: str,
+    coverage_from: Optional[date] = None,
+    coverage_to: Optional[date] = None,
+) -> List[Dict]:
+    """Coberturas, partos e gestações em andamento de cada reprodutor do rebanho, em uma consulta"""
+    join_on = [ReproductiveManagement.sire_id == Animal.id]
+    if coverage_from is not None:
+        join_on.append(ReproductiveManagement.coverage_date >= coverage_from)
+    if coverage_to is not None:
+        join_on.append(ReproductiveManagement.coverage_date <= coverage_to)
+    rows = session.exec(
+        select(
+            Animal.id,
+            Animal.name,
+            func.count(ReproductiveManagement.id),
+            func.sum(case((ReproductiveManagement.parturition_status == "sim", 1), else_=0)),
+            func.sum(case((ReproductiveManagement.parturition_status == "em_andamento", 1), else_=0)),
+        )
+        .outerjoin(ReproductiveManagement, and_(*join_on))
+        .where(Animal.herd_id == herd_id)
+        .where(Animal.gender == "M")
+        .where(Animal.category.in_(REPRODUCER_CATEGORIES))
+        .group_by(Animal.id, Animal.name)
+        .order_by(Animal.id)
+    ).all()
+    return [_coverage_row(*row) for row in rows]
+
+
+def refresh_coverage_summary(session: Session, herd_id: str) -> int:
+    """Recalcula o resumo de coberturas por reprodutor do rebanho; retorna o número de reprodutores"""
+    rows = coverage_by_reproducer(session, herd_id)
+    now = datetime.utcnow()
+    session.exec(delete(ReproducerCoverageSummary).where(ReproducerCoverageSummary.herd_id == herd_id))
+    if rows:
+        session.execute(insert(ReproducerCoverageSummary), [
+            {
+                "herd_id": herd_id,
+                "sire_id": row["sire_id"],
+                "total_coverages": row["total_coverages"],
+                "total_births": row["total_births"],
+                "total_ongoing": row["total_ongoing"],
+                "refreshed_on": now.date(),
+                "created_at": now,
+                "updated_at": now,
+            }
+            for row in rows
+        ])
+    session.commit()
+    return len(rows)
+
+
+def precomputed_coverage_by_reproducer(session: Session, herd_id: str) -> List[Dict]:
+    """Resumo pré-calculado do rebanho, recalculado se ainda não foi atualizado hoje"""
+    refreshed_on = session.exec(
+        select(func.max(ReproducerCoverageSummary.refreshed_on))
+        .where(ReproducerCoverageSummary.herd_id == herd_id)
+    ).first()
+    if refreshed_on != date.today():
+        refresh_coverage_summary(session, herd_id)
+    rows = session.exec(
+        select(
+            ReproducerCoverageSummary.sire_id,
+            Animal.name,
+            ReproducerCoverageSummary.total_coverages,
+            ReproducerCoverageSummary.total_births,
+            ReproducerCoverageSummary.total_ongoing,
+        )
+        .outerjoin(Animal, Animal.id == ReproducerCoverageSummary.sire_id)
+        .where(ReproducerCoverageSummary.herd_id == herd_id)
+        .order_by(ReproducerCoverageSummary.sire_id)
+    ).all()
+    return [_coverage_row(*row) for row in rows]
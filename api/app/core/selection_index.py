@@ -0,0 +1,325 @@
+"""Índice de seleção multicaracterística.
+
+O objetivo de seleção é o agregado genotípico H = w'g, em que w são os pesos
+econômicos das características. Com os fenótipos x medidos no animal, o índice
+I = b'(x - média), com b = P⁻¹Gw, é o preditor linear de H de maior correlação:
+
+- P: covariância fenotípica entre as características, estimada no rebanho com
+  todos os pares de registros disponíveis (produtos matriciais sobre a matriz
+  de fenótipos com ausências);
+- G: covariância genética, G_ij = r_g,ij · h_i·σ_i · h_j·σ_j. Sem correlações
+  genéticas informadas usa-se a correlação fenotípica (conjectura de Cheverud).
+
+Animais sem alguma característica recebem o índice reduzido às medidas que
+têm (b_s = P_ss⁻¹ G_s· w). Os pesos são calculados uma vez por padrão de
+ausências e cada grupo de animais é pontuado com um único produto matricial;
+a acurácia é r_IH = √(b'Pb / w'Gw).
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlmodel import Session, func, select
+
+from app.models.animal import Animal
+from app.models.animal_measurements import BodyMeasurement, CarcassMeasurement, ParasiteRecord
+from app.models.mating import AnimalGeneticEvaluation
+from app.models.reproductive_management import ReproductiveManagement
+
+WEIGHT_TRAITS = {
+    "weight_60d": ("Peso ajustado aos 60 dias (kg)", 0.20, AnimalGeneticEvaluation.adjusted_weight_60d),
+    "weight_120d": ("Peso ajustado aos 120 dias (kg)", 0.25, AnimalGeneticEvaluation.adjusted_weight_120d),
+    "weight_180d": ("Peso ajustado aos 180 dias (kg)", 0.30, AnimalGeneticEvaluation.adjusted_weight_180d),
+}
+
+# Medidas da última avaliação do animal: coluna -> (descrição, h² padrão)
+BODY_TRAITS = {
+    "ag": ("Altura de garupa (cm)", 0.30),
+    "ac": ("Altura de cernelha (cm)", 0.30),
+    "ap": ("Altura de peito (cm)", 0.30),
+    "cc": ("Comprimento corporal (cm)", 0.30),
+    "pc": ("Perímetro de canela (cm)", 0.30),
+    "perpe": ("Perímetro da perna (cm)", 0.30),
+    "cpern": ("Comprimento da perna (cm)", 0.30),
+    "co": ("Comprimento de orelha (cm)", 0.30),
+    "ct": ("Comprimento de tronco (cm)", 0.30),
+    "lr": ("Largura de rump (cm)", 0.30),
+    "ccab": ("Comprimento de cabeça (cm)", 0.30),
+    "lil": ("Largura de ilíaco longitudinal (cm)", 0.30),
+    "lis": ("Largura de ilíaco superior (cm)", 0.30),
+    "ccau": ("Comprimento de cauda (cm)", 0.30),
+    "cga": ("Comprimento de garupa (cm)", 0.30),
+    "pcau": ("Perímetro de cauda (cm)", 0.30),
+}
+CARCASS_TRAITS = {
+    "aol": ("Área de olho de lombo", 0.30),
+    "col": ("Comprimento de olho de lombo", 0.30),
+    "pol": ("Profundidade de olho de lombo", 0.30),
+    "mol": ("Medida de olho de lombo", 0.30),
+    "egs": ("Espessura de gordura subcutânea", 0.25),
+    "egbf": ("Espessura de gordura de braço de fêmur", 0.25),
+    "ege": ("Espessura de gordura esternal", 0.25),
+}
+
+# Catálogo: nome -> (descrição, h² padrão)
+TRAITS: Dict[str, Tuple[str, float]] = {
+    **{name: (label, h2) for name, (label, h2, _) in WEIGHT_TRAITS.items()},
+    "scrotal_perimeter": ("Perímetro escrotal (cm), último registrado na cobertura", 0.35),
+    "log_opg": ("Verminose: log(OPG + 1), média dos exames", 0.20),
+    "famacha": ("FAMACHA, média dos exames", 0.20),
+    **{f"body_{column}": (label, h2) for column, (label, h2) in BODY_TRAITS.items()},
+    **{f"carcass_{column}": (label, h2) for column, (label, h2) in CARCASS_TRAITS.items()},
+}
+
+# Registros mínimos de cada característica para estimar a variância
+MIN_RECORDS = 3
+
+
+def _latest_rows(session: Session, model, columns: List[str], herd_animals) -> List[tuple]:
+    """Última medição (por data) de cada animal do rebanho, apenas as colunas pedidas"""
+    latest = (
+        select(
+            model.animal_id,
+            *[getattr(model, column) for column in columns],
+            func.row_number().over(
+                partition_by=model.animal_id,
+                order_by=(model.measurement_date.desc(), model.id.desc()),
+            ).label("position"),
+        )
+        .where(model.animal_id.in_(herd_animals))
+        .subquery()
+    )
+    return session.exec(
+        select(latest.c.animal_id, *[latest.c[column] for column in columns]).where(latest.c.position == 1)
+    ).all()
+
+
+def load_trait_matrix(session: Session, herd_id: str, traits: Sequence[str]) -> Tuple[List[tuple], np.ndarray]:
+    """Animais ativos do rebanho (id, sexo, brinco, nome) e matriz animais × características (NaN = sem registro).
+
+    Uma consulta por tabela de origem, independentemente do número de animais.
+    """
+    animals = session.exec(
+        select(Animal.id, Animal.gender, Animal.earring_identification, Animal.name)
+        .where(Animal.herd_id == herd_id)
+        .where(Animal.status == "ativo")
+        .order_by(Animal.id)
+    ).all()
+    herd_animals = select(Animal.id).where(Animal.herd_id == herd_id).where(Animal.status == "ativo")
+    position = {row[0]: i for i, row in enumerate(animals)}
+    column = {trait: j for j, trait in enumerate(traits)}
+    X = np.full((len(animals), len(traits)), np.nan)
+
+    def fill(names: Sequence[str], rows) -> None:
+        for animal_id, *values in rows:
+            i = position.get(animal_id)
+            if i is None:
+                continue
+            for name, value in zip(names, values):
+                if value is not None:
+                    X[i, column[name]] = value
+
+    weights = [trait for trait in traits if trait in WEIGHT_TRAITS]
+    if weights:
+        fill(weights, session.exec(
+            select(AnimalGeneticEvaluation.animal_id, *[WEIGHT_TRAITS[trait][2] for trait in weights])
+            .where(AnimalGeneticEvaluation.animal_id.in_(herd_animals))
+        ).all())
+
+    for prefix, model, catalog in (("body_", BodyMeasurement, BODY_TRAITS), ("carcass_", CarcassMeasurement, CARCASS_TRAITS)):
+        selected = [trait for trait in traits if trait.startswith(prefix) and trait[len(prefix):] in catalog]
+        if selected:
+            fill(selected, _latest_rows(session, model, [trait[len(prefix):] for trait in selected], herd_animals))
+
+    if "scrotal_perimeter" in column:
+        latest = (
+            select(
+                ReproductiveManagement.sire_id,
+                ReproductiveManagement.sire_scrotal_perimeter,
+                func.row_number().over(
+                    partition_by=ReproductiveManagement.sire_id,
+                    order_by=(ReproductiveManagement.coverage_date.desc(), ReproductiveManagement.id.desc()),
+                ).label("position"),
+            )
+            .where(ReproductiveManagement.sire_id.in_(herd_animals))
+            .where(ReproductiveManagement.sire_scrotal_perimeter.is_not(None))
+            .subquery()
+        )
+        fill(["scrotal_perimeter"], session.exec(
+            select(latest.c.sire_id, latest.c.sire_scrotal_perimeter).where(latest.c.position == 1)
+        ).all())
+
+    parasite = [trait for trait in ("log_opg", "famacha") if trait in column]
+    if parasite:
+        # Média dos exames de cada animal, somada com bincount
+        rows = session.exec(
+            select(ParasiteRecord.animal_id, ParasiteRecord.opg, ParasiteRecord.famacha)
+            .where(ParasiteRecord.animal_id.in_(herd_animals))
+        ).all()
+        if rows:
+            rows = [row for row in rows if row[0] in position]
+            index = np.array([position[row[0]] for row in rows], dtype=np.int64)
+            values = {
+                "log_opg": np.log1p(np.array([row[1] if row[1] is not None else np.nan for row in rows], dtype=float)),
+                "famacha": np.array([row[2] if row[2] is not None else np.nan for row in rows], dtype=float),
+            }
+            for trait in parasite:
+                valid = ~np.isnan(values[trait])
+                count = np.bincount(index[valid], minlength=len(animals))
+                total = np.bincount(index[valid], weights=values[trait][valid], minlength=len(animals))
+                X[count > 0, column[trait]] = total[count > 0] / count[count > 0]
+
+    return animals, X
+
+
+def phenotypic_covariance(X: np.ndarray, traits: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Médias e covariância fenotípica com todos os pares de registros disponíveis.
+
+    Pares de características com menos de MIN_RECORDS animais em comum são
+    tratados como não correlacionados; a matriz é corrigida para ser definida positiva.
+    """
+    valid = ~np.isnan(X)
+    counts = valid.sum(axis=0)
+    missing = [trait for trait, n in zip(traits, counts) if n < MIN_RECORDS]
+    if missing:
+        raise ValueError(f"Registros insuficientes (mínimo {MIN_RECORDS} animais) para: {', '.join(missing)}")
+
+    Z = np.where(valid, X, 0.0)
+    V = valid.astype(float)
+    n = V.T @ V  # animais com as duas características
+    sums = Z.T @ V  # soma de x_i nos animais que também têm x_j
+    products = Z.T @ Z
+    with np.errstate(divide="ignore", invalid="ignore"):
+        P = (products - sums * sums.T / n) / (n - 1)
+    P[n < MIN_RECORDS] = 0.0
+    if np.any(np.diag(P) <= 0):
+        constant = [trait for trait, variance in zip(traits, np.diag(P)) if variance <= 0]
+        raise ValueError(f"Características sem variação no rebanho: {', '.join(constant)}")
+
+    values, vectors = np.linalg.eigh(P)
+    floor = 1e-6 * values.max()
+    if values.min() < floor:
+        P = (vectors * np.maximum(values, floor)) @ vectors.T
+    means = Z.sum(axis=0) / counts
+    return means, P
+
+
+def genetic_covariance(
+    P: np.ndarray,
+    heritabilities: np.ndarray,
+    correlations: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """G_ij = r_g,ij · h_i·σ_i · h_j·σ_j (correlação fenotípica quando r_g não é informada)"""
+    sd = np.sqrt(np.diag(P))
+    if correlations is None:
+        correlations = P / np.outer(sd, sd)
+    correlations = np.array(correlations, dtype=float)
+    np.fill_diagonal(correlations, 1.0)
+    genetic_sd = np.sqrt(heritabilities) * sd
+    return correlations * np.outer(genetic_sd, genetic_sd)
+
+
+def index_weights(P: np.ndarray, G: np.ndarray, w: np.ndarray) -> np.ndarray:
+    """b = P⁻¹Gw"""
+    return np.linalg.solve(P, G @ w)
+
+
+def score(
+    X: np.ndarray,
+    means: np.ndarray,
+    P: np.ndarray,
+    G: np.ndarray,
+    w: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Índice e acurácia de todos os animais (NaN para quem não tem nenhuma característica)"""
+    measured = ~np.isnan(X)
+    deviations = np.where(measured, X - means, 0.0)
+    target_variance = float(w @ G @ w)
+    index = np.full(len(X), np.nan)
+    accuracy = np.full(len(X), np.nan)
+    if len(X) == 0:
+        return index, accuracy
+    patterns, group = np.unique(measured, axis=0, return_inverse=True)
+    group = group.reshape(-1)
+    for p, pattern in enumerate(patterns):
+        if not pattern.any():
+            continue
+        rows = group == p
+        s = np.flatnonzero(pattern)
+        P_s = P[np.ix_(s, s)]
+        b = np.linalg.solve(P_s, G[s] @ w)
+        index[rows] = deviations[np.ix_(rows, s)] @ b
+        if target_variance > 0:
+            accuracy[rows] = np.sqrt(max(float(b @ P_s @ b), 0.0) / target_variance)
+    return index, accuracy
+
+
+def build_index(
+    session: Session,
+    herd_id: str,
+    traits: Sequence[str],
+    economic_weights: Sequence[float],
+    heritabilities: Sequence[Optional[float]],
+    genetic_correlations: Optional[Sequence[Sequence[float]]] = None,
+) -> Dict:
+    """Estima P e G no rebanho e calcula b; retorna os componentes a gravar na definição do índice"""
+    unknown = [trait for trait in traits if trait not in TRAITS]
+    if unknown:
+        raise ValueError(f"Características desconhecidas: {', '.join(unknown)}")
+    if len(set(traits)) != len(traits):
+        raise ValueError("Características repetidas")
+    k = len(traits)
+    if genetic_correlations is not None:
+        correlations = np.array(genetic_correlations, dtype=float)
+        if correlations.shape != (k, k) or not np.allclose(correlations, correlations.T) or np.abs(correlations).max() > 1:
+            raise ValueError(f"genetic_correlations deve ser uma matriz simétrica {k}×{k} com valores entre -1 e 1")
+    else:
+        correlations = None
+
+    h2 = np.array([
+        value if value is not None else TRAITS[trait][1]
+        for trait, value in zip(traits, heritabilities)
+    ])
+    _, X = load_trait_matrix(session, herd_id, traits)
+    means, P = phenotypic_covariance(X, traits)
+    G = genetic_covariance(P, h2, correlations)
+    w = np.array(economic_weights, dtype=float)
+    return {
+        "traits": list(traits),
+        "economic_weights": w.tolist(),
+        "heritabilities": h2.tolist(),
+        "genetic_correlations": correlations.tolist() if correlations is not None else None,
+        "means": means.tolist(),
+        "phenotypic_covariance": P.tolist(),
+        "genetic_covariance": G.tolist(),
+        "index_weights": index_weights(P, G, w).tolist(),
+        "records": int((~np.isnan(X)).any(axis=1).sum()),
+    }
+
+
+def rank_herd(
+    session: Session,
+    herd_id: str,
+    traits: Sequence[str],
+    means: Sequence[float],
+    P: Sequence[Sequence[float]],
+    G: Sequence[Sequence[float]],
+    economic_weights: Sequence[float],
+) -> List[Dict]:
+    """Índice de todos os animais ativos do rebanho, em ordem decrescente (sem registros ao final)"""
+    animals, X = load_trait_matrix(session, herd_id, traits)
+    index, accuracy = score(X, np.array(means), np.array(P), np.array(G), np.array(economic_weights))
+    measured = (~np.isnan(X)).sum(axis=1)
+    order = np.lexsort((np.array([row[0] for row in animals]), -np.nan_to_num(index, nan=-np.inf)))
+    return [
+        {
+            "animal_id": animals[i][0],
+            "gender": animals[i][1],
+            "earring_identification": animals[i][2],
+            "name": animals[i][3],
+            "selection_index": round(float(index[i]), 4) if not np.isnan(index[i]) else None,
+            "accuracy": round(float(accuracy[i]), 3) if not np.isnan(accuracy[i]) else None,
+            "measured_traits": int(measured[i]),
+        }
+        for i in order
+    ]
@@ -0,0 +1,246 @@
+"""Componentes de variância e herdabilidade por REML (modelo animal).
+
+Mesmo modelo da avaliação BLUP (app.core.blup): peso padronizado para a idade
+de ajuste, grupos de contemporâneos como efeitos fixos e valor genético
+aditivo de todos os animais da genealogia da propriedade. Com
+λ = σ²e/σ²a e C a matriz de coeficientes das equações de modelo misto, a
+log-verossimilhança restrita, com σ²e concentrado, é (Graser et al., 1987)
+
+    -2 log L(λ) = (N - p)·log σ̂²e - q·log λ + log|C(λ)| + constante,
+    σ̂²e = (y'y - ŝ'r) / (N - p)
+
+(N registros, p grupos, q animais, ŝ a solução e r o lado direito). Cada
+avaliação é uma fatoração LU esparsa de C (SuperLU com ordenação de grau
+mínimo em A + A', que preserva a esparsidade de A⁻¹); o log do determinante
+vem da diagonal de U e a mesma fatoração resolve o sistema. O máximo em h² é
+buscado pelo método de Brent, com poucas fatorações, e o erro-padrão sai da
+curvatura da verossimilhança no máximo (informação observada).
+
+A estimação roda em segundo plano no pool de `app.core.jobs`; o registro
+`VarianceComponentEstimate` de cada rebanho e característica funciona como
+registro do job e fornece o h² padrão de simulações e avaliações.
+"""
+
+import math
+from datetime import datetime
+from typing import Dict, NamedTuple, Optional
+
+import numpy as np
+from scipy import sparse
+from scipy.optimize import minimize_scalar
+from scipy.sparse.linalg import splu
+from sqlmodel import Session, select
+
+from app.core import blup, jobs
+from app.core.db import engine
+from app.core.herd_versions import herd_data_version
+from app.core.pedigree import Pedigree, compute_inbreeding
+from app.models.mating import VarianceComponentEstimate
+
+# h² usado enquanto o rebanho não tem estimativa
+DEFAULT_HERITABILITY = 0.3
+# Intervalo de busca de h² e tolerância do método de Brent
+HERITABILITY_BOUNDS = (0.01, 0.99)
+HERITABILITY_TOLERANCE = 1e-4
+# Passo das diferenças finitas para a curvatura no máximo
+CURVATURE_STEP = 1e-3
+# Registros mínimos (além do número de grupos) para estimar
+MIN_RECORDS = 30
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class REMLEstimate(NamedTuple):
+    """Resultado da estimação"""
+    heritability: float
+    heritability_se: Optional[float]
+    additive_variance: float
+    residual_variance: float
+    log_likelihood: float
+    records: int
+    pedigree_animals: int
+    contemporary_groups: int
+    evaluations: int
+
+
+def trait_name(weight_adjustment_days: int) -> str:
+    return f"weight_{weight_adjustment_days}d"
+
+
+class _MixedModel:
+    """Blocos constantes das equações de modelo misto; só Z'Z + λA⁻¹ muda com λ"""
+
+    def __init__(self, pedigree: Pedigree, inbreeding: np.ndarray, phenotypes: Dict[int, tuple]):
+        records = [
+            (pedigree.position[a] - 1, group, weight)
+            for a, (group, weight) in phenotypes.items() if a in pedigree.position
+        ]
+        groups: Dict[tuple, int] = {}
+        record_group = np.array([groups.setdefault(group, len(groups)) for _, group, _ in records], dtype=np.int64)
+        record_animal = np.array([pos for pos, _, _ in records], dtype=np.int64)
+        y = np.array([weight for _, _, weight in records], dtype=float)
+
+        self.n = len(pedigree)
+        self.N = len(records)
+        self.p = len(groups)
+        ones = np.ones(self.N)
+        self.XtX = sparse.diags(np.bincount(record_group, minlength=self.p).astype(float))
+        self.XtZ = sparse.coo_matrix((ones, (record_group, record_animal)), shape=(self.p, self.n)).tocsr()
+        self.ZtZ = sparse.diags(np.bincount(record_animal, minlength=self.n).astype(float))
+        self.Ainv = blup.inverse_relationship_matrix(pedigree, inbreeding)
+        self.rhs = np.concatenate([
+            np.bincount(record_group, weights=y, minlength=self.p),
+            np.bincount(record_animal, weights=y, minlength=self.n),
+        ])
+        self.yy = float(y @ y)
+        self.evaluations = 0
+
+    def evaluate(self, heritability: float):
+        """-2 log L (sem constantes) e σ²e para o h² informado"""
+        ratio = (1.0 - heritability) / heritability
+        C = sparse.bmat([
+            [self.XtX, self.XtZ],
+            [self.XtZ.T, self.ZtZ + ratio * self.Ainv],
+        ], format="csc")
+        # C é simétrica positiva definida: pivô na diagonal, sem trocas de linhas
+        lu = splu(C, permc_spec="MMD_AT_PLUS_A", diag_pivot_thresh=0.0, options={"SymmetricMode": True})
+        self.evaluations += 1
+        log_det = float(np.log(np.abs(lu.U.diagonal())).sum())
+        solution = lu.solve(self.rhs)
+        residual_variance = (self.yy - float(solution @ self.rhs)) / (self.N - self.p)
+        value = (self.N - self.p) * math.log(residual_variance) - self.n * math.log(ratio) + log_det
+        return value, residual_variance
+
+
+def estimate_reml(pedigree: Pedigree, inbreeding: np.ndarray, phenotypes: Dict[int, tuple]) -> REMLEstimate:
+    """Estima σ²a, σ²e e h² por REML; ValueError se não houver registros suficientes"""
+    model = _MixedModel(pedigree, inbreeding, phenotypes)
+    if model.N < model.p + MIN_RECORDS:
+        raise ValueError(
+            f"Registros insuficientes para estimar: {model.N} fenótipos em {model.p} grupos de contemporâneos"
+        )
+
+    low, high = HERITABILITY_BOUNDS
+    optimum = minimize_scalar(
+        lambda h2: model.evaluate(h2)[0],
+        bounds=(low, high),
+        method="bounded",
+        options={"xatol": HERITABILITY_TOLERANCE},
+    )
+    h2 = float(optimum.x)
+    value, residual_variance = model.evaluate(h2)
+
+    # Erro-padrão: var(h²) ≈ 2 / (d²(-2 log L)/dh²), por diferenças centrais
+    se = None
+    step = min(CURVATURE_STEP, h2 - low, high - h2)
+    if step > 0:
+        curvature = (model.evaluate(h2 - step)[0] - 2 * value + model.evaluate(h2 + step)[0]) / step ** 2
+        if curvature > 0:
+            se = math.sqrt(2.0 / curvature)
+
+    return REMLEstimate(
+        heritability=h2,
+        heritability_se=se,
+        additive_variance=residual_variance * h2 / (1.0 - h2),
+        residual_variance=residual_variance,
+        log_likelihood=-0.5 * value,
+        records=model.N,
+        pedigree_animals=model.n,
+        contemporary_groups=model.p,
+        evaluations=model.evaluations,
+    )
+
+
+def estimate_herd(session: Session, property_id: str, herd_id: str, weight_adjustment_days: int) -> REMLEstimate:
+    """REML com os fenótipos do rebanho e a genealogia completa da propriedade"""
+    pedigree, inbreeding = compute_inbreeding(session, property_id)
+    phenotypes = {
+        animal_id: (group, weight)
+        for animal_id, (group, weight) in blup.load_phenotypes(session, property_id, weight_adjustment_days).items()
+        if group[0] == herd_id
+    }
+    return estimate_reml(pedigree, inbreeding, phenotypes)
+
+
+# ============ JOBS ============
+
+def submit_estimate(session: Session, property_id: str, herd_id: str, weight_adjustment_days: int) -> VarianceComponentEstimate:
+    """Marca a estimação do rebanho e característica como "queued" e a envia ao pool; uma por vez"""
+    trait = trait_name(weight_adjustment_days)
+    estimate = session.exec(
+        select(VarianceComponentEstimate)
+        .where(VarianceComponentEstimate.herd_id == herd_id)
+        .where(VarianceComponentEstimate.trait == trait)
+    ).first()
+    if estimate is not None and estimate.status in ACTIVE_STATUSES:
+        return estimate
+    estimate = estimate or VarianceComponentEstimate(
+        property_id=property_id, herd_id=herd_id, trait=trait, weight_adjustment_days=weight_adjustment_days
+    )
+    estimate.status = "queued"
+    estimate.error = None
+    estimate.started_at = None
+    estimate.finished_at = None
+    estimate.updated_at = datetime.utcnow()
+    session.add(estimate)
+    session.commit()
+    session.refresh(estimate)
+    jobs.submit_task(run_estimate_job, estimate.id)
+    return estimate
+
+
+def run_estimate_job(estimate_id: int) -> None:
+    """Executa a estimação e grava o resultado (os valores anteriores são mantidos em caso de falha)"""
+    with Session(engine) as session:
+        estimate = session.get(VarianceComponentEstimate, estimate_id)
+        if estimate is None or estimate.status != "queued":
+            return
+        estimate.status = "running"
+        estimate.started_at = datetime.utcnow()
+        session.add(estimate)
+        session.commit()
+        try:
+            data_version = herd_data_version(session, estimate.herd_id)
+            result = estimate_herd(session, estimate.property_id, estimate.herd_id, estimate.weight_adjustment_days)
+            estimate.heritability = round(result.heritability, 4)
+            estimate.heritability_se = round(result.heritability_se, 4) if result.heritability_se is not None else None
+            estimate.additive_variance = round(result.additive_variance, 6)
+            estimate.residual_variance = round(result.residual_variance, 6)
+            estimate.log_likelihood = round(result.log_likelihood, 4)
+            estimate.records = result.records
+            estimate.pedigree_animals = result.pedigree_animals
+            estimate.contemporary_groups = result.contemporary_groups
+            estimate.evaluations = result.evaluations
+            estimate.data_version = data_version
+            estimate.status = "completed"
+        except Exception as e:
+            session.rollback()
+            estimate.error = str(e) or e.__class__.__name__
+            estimate.status = "failed"
+        estimate.finished_at = datetime.utcnow()
+        estimate.updated_at = estimate.finished_at
+        session.add(estimate)
+        session.commit()
+
+
+def recover_interrupted_estimates() -> None:
+    """Marca como falhas as estimações que ficaram pendentes em uma execução anterior do servidor"""
+    with Session(engine) as session:
+        for estimate in session.exec(
+            select(VarianceComponentEstimate).where(VarianceComponentEstimate.status.in_(ACTIVE_STATUSES))
+        ).all():
+            estimate.status = "failed"
+            estimate.error = "Interrompida pelo reinício do servidor"
+            estimate.finished_at = datetime.utcnow()
+            session.add(estimate)
+        session.commit()
+
+
+def default_heritability(session: Session, herd_id: str, weight_adjustment_days: int) -> float:
+    """h² estimado para o rebanho e a idade de ajuste ou, sem estimativa, DEFAULT_HERITABILITY"""
+    heritability = session.exec(
+        select(VarianceComponentEstimate.heritability)
+        .where(VarianceComponentEstimate.herd_id == herd_id)
+        .where(VarianceComponentEstimate.trait == trait_name(weight_adjustment_days))
+    ).first()
+    return heritability if heritability is not None else DEFAULT_HERITABILITY
@@ -1,6 +1,10 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.db import init_db
+from app.core.herd_statistics import ensure_herd_statistics
+from app.core.jobs import recover_interrupted_jobs, shutdown_jobs
+from app.core.variance_components import recover_interrupted_estimates
+from app.core.nsga2 import shutdown_executor
 from app.routers.auth import router as auth_router
 from app.routers.users import router as users_router
 from app.routers.properties import router as properties_router
@@ -15,6 +19,10 @@ from app.routers.medicines import router as medicines_router
 from app.routers.reproductive_management import router as reproductive_management_router
 from app.routers.animal_control import router_movement, router_clinical, router_parasite, router_vaccination
 from app.routers.mating import router as mating_router
+from app.routers.breeding_simulation import router as breeding_simulation_router
+from app.routers.selection_index import router as selection_index_router
+from app.routers.growth_curves import router as growth_curves_router
+from app.routers.variance_components import router as variance_components_router
 from app.routers.events import router as events_router
 
 app = FastAPI(
@@ -30,11 +38,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Permite todos os métodos (GET, POST, PUT, DELETE, etc)
     allow_headers=["*"],  # Permite todos os headers
+    expose_headers=["X-Next-Cursor"],  # Cursor da paginação de recomendações
 )
 
 @app.on_event("startup")
 def on_startup():
     init_db()
+    recover_interrupted_jobs()  # Simulações pendentes de uma execução anterior
+    recover_interrupted_estimates()  # Estimações de herdabilidade pendentes
+    ensure_herd_statistics()  # Estatísticas de peso por rebanho na primeira execução
+
+@app.on_event("shutdown")
+def on_shutdown():
+    shutdown_jobs()  # Jobs de simulação em segundo plano
+    shutdown_executor()  # Pool de processos do otimizador de acasalamento
 
 # Include all routers
 app.include_router(auth_router)  # Autenticação (público)
@@ -50,6 +67,10 @@ app.include_router(illnesses_router)  # Doenças
 app.include_router(medicines_router)
 app.include_router(reproductive_management_router)  # Manejo Reprodutivo
 app.include_router(mating_router)  # Acasalamento e Seleção
+app.include_router(breeding_simulation_router)  # Simulação de várias gerações de seleção
+app.include_router(selection_index_router)  # Índice de seleção multicaracterística
+app.include_router(growth_curves_router)  # Curvas de crescimento
+app.include_router(variance_components_router)  # Herdabilidade e componentes de variância (REML)
 app.include_router(router_movement)  # Movimentação Animal
 app.include_router(router_clinical)  # Ocorrência Clínica
 app.include_router(router_parasite)  # Controle Parasitário
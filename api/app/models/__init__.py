@@ -9,9 +9,9 @@ from .taxonomy import Species, Race
 from .farm import Herd, AnimalHerd
 from .medicine import Medicine
 from .illness import Illness
-from .reproductive_management import ReproductiveManagement, ReproductiveOffspring
+from .reproductive_management import ReproductiveManagement, ReproductiveOffspring, ReproducerCoverageSummary
 from .animal_control import AnimalMovement, ClinicalOccurrence, ParasiteControl, Vaccination, VaccinationAnimal
-from .mating import MatingSimulationParameters, MatingRecommendation, AnimalGeneticEvaluation
+from .mating import MatingSimulationParameters, MatingRecommendation, AnimalGeneticEvaluation, AnimalInbreeding, HerdWeightStatistics, SelectionIndexDefinition, GrowthCurve, VarianceComponentEstimate
 from .events import (
     WeighInEvent,
     ReproductiveEvent,
@@ -42,6 +42,7 @@ __all__ = [
     "Illness",
     "ReproductiveManagement",
     "ReproductiveOffspring",
+    "ReproducerCoverageSummary",
     "AnimalMovement",
     "ClinicalOccurrence",
     "ParasiteControl",
@@ -50,6 +51,11 @@ __all__ = [
     "MatingSimulationParameters",
     "MatingRecommendation",
     "AnimalGeneticEvaluation",
+    "AnimalInbreeding",
+    "HerdWeightStatistics",
+    "SelectionIndexDefinition",
+    "GrowthCurve",
+    "VarianceComponentEstimate",
     "WeighInEvent",
     "ReproductiveEvent",
     "FoodEvent",
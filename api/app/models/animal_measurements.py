@@ -1,5 +1,5 @@
 from __future__ import annotations
-from datetime import date
+from datetime import date, datetime
 from typing import Optional
 from sqlmodel import SQLModel, Field, Relationship
 from .base import TimestampedModel
@@ -22,6 +22,12 @@ class WeightRecord(TimestampedModel, table=True):
     musculature: Optional[int] = None  # M - Musculatura (1-5)
     cpm_average: Optional[float] = None  # Média automática de C+P+M
     
+    # Atualizado em toda alteração: a detecção de reajuste das curvas de
+    # crescimento (app.core.growth_curves) compara a última alteração das pesagens
+    updated_at: Optional[datetime] = Field(
+        default_factory=datetime.utcnow, nullable=False, sa_column_kwargs={"onupdate": datetime.utcnow}
+    )
+    
     # Relationships
     # animal: "Animal" = Relationship(back_populates="weight_records")
 
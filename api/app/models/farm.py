@@ -16,6 +16,9 @@ class Herd(TimestampedModel, table=True):
     feeding_management: str = Field(description="Tipo de manejo: extensivo, semi-intensivo ou intensivo")
     production_type: str = Field(description="Tipo de produção: carne, leite ou misto")
     
+    # Incrementada a cada escrita em animais, pesagens ou manejo reprodutivo (ver app.core.herd_versions)
+    data_version: int = 0
+    
     # Relationships - Comentados temporariamente
     # property: "Property" = Relationship(back_populates="herds")
     # animal_herds: list["AnimalHerd"] = Relationship(back_populates="herd")
@@ -1,7 +1,7 @@
 from __future__ import annotations
-from datetime import date
+from datetime import date, datetime
 from typing import Optional, List
-from sqlmodel import SQLModel, Field, Relationship
+from sqlmodel import SQLModel, Field, Relationship, UniqueConstraint
 from .base import TimestampedModel
 
 class MatingSimulationParameters(TimestampedModel, table=True):
@@ -14,7 +14,7 @@ class MatingSimulationParameters(TimestampedModel, table=True):
     
     # Parâmetros de seleção
     heritability: float  # Herdabilidade (h²)
-    selection_method: str  # individual_massal, selection_index
+    selection_method: str  # individual_massal, selection_index, optimal_allocation, nsga2
     min_age_male_months: int  # Idade mínima para machos (meses)
     min_age_female_months: int  # Idade mínima para fêmeas (meses)
     weight_adjustment_days: int  # Dias para ajuste de peso (60, 120 ou 180)
@@ -25,6 +25,18 @@ class MatingSimulationParameters(TimestampedModel, table=True):
     # Observações
     observations: Optional[str] = None
     
+    # Execução em segundo plano (a simulação é o próprio registro do job)
+    status: str = "completed"  # queued, running, completed, failed, cancelled
+    progress: float = 0.0  # Percentual concluído (0-100)
+    selected_male_ids: Optional[str] = None  # JSON com os IDs dos machos selecionados
+    selected_female_ids: Optional[str] = None  # JSON com os IDs das fêmeas selecionadas
+    seed: Optional[int] = None  # Semente do NSGA-II
+    result: Optional[str] = None  # JSON com o resumo do resultado (ex.: fronteira de Pareto)
+    cache_key: Optional[str] = Field(default=None, index=True)  # Hash dos parâmetros, animais e versão dos dados do rebanho
+    error: Optional[str] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    
 
 class MatingRecommendation(TimestampedModel, table=True):
     """Recomendações de acasalamento geradas pela simulação"""
@@ -75,8 +87,115 @@ class AnimalGeneticEvaluation(TimestampedModel, table=True):
     
     # Data da última avaliação
     last_evaluation_date: date
+    # Momento da última avaliação completa (NULL = precisa ser reavaliado) e
+    # parâmetros usados (método;h²;idade de ajuste), para a reavaliação incremental
+    evaluated_at: Optional[datetime] = None
+    evaluation_settings: Optional[str] = None
     
     # Observações
     observations: Optional[str] = None
 
 
+class AnimalInbreeding(TimestampedModel, table=True):
+    """Coeficiente de endogamia exato (Meuwissen & Luo) de cada animal"""
+    __tablename__ = "animal_inbreeding"
+
+    animal_id: int = Field(foreign_key="animals.id", primary_key=True)
+    coefficient: float = 0.0  # Endogamia como fração (0-1)
+
+
+class HerdWeightStatistics(TimestampedModel, table=True):
+    """Estatísticas de peso por rebanho, grupo de contemporâneos e período de pesagem.
+
+    Mantidas de forma incremental a cada pesagem incluída, alterada ou excluída
+    (app.core.herd_statistics); média e variância saem das somas.
+    """
+    __tablename__ = "herd_weight_statistics"
+    __table_args__ = (UniqueConstraint("herd_id", "contemporary_group", "measurement_period"),)
+
+    id: int = Field(primary_key=True)
+    herd_id: str = Field(foreign_key="herd.id", index=True)
+    contemporary_group: str  # Sexo, ano e trimestre de nascimento (ex.: M-2024-T1)
+    measurement_period: str  # ao_nascer, desmame, outros
+    count: int = 0
+    weight_sum: float = 0.0
+    weight_sum_squares: float = 0.0
+
+
+class SelectionIndexDefinition(TimestampedModel, table=True):
+    """Índice de seleção multicaracterística de um rebanho (app.core.selection_index).
+
+    Guarda as características, os pesos econômicos (w), as matrizes de
+    covariância fenotípica (P) e genética (G) estimadas no rebanho e os
+    pesos do índice b = P⁻¹Gw, reutilizados na classificação dos animais.
+    """
+    __tablename__ = "selection_index_definition"
+
+    id: int = Field(primary_key=True)
+    herd_id: str = Field(foreign_key="herd.id", index=True, unique=True)
+    traits: str  # JSON com os nomes das características, na ordem das matrizes
+    economic_weights: str  # JSON com w
+    heritabilities: str  # JSON com h² de cada característica
+    genetic_correlations: Optional[str] = None  # JSON com a matriz informada (None = correlações fenotípicas)
+    means: str  # JSON com as médias do rebanho
+    phenotypic_covariance: str  # JSON com P
+    genetic_covariance: str  # JSON com G
+    index_weights: str  # JSON com b (animais com todas as características medidas)
+    records: int = 0  # Animais com ao menos uma característica medida na estimação
+    computed_at: datetime
+
+
+class GrowthCurve(TimestampedModel, table=True):
+    """Curva de crescimento ajustada (app.core.growth_curves), W(t) em kg com t em dias de idade.
+
+    Uma linha por animal e uma por rebanho e sexo (`animal_id` nulo), usada
+    para os animais sem pesagens. O número de pesagens e a última alteração
+    delas no momento do ajuste identificam os animais a reajustar.
+    """
+    __tablename__ = "growth_curve"
+
+    id: int = Field(primary_key=True)
+    herd_id: str = Field(foreign_key="herd.id", index=True)
+    animal_id: Optional[int] = Field(default=None, foreign_key="animals.id", unique=True)
+    gender: str  # M ou F
+    model: str  # gompertz, brody, logistic
+    source: str  # individual, herd_scaled (forma da curva do rebanho, peso adulto do animal), herd
+    asymptotic_weight: float  # A: peso adulto (kg)
+    integration_constant: float  # b
+    maturity_rate: float  # k (1/dia)
+    rmse: Optional[float] = None  # Erro do ajuste (kg)
+    weights_count: int = 0  # Pesagens usadas no ajuste
+    weights_updated_at: Optional[datetime] = None  # Última inclusão/alteração das pesagens usadas
+    fitted_at: datetime
+
+
+class VarianceComponentEstimate(TimestampedModel, table=True):
+    """Componentes de variância e herdabilidade estimados por REML (app.core.variance_components).
+
+    Uma linha por rebanho e característica; a estimação roda em segundo plano
+    e a própria linha funciona como registro do job. Enquanto uma nova
+    estimação roda (ou se ela falha), os valores anteriores continuam valendo
+    como h² padrão do rebanho.
+    """
+    __tablename__ = "variance_component_estimate"
+    __table_args__ = (UniqueConstraint("herd_id", "trait"),)
+
+    id: int = Field(primary_key=True)
+    property_id: str = Field(foreign_key="properties.id", index=True)
+    herd_id: str = Field(foreign_key="herd.id", index=True)
+    trait: str  # weight_60d, weight_120d, weight_180d
+    weight_adjustment_days: int
+    status: str = "queued"  # queued, running, completed, failed
+    heritability: Optional[float] = None  # h² = σ²a / (σ²a + σ²e)
+    heritability_se: Optional[float] = None  # Erro-padrão assintótico de h²
+    additive_variance: Optional[float] = None  # σ²a (kg²)
+    residual_variance: Optional[float] = None  # σ²e (kg²)
+    log_likelihood: Optional[float] = None  # Log-verossimilhança restrita (sem constantes)
+    records: Optional[int] = None  # Animais com fenótipo
+    pedigree_animals: Optional[int] = None  # Animais da genealogia (efeitos aleatórios)
+    contemporary_groups: Optional[int] = None
+    evaluations: Optional[int] = None  # Fatorações da matriz do modelo misto
+    data_version: Optional[int] = None  # Versão dos dados do rebanho usada na estimação
+    error: Optional[str] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
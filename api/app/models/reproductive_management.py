@@ -1,7 +1,7 @@
 from __future__ import annotations
 from datetime import date
 from typing import Optional, List
-from sqlmodel import SQLModel, Field, Relationship
+from sqlmodel import SQLModel, Field, Relationship, UniqueConstraint
 from .base import TimestampedModel
 
 class ReproductiveManagement(TimestampedModel, table=True):
@@ -51,3 +51,16 @@ class ReproductiveOffspring(TimestampedModel, table=True):
     # reproductive_management: "ReproductiveManagement" = Relationship(back_populates="offspring")
     # offspring: "Animal" = Relationship()
 
+
+class ReproducerCoverageSummary(TimestampedModel, table=True):
+    """Coberturas por reprodutor pré-calculadas para o relatório (atualizadas uma vez por dia)"""
+    __tablename__ = "reproducer_coverage_summary"
+    __table_args__ = (UniqueConstraint("herd_id", "sire_id"),)
+
+    id: int = Field(primary_key=True)
+    herd_id: str = Field(foreign_key="herd.id", index=True)
+    sire_id: int = Field(foreign_key="animals.id", index=True)
+    total_coverages: int = 0
+    total_births: int = 0
+    total_ongoing: int = 0
+    refreshed_on: date  # Dia em que o resumo foi calculado
@@ -6,6 +6,11 @@ from pydantic import BaseModel, validator
 from app.core.db import get_session
 from app.core.auth import get_current_active_user
 from app.core.optimizations import check_permission_optimized
+from app.core import evaluation_tracking, herd_statistics
+from app.core.herd_versions import bump_herd_version
+from app.core.kinship import clear_kinship_cache
+from app.core.pedigree import invalidate_inbreeding
+from app.core.pedigree_index import get_pedigree_index, index_animal, unindex_animal
 from app.models.animal import Animal
 from app.models.animal_measurements import WeightRecord, ParasiteRecord, BodyMeasurement, CarcassMeasurement
 from app.models.user import User
@@ -168,9 +173,14 @@ def create_animal(
     # Criar o objeto Animal com os dados convertidos
     animal = Animal(**animal_data.dict())
     
+    bump_herd_version(session, [animal.herd_id])
     session.add(animal)
     session.commit()
     session.refresh(animal)
+    
+    # Nova cria altera a genealogia da propriedade
+    index_animal(animal)
+    clear_kinship_cache(animal.property_id)
     return animal
 
 @router.get("/{animal_id}", response_model=Animal)
@@ -219,14 +229,32 @@ def update_animal(
     if animal_data.gender == "F" and animal_data.testicular_degree:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Grau testicular não se aplica a fêmeas")
     
+    # Genealogia alterada: endogamia do animal e descendentes precisa ser recalculada
+    pedigree_changed = (animal_data.father_id, animal_data.mother_id) != (obj.father_id, obj.mother_id)
+    old_herd_id, old_gender, old_birth_date = obj.herd_id, obj.gender, obj.birth_date
+    old_property_id = obj.property_id
+    
     # Atualiza campos
     update_data = animal_data.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(obj, key, value)
     
+    # Rebanho, sexo ou nascimento alterados mudam o grupo das pesagens nas estatísticas
+    herd_statistics.move_animal(session, obj, old_herd_id, old_gender, old_birth_date)
+    bump_herd_version(session, [old_herd_id, obj.herd_id])
+    
     session.add(obj)
     session.commit()
     session.refresh(obj)
+    index_animal(obj, old_property_id)
+    
+    # Avaliação genética do animal (e, com genealogia alterada, dos descendentes) fica pendente
+    affected = {obj.id}
+    if pedigree_changed:
+        affected |= invalidate_inbreeding(session, obj.property_id, [obj.id])
+        clear_kinship_cache(obj.property_id)
+    evaluation_tracking.mark_for_reevaluation(session, affected)
+    session.commit()
     return obj
 
 @router.delete("/{animal_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -245,11 +273,68 @@ def delete_animal(
     if not prop or (prop.producer_id != current_user.id and not current_user.is_admin):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
+    # Remove a endogamia gravada do animal e de seus descendentes
+    invalidate_inbreeding(session, obj.property_id, [obj.id])
+    clear_kinship_cache(obj.property_id)
+    herd_statistics.remove_animal(session, obj)
+    evaluation_tracking.mark_for_reevaluation(session, [obj.father_id, obj.mother_id])
+    bump_herd_version(session, [obj.herd_id])
+    
     session.delete(obj)
     session.commit()
+    unindex_animal(animal_id)
     return None
 
 
+@router.get("/{animal_id}/pedigree")
+def get_animal_pedigree(
+    animal_id: int,
+    generations: int = Query(3, ge=1, le=10, description="Gerações de ancestrais"),
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session)
+):
+    """Árvore de ancestrais do animal (pai e mãe aninhados), a partir do índice da genealogia em memória"""
+    obj = session.get(Animal, animal_id)
+    if not obj:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Animal not found")
+    
+    # Verifica permissão
+    prop = session.get(Property, obj.property_id)
+    if not prop or (prop.producer_id != current_user.id and not current_user.is_admin):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    index = get_pedigree_index(session, obj.property_id)
+    return {
+        "animal_id": animal_id,
+        "generations": generations,
+        "pedigree": index.ancestors(animal_id, generations),
+    }
+
+@router.get("/{animal_id}/descendants")
+def get_animal_descendants(
+    animal_id: int,
+    generations: Optional[int] = Query(None, ge=1, description="Limite de gerações (padrão: todas)"),
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session)
+):
+    """Descendentes do animal, com a geração de cada um (1 = filhos), a partir do índice da genealogia"""
+    obj = session.get(Animal, animal_id)
+    if not obj:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Animal not found")
+    
+    # Verifica permissão
+    prop = session.get(Property, obj.property_id)
+    if not prop or (prop.producer_id != current_user.id and not current_user.is_admin):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    descendants = get_pedigree_index(session, obj.property_id).descendants(animal_id, generations)
+    return {
+        "animal_id": animal_id,
+        "total": len(descendants),
+        "descendants": descendants,
+    }
+
+
 # ============ DESENVOLVIMENTO PONDERAL (PESO) ============
 
 @router.get("/{animal_id}/weights", response_model=List[WeightRecord])
@@ -289,11 +374,82 @@ def create_weight_record(
     if weight_record.conformation and weight_record.precocity and weight_record.musculature:
         weight_record.cpm_average = (weight_record.conformation + weight_record.precocity + weight_record.musculature) / 3
     
+    if weight_record.weight is not None:
+        herd_statistics.add_weight(session, animal, weight_record.measurement_period, weight_record.weight)
+    bump_herd_version(session, [animal.herd_id])
     session.add(weight_record)
     session.commit()
     session.refresh(weight_record)
     return weight_record
 
+@router.put("/{animal_id}/weights/{weight_id}", response_model=WeightRecord)
+def update_weight_record(
+    animal_id: int,
+    weight_id: int,
+    weight_data: WeightRecordCreate,
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session)
+):
+    """Atualiza um registro de peso"""
+    weight_record = session.get(WeightRecord, weight_id)
+    if not weight_record or weight_record.animal_id != animal_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Weight record not found")
+    animal = session.get(Animal, animal_id)
+    
+    # Verifica permissão
+    prop = session.get(Property, animal.property_id)
+    if not prop or (prop.producer_id != current_user.id and not current_user.is_admin):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    update_data = weight_data.dict(exclude_unset=True)
+    # Validado antes de mexer nas estatísticas do rebanho: o peso é obrigatório no registro
+    if 'weight' in update_data and update_data['weight'] is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="weight não pode ser nulo")
+    if update_data.get('measurement_date') is None:
+        update_data.pop('measurement_date', None)
+    
+    herd_statistics.remove_weight(session, animal, weight_record.measurement_period, weight_record.weight)
+    for key, value in update_data.items():
+        setattr(weight_record, key, value)
+    weight_record.updated_at = datetime.utcnow()
+    
+    if weight_record.conformation and weight_record.precocity and weight_record.musculature:
+        weight_record.cpm_average = (weight_record.conformation + weight_record.precocity + weight_record.musculature) / 3
+    
+    if weight_record.weight is not None:
+        herd_statistics.add_weight(session, animal, weight_record.measurement_period, weight_record.weight)
+    evaluation_tracking.mark_for_reevaluation(session, [animal_id])
+    bump_herd_version(session, [animal.herd_id])
+    session.add(weight_record)
+    session.commit()
+    session.refresh(weight_record)
+    return weight_record
+
+@router.delete("/{animal_id}/weights/{weight_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_weight_record(
+    animal_id: int,
+    weight_id: int,
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session)
+):
+    """Exclui um registro de peso"""
+    weight_record = session.get(WeightRecord, weight_id)
+    if not weight_record or weight_record.animal_id != animal_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Weight record not found")
+    animal = session.get(Animal, animal_id)
+    
+    # Verifica permissão
+    prop = session.get(Property, animal.property_id)
+    if not prop or (prop.producer_id != current_user.id and not current_user.is_admin):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    herd_statistics.remove_weight(session, animal, weight_record.measurement_period, weight_record.weight)
+    evaluation_tracking.mark_for_reevaluation(session, [animal_id])
+    bump_herd_version(session, [animal.herd_id])
+    session.delete(weight_record)
+    session.commit()
+    return None
+
 
 # ============ VERMINOSE ============
 
@@ -0,0 +1,176 @@
+import math
+import time
+from typing import List, Optional
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import BaseModel, Field
+from sqlmodel import Session, select
+
+from app.core import blup, breeding_simulation, nsga2, variance_components
+from app.core.auth import get_current_active_user
+from app.core.db import get_session
+from app.core.kinship import get_kinship
+from app.core.pedigree import compute_inbreeding
+from app.models.animal import Animal
+from app.models.farm import Herd
+from app.models.property import Property
+from app.models.user import User
+
+router = APIRouter(prefix="/breeding-simulation", tags=["breeding-simulation"])
+
+# Matrizes por reprodutor usadas quando o número de reprodutores não é informado
+FEMALES_PER_SIRE = 25
+
+# ============ SCHEMAS ============
+
+class BreedingSimulationRequest(BaseModel):
+    policies: List[str] = ["selection_index"]  # random, individual_massal, selection_index, min_coancestry
+    generations: int = Field(10, ge=1, le=30)
+    replicates: int = Field(20, ge=1, le=500)
+    n_sires: Optional[int] = Field(None, ge=1)  # Padrão: uma para cada FEMALES_PER_SIRE matrizes
+    n_dams: Optional[int] = Field(None, ge=1)  # Padrão: fêmeas ativas do rebanho
+    offspring_per_dam: int = Field(2, ge=1, le=6)
+    generation_interval_years: float = Field(2.0, gt=0, le=10)
+    heritability: Optional[float] = Field(None, gt=0, lt=1)  # Padrão: h² estimado por REML para o rebanho (ou 0.3)
+    weight_adjustment_days: int = 60
+    seed: Optional[int] = None
+
+# ============ FUNÇÕES AUXILIARES ============
+
+def load_base_population(
+    session: Session,
+    herd: Herd,
+    heritability: float,
+    weight_adjustment_days: int,
+) -> breeding_simulation.BasePopulation:
+    """Animais ativos do rebanho com valor genético (BLUP), parentesco e variância genética aditiva"""
+    animals = session.exec(
+        select(Animal.id, Animal.gender)
+        .where(Animal.herd_id == herd.id)
+        .where(Animal.status == "ativo")
+        .order_by(Animal.id)
+    ).all()
+    if not animals:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Rebanho sem animais ativos")
+    ids = [animal_id for animal_id, _ in animals]
+
+    pedigree, inbreeding = compute_inbreeding(session, herd.property_id)
+    phenotypes = blup.load_phenotypes(session, herd.property_id, weight_adjustment_days)
+
+    # Variância fenotípica dentro dos grupos de contemporâneos
+    groups = {}
+    for group, weight in phenotypes.values():
+        groups.setdefault(group, []).append(weight)
+    deviations = [w - np.mean(values) for values in groups.values() for w in values]
+    degrees = len(deviations) - len(groups)
+    if degrees <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pesagens insuficientes para estimar a variância genética do rebanho"
+        )
+    additive_variance = heritability * float(np.dot(deviations, deviations)) / degrees
+
+    ebv = blup.solve_animal_model(pedigree, inbreeding, phenotypes, heritability)
+    position = pedigree.position
+    # Confiabilidade aproximada: h² com fenótipo próprio, h²/4 só pela genealogia
+    reliability = np.array([heritability if a in phenotypes else heritability / 4 for a in ids])
+    relationship = 2.0 * get_kinship(session, herd.property_id).offspring_inbreeding_matrix(ids, ids)
+    return breeding_simulation.BasePopulation(
+        male=np.array([gender == "M" for _, gender in animals]),
+        ebv=np.array([ebv[position[a]] if a in position else 0.0 for a in ids]),
+        reliability=reliability,
+        relationship=relationship,
+        additive_variance=additive_variance,
+        heritability=heritability,
+    )
+
+# ============ ENDPOINTS ============
+
+@router.post("/{herd_id}", response_model=dict)
+def simulate_breeding_program(
+    herd_id: str,
+    request: BreedingSimulationRequest,
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+):
+    """
+    Projeta ganho genético, endogamia e tamanho efetivo ao longo de várias gerações
+    para cada política de seleção informada (app.core.breeding_simulation).
+
+    Parte dos valores genéticos (BLUP) e do parentesco dos animais ativos do
+    rebanho; as repetições de Monte Carlo rodam no pool de processos. Ganhos em
+    kg de valor genético para o peso na idade de ajuste, relativos ao rebanho atual.
+    """
+    herd = session.get(Herd, herd_id)
+    if not herd:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Herd not found")
+    prop = session.get(Property, herd.property_id)
+    if not prop or (prop.producer_id != current_user.id and not current_user.is_admin):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    unknown = [p for p in request.policies if p not in breeding_simulation.POLICIES]
+    if unknown or not request.policies:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Políticas válidas: {', '.join(breeding_simulation.POLICIES)}"
+        )
+
+    heritability = request.heritability
+    if heritability is None:
+        heritability = variance_components.default_heritability(session, herd.id, request.weight_adjustment_days)
+
+    started = time.perf_counter()
+    base = load_base_population(session, herd, heritability, request.weight_adjustment_days)
+    males = int(base.male.sum())
+    mean_inbreeding = float((np.diag(base.relationship) - 1.0).mean())
+    females = len(base) - males
+    n_dams = min(request.n_dams or females, females)
+    n_sires = min(request.n_sires or max(1, math.ceil(n_dams / FEMALES_PER_SIRE)), males)
+    if n_sires == 0 or n_dams == 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="O rebanho precisa de pelo menos um macho e uma fêmea ativos"
+        )
+
+    seed = request.seed if request.seed is not None else breeding_simulation.DEFAULT_SEED
+    strategies = []
+    # Parentesco do rebanho em memória compartilhada: copiado uma vez para todas as políticas
+    with breeding_simulation.shared_relationship(base):
+        for policy in dict.fromkeys(request.policies):
+            strategies.append({
+                "policy": policy,
+                "census_effective_size": breeding_simulation.census_effective_size(n_sires, n_dams),
+                "generations": breeding_simulation.simulate(
+                    base,
+                    policy,
+                    generations=request.generations,
+                    n_sires=n_sires,
+                    n_dams=n_dams,
+                    offspring_per_dam=request.offspring_per_dam,
+                    replicates=request.replicates,
+                    generation_interval=request.generation_interval_years,
+                    seed=seed,
+                    executor=nsga2.get_executor(),
+                ),
+            })
+
+    return {
+        "herd_id": herd_id,
+        "base_population": {
+            "animals": len(base),
+            "males": males,
+            "females": females,
+            "additive_variance": round(base.additive_variance, 3),
+            "mean_ebv": round(float(base.ebv.mean()), 3),
+            "mean_inbreeding": round(mean_inbreeding * 100, 3),
+        },
+        "parameters": {
+            **request.dict(),
+            "heritability": heritability,
+            "n_sires": n_sires,
+            "n_dams": n_dams,
+            "seed": seed,
+        },
+        "strategies": strategies,
+        "elapsed_seconds": round(time.perf_counter() - started, 2),
+    }
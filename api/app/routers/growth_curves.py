@@ -0,0 +1,145 @@
+import time
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlmodel import Session, select
+
+from app.core import growth_curves, nsga2
+from app.core.auth import get_current_active_user
+from app.core.db import get_session
+from app.models.animal import Animal
+from app.models.animal_measurements import WeightRecord
+from app.models.farm import Herd
+from app.models.property import Property
+from app.models.user import User
+
+router = APIRouter(prefix="/growth-curves", tags=["growth-curves"])
+
+# ============ FUNÇÕES AUXILIARES ============
+
+def check_property_access(property_id: str, current_user: User, session: Session) -> None:
+    prop = session.get(Property, property_id)
+    if not prop or (prop.producer_id != current_user.id and not current_user.is_admin):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+
+def get_authorized_herd(herd_id: str, current_user: User, session: Session) -> Herd:
+    """Busca o rebanho verificando a permissão do usuário"""
+    herd = session.get(Herd, herd_id)
+    if not herd:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Herd not found")
+    check_property_access(herd.property_id, current_user, session)
+    return herd
+
+def curve_response(source: Optional[str], curve) -> Optional[dict]:
+    if curve is None:
+        return None
+    return {
+        "source": source,
+        "model": curve.model,
+        "mature_weight": round(curve.asymptotic_weight, 2),
+        "integration_constant": round(curve.integration_constant, 5),
+        "maturity_rate": round(curve.maturity_rate, 6),
+        "rmse": round(curve.rmse, 3) if curve.rmse is not None else None,
+    }
+
+# ============ ENDPOINTS ============
+
+@router.post("/{herd_id}/fit", response_model=dict)
+def fit_growth_curves(
+    herd_id: str,
+    full: bool = Query(False, description="Reajusta todos os animais, mesmo sem pesagens novas"),
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+):
+    """
+    Ajusta as curvas de crescimento (Gompertz, Brody e logística) do rebanho.
+
+    Por padrão só os animais com pesagens incluídas, alteradas ou excluídas
+    desde o último ajuste; lotes grandes rodam no pool de processos.
+    """
+    get_authorized_herd(herd_id, current_user, session)
+    started = time.perf_counter()
+    counts = growth_curves.update_growth_curves(session, herd_id, full=full, executor=nsga2.get_executor())
+    return {
+        "herd_id": herd_id,
+        "full": full,
+        **counts,
+        "elapsed_seconds": round(time.perf_counter() - started, 2),
+    }
+
+@router.get("/{herd_id}", response_model=dict)
+def get_herd_growth_curves(
+    herd_id: str,
+    age_days: List[int] = Query([365], description="Idades (dias) para o peso previsto"),
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+):
+    """
+    Curvas do rebanho por sexo e, para cada animal ativo, tipo de curva, peso
+    adulto e peso previsto nas idades pedidas. Os parâmetros vêm do cache por
+    versão dos dados do rebanho; só animais com pesagens novas são reajustados.
+    """
+    get_authorized_herd(herd_id, current_user, session)
+    curves = growth_curves.get_growth_curves(session, herd_id, executor=nsga2.get_executor())
+    animals = session.exec(
+        select(Animal.id, Animal.gender, Animal.earring_identification, Animal.name)
+        .where(Animal.herd_id == herd_id)
+        .where(Animal.status == "ativo")
+        .order_by(Animal.id)
+    ).all()
+    result = []
+    for animal_id, gender, earring_identification, name in animals:
+        source, curve = curves.for_animal(animal_id, gender)
+        predicted = growth_curves.predict(curve, age_days) if curve is not None else None
+        result.append({
+            "animal_id": animal_id,
+            "earring_identification": earring_identification,
+            "name": name,
+            "gender": gender,
+            "curve": curve_response(source, curve),
+            "predicted_weights": {
+                str(age): round(float(weight), 2) for age, weight in zip(age_days, predicted)
+            } if predicted is not None else None,
+        })
+    return {
+        "herd_id": herd_id,
+        "herd_curves": {gender: curve_response("herd", curve) for gender, curve in curves.herd.items()},
+        "animals": result,
+    }
+
+@router.get("/animal/{animal_id}", response_model=dict)
+def get_animal_growth_chart(
+    animal_id: int,
+    max_age_days: int = Query(720, ge=30, le=3650),
+    step_days: int = Query(30, ge=1, le=365),
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+):
+    """Dados do gráfico de crescimento: pesagens do animal e curva ajustada de 0 a max_age_days"""
+    animal = session.get(Animal, animal_id)
+    if not animal:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Animal not found")
+    check_property_access(animal.property_id, current_user, session)
+
+    source, curve = None, None
+    if animal.herd_id:
+        curves = growth_curves.get_growth_curves(session, animal.herd_id, executor=nsga2.get_executor())
+        source, curve = curves.for_animal(animal.id, animal.gender)
+    weighings = session.exec(
+        select(WeightRecord.measurement_date, WeightRecord.weight)
+        .where(WeightRecord.animal_id == animal_id)
+        .order_by(WeightRecord.measurement_date)
+    ).all()
+    ages = list(range(0, max_age_days + 1, step_days))
+    return {
+        "animal_id": animal_id,
+        "curve": curve_response(source, curve),
+        "observed": [
+            {"age_days": (measured_on - animal.birth_date).days, "date": measured_on, "weight": weight}
+            for measured_on, weight in weighings
+        ],
+        "predicted": [
+            {"age_days": age, "weight": round(float(weight), 2)}
+            for age, weight in zip(ages, growth_curves.predict(curve, ages))
+        ] if curve is not None else [],
+    }
@@ -4,6 +4,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlmodel import Session, select
 from app.core.db import get_session
 from app.core.auth import get_current_active_user
+from app.core import herd_statistics
 from app.models.farm import Herd
 from app.models.user import User
 from app.models.property import Property
@@ -95,6 +96,40 @@ def get_herd(
     
     return obj
 
+@router.get("/{herd_id}/weight-statistics")
+def get_herd_weight_statistics(
+    herd_id: str,
+    rebuild: bool = False,
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session)
+):
+    """
+    Estatísticas de peso do rebanho (número de pesagens, média, variância e desvio padrão),
+    no total e por grupo de contemporâneos e período de pesagem.
+    Use rebuild=true para recalcular a partir das pesagens (ex.: após importação direta no banco).
+    """
+    obj = session.get(Herd, herd_id)
+    if not obj:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Herd not found")
+    
+    # Verifica permissão
+    prop = session.get(Property, obj.property_id)
+    if not prop or (prop.producer_id != current_user.id and not current_user.is_admin):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to access this herd")
+    
+    if rebuild:
+        herd_statistics.rebuild_herd_statistics(session, herd_id)
+    
+    total = herd_statistics.herd_weight_statistics(session, [herd_id]).get(herd_id) or herd_statistics.WeightStats(0, 0.0, 0.0)
+    return {
+        "herd_id": herd_id,
+        "count": total.count,
+        "mean": round(total.mean, 3),
+        "variance": round(total.variance, 3),
+        "std_dev": round(total.variance ** 0.5, 3),
+        "groups": herd_statistics.herd_group_statistics(session, herd_id),
+    }
+
 @router.put("/{herd_id}", response_model=Herd)
 def update_herd(
     herd_id: str,
@@ -1,11 +1,23 @@
+import calendar
+import csv
+import io
+import json
 from typing import List, Optional
-from datetime import date, timedelta
+from datetime import date, datetime
 from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import and_, insert, or_, union_all
+from sqlalchemy.orm import aliased
 from sqlmodel import Session, select, func
-from pydantic import BaseModel
-import math
-from app.core.db import get_session
+from pydantic import BaseModel, Field
+from app.core.db import bulk_upsert, engine, get_session
 from app.core.auth import get_current_active_user
+from app.core import (
+    adjusted_weights, blup, evaluation_tracking, genetic_diversity, growth_curves, jobs,
+    mating_engine, reproductive_reports, variance_components,
+)
+from app.core.herd_versions import bump_herd_version, herd_data_version
+from app.core.pedigree import compute_inbreeding, get_inbreeding, update_inbreeding
 from app.models.mating import (
     MatingSimulationParameters, 
     MatingRecommendation,
@@ -14,6 +26,7 @@ from app.models.mating import (
 from app.models.animal import Animal
 from app.models.user import User
 from app.models.property import Property
+from app.models.farm import Herd
 from app.models.reproductive_management import ReproductiveManagement
 from app.models.animal_measurements import WeightRecord, BodyMeasurement
 
@@ -24,8 +37,8 @@ router = APIRouter(prefix="/mating", tags=["mating"])
 class SimulationParametersCreate(BaseModel):
     property_id: str
     herd_id: str
-    heritability: float
-    selection_method: str  # individual_massal, selection_index
+    heritability: Optional[float] = None  # Padrão: h² estimado por REML para o rebanho (ou 0.3)
+    selection_method: str  # individual_massal, selection_index, optimal_allocation, nsga2
     min_age_male_months: int
     min_age_female_months: int
     weight_adjustment_days: int  # 60, 120, 180
@@ -58,6 +71,27 @@ class MatingRecommendationResponse(BaseModel):
     predicted_dep: Optional[float]
     status: str
 
+class MatingPair(BaseModel):
+    sire_id: int
+    dam_id: int
+
+class PairEvaluationRequest(BaseModel):
+    herd_id: str
+    pairs: List[MatingPair] = Field(..., min_length=1, max_length=1000)
+    heritability: Optional[float] = None  # Padrão: h² estimado por REML para o rebanho (ou 0.3)
+    weight_adjustment_days: int = 60
+
+class SimulationJobStatus(BaseModel):
+    job_id: int
+    simulation_id: int
+    status: str  # queued, running, completed, failed, cancelled
+    progress: float
+    selection_method: str
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
 class BirthPrediction(BaseModel):
     reproductive_management_id: int
     dam_id: int
@@ -86,132 +120,33 @@ def calculate_animal_age_months(birth_date: date) -> int:
         months -= 1
     return max(0, months)
 
-def calculate_inbreeding_coefficient(animal: Animal, session: Session) -> float:
-    """
-    Calcula o coeficiente de endogamia de um animal baseado na genealogia.
-    Implementação simplificada - em produção, usar algoritmo de Meuwissen & Luo (1992)
-    """
-    if not animal.father_id or not animal.mother_id:
-        return 0.0
-    
-    # Busca os pais
-    father = session.get(Animal, animal.father_id)
-    mother = session.get(Animal, animal.mother_id)
-    
-    if not father or not mother:
-        return 0.0
-    
-    # Verificação simples: se os pais têm algum ancestral comum
-    # Em produção, implementar cálculo completo via matriz de parentesco
-    common_ancestors = 0
-    
-    # Verifica se avós paternos e maternos são os mesmos
-    if father.father_id and mother.father_id and father.father_id == mother.father_id:
-        common_ancestors += 1
-    if father.father_id and mother.mother_id and father.father_id == mother.mother_id:
-        common_ancestors += 1
-    if father.mother_id and mother.father_id and father.mother_id == mother.father_id:
-        common_ancestors += 1
-    if father.mother_id and mother.mother_id and father.mother_id == mother.mother_id:
-        common_ancestors += 1
-    
-    # Coeficiente simplificado baseado em ancestrais comuns
-    # Fórmula: F = (1/2)^n onde n é o número de gerações
-    if common_ancestors > 0:
-        return (common_ancestors / 4.0) * 100  # Retorna em percentual
-    
-    return 0.0
-
-def calculate_predicted_inbreeding(sire: Animal, dam: Animal, session: Session) -> float:
-    """
-    Calcula a endogamia prevista da progênie dados pai e mãe.
-    Implementação simplificada.
-    """
-    # Verifica se pai e mãe têm ancestrais comuns
-    common_ancestors = 0
-    
-    if sire.father_id and dam.father_id and sire.father_id == dam.father_id:
-        common_ancestors += 1
-    if sire.father_id and dam.mother_id and sire.father_id == dam.mother_id:
-        common_ancestors += 1
-    if sire.mother_id and dam.father_id and sire.mother_id == dam.father_id:
-        common_ancestors += 1
-    if sire.mother_id and dam.mother_id and sire.mother_id == dam.mother_id:
-        common_ancestors += 1
-    
-    # Se são meio-irmãos (compartilham um dos pais)
-    if common_ancestors > 0:
-        return (common_ancestors / 4.0) * 100
-    
-    return 0.0
-
-def calculate_dep(animal: Animal, session: Session, weight_adjustment_days: int) -> float:
+def birth_date_cutoff(min_age_months: int) -> date:
     """
-    Calcula a DEP (Diferença Esperada na Progênie) do animal.
-    Implementação simplificada baseada em peso ajustado.
+    Data de nascimento mais recente com calculate_animal_age_months >= min_age_months:
+    hoje menos min_age_months meses, com o dia limitado ao fim do mês.
     """
-    # Buscar pesagens do animal
-    measurements = session.exec(
-        select(WeightRecord)
-        .where(WeightRecord.animal_id == animal.id)
-        .order_by(WeightRecord.measurement_date)
-    ).all()
-    
-    if not measurements:
-        return 0.0
-    
-    # Encontrar peso mais próximo do período de ajuste
-    target_age_days = weight_adjustment_days
-    best_measurement = None
-    min_diff = float('inf')
-    
-    for measurement in measurements:
-        age_at_measurement = (measurement.measurement_date - animal.birth_date).days
-        diff = abs(age_at_measurement - target_age_days)
-        if diff < min_diff:
-            min_diff = diff
-            best_measurement = measurement
-    
-    if not best_measurement:
-        return 0.0
-    
-    # DEP simplificado: (peso_ajustado - média_rebanho) / desvio_padrão
-    # Para simplicidade, usando valor bruto normalizado
-    adjusted_weight = best_measurement.weight
-    
-    # Buscar média do rebanho (simplificado)
-    avg_weight = session.exec(
-        select(func.avg(WeightRecord.weight))
-        .where(WeightRecord.animal_id.in_(
-            select(Animal.id).where(Animal.herd_id == animal.herd_id)
-        ))
-    ).first() or 0.0
-    
-    if avg_weight == 0:
-        return 0.0
-    
-    # DEP normalizado
-    dep = (adjusted_weight - avg_weight) / avg_weight
-    return round(dep, 3)
+    today = date.today()
+    total = today.year * 12 + today.month - 1 - min_age_months
+    year, month = divmod(total, 12)
+    return date(year, month + 1, min(today.day, calendar.monthrange(year, month + 1)[1]))
 
-def calculate_selection_index(
-    animal: Animal, 
-    session: Session, 
-    heritability: float,
-    weight_adjustment_days: int
-) -> float:
+def count_offspring(session: Session, herd_id: str) -> dict:
     """
-    Calcula índice de seleção do animal.
-    Implementação simplificada que combina DEP e endogamia.
+    Número de crias (manejos com parição) de cada animal ativo do rebanho,
+    somando os lados de reprodutor e matriz em uma única consulta agrupada.
     """
-    dep = calculate_dep(animal, session, weight_adjustment_days)
-    inbreeding = calculate_inbreeding_coefficient(animal, session)
-    
-    # Índice = DEP ajustado pela herdabilidade - penalização por endogamia
-    # Fórmula simplificada: I = (DEP * h²) - (F * 0.1)
-    index = (dep * heritability) - (inbreeding * 0.01)
-    
-    return round(index, 3)
+    births = ReproductiveManagement.parturition_status == "sim"
+    parents = union_all(
+        select(ReproductiveManagement.sire_id.label("animal_id")).where(births),
+        select(ReproductiveManagement.dam_id.label("animal_id")).where(births),
+    ).subquery()
+    return dict(session.exec(
+        select(parents.c.animal_id, func.count())
+        .join(Animal, Animal.id == parents.c.animal_id)
+        .where(Animal.herd_id == herd_id)
+        .where(Animal.status == "ativo")
+        .group_by(parents.c.animal_id)
+    ).all())
 
 def run_mating_simulation(
     males: List[Animal],
@@ -219,76 +154,26 @@ def run_mating_simulation(
     session: Session,
     heritability: float,
     weight_adjustment_days: int,
-    max_female_percentage_per_male: float
+    max_female_percentage_per_male: float,
+    selection_method: Optional[str] = None
 ) -> List[dict]:
     """
     Executa simulação de acasalamentos usando otimização multiobjetivo simplificada.
-    Em produção, implementar NSGA-II completo.
+    As métricas de cada candidato são carregadas uma única vez (ver app.core.mating_engine)
+    e os pares são pontuados em memória, sem consultas dentro do laço M×F.
+    Com selection_method="optimal_allocation" a distribuição das matrizes é a ótima
+    (problema de transporte); nos demais métodos é gulosa.
+    O NSGA-II multiobjetivo (selection_method="nsga2") está em mating_engine.simulate_pareto.
     """
-    recommendations = []
-    
-    # Calcular quantas fêmeas cada macho pode cobrir
-    max_females_per_male = math.ceil(len(females) * (max_female_percentage_per_male / 100))
-    male_coverage_count = {male.id: 0 for male in males}
-    
-    # Criar todas as combinações possíveis e ranquear
-    combinations = []
-    for sire in males:
-        for dam in females:
-            # Calcular métricas da combinação
-            sire_dep = calculate_dep(sire, session, weight_adjustment_days)
-            dam_dep = calculate_dep(dam, session, weight_adjustment_days)
-            predicted_dep = (sire_dep + dam_dep) / 2
-            
-            sire_index = calculate_selection_index(sire, session, heritability, weight_adjustment_days)
-            dam_index = calculate_selection_index(dam, session, heritability, weight_adjustment_days)
-            predicted_index = (sire_index + dam_index) / 2
-            
-            predicted_inbreeding = calculate_predicted_inbreeding(sire, dam, session)
-            
-            # Função objetivo: maximizar índice e minimizar endogamia
-            # Score = índice - (endogamia * peso_penalizacao)
-            objective_score = predicted_index - (predicted_inbreeding * 0.5)
-            
-            combinations.append({
-                'sire': sire,
-                'dam': dam,
-                'sire_dep': sire_dep,
-                'dam_dep': dam_dep,
-                'predicted_dep': predicted_dep,
-                'predicted_index': predicted_index,
-                'predicted_inbreeding': predicted_inbreeding,
-                'objective_score': objective_score
-            })
-    
-    # Ordenar por score objetivo (maior = melhor)
-    combinations.sort(key=lambda x: x['objective_score'], reverse=True)
-    
-    # Selecionar melhores combinações respeitando restrições
-    assigned_females = set()
-    
-    for combo in combinations:
-        sire_id = combo['sire'].id
-        dam_id = combo['dam'].id
-        
-        # Verificar se fêmea já foi atribuída
-        if dam_id in assigned_females:
-            continue
-        
-        # Verificar se macho não excedeu limite
-        if male_coverage_count[sire_id] >= max_females_per_male:
-            continue
-        
-        # Adicionar recomendação
-        recommendations.append(combo)
-        assigned_females.add(dam_id)
-        male_coverage_count[sire_id] += 1
-        
-        # Parar se todas as fêmeas foram atribuídas
-        if len(assigned_females) == len(females):
-            break
-    
-    return recommendations
+    return mating_engine.simulate(
+        males=males,
+        females=females,
+        session=session,
+        heritability=heritability,
+        weight_adjustment_days=weight_adjustment_days,
+        max_female_percentage_per_male=max_female_percentage_per_male,
+        selection_method=selection_method
+    )
 
 # ============ ENDPOINTS ============
 
@@ -297,256 +182,670 @@ def get_eligible_animals(
     herd_id: str,
     min_age_male_months: int = 6,
     min_age_female_months: int = 8,
+    sort_by: Optional[str] = Query(None, description="selection_index ou dep (decrescente, sem avaliação ao final)"),
+    limit: Optional[int] = Query(None, ge=1, description="Máximo de machos e de fêmeas"),
+    offset: int = Query(0, ge=0),
     current_user: User = Depends(get_current_active_user),
     session: Session = Depends(get_session),
 ):
-    """Lista animais elegíveis para acasalamento por rebanho"""
+    """
+    Lista animais elegíveis para acasalamento por rebanho.
+
+    Uma única consulta: as idades mínimas viram limites de data de nascimento,
+    a avaliação genética entra por LEFT JOIN e a ordenação e a paginação são
+    feitas no banco, separadamente para machos e fêmeas (funções de janela
+    particionadas por sexo). `total_males`/`total_females` trazem o total antes
+    da paginação.
+    """
+    if sort_by not in (None, "selection_index", "dep"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="sort_by deve ser selection_index ou dep"
+        )
     
-    # Buscar animais do rebanho
-    animals = session.exec(
-        select(Animal)
+    order = [Animal.id]
+    if sort_by:
+        order.insert(0, getattr(AnimalGeneticEvaluation, sort_by).desc().nulls_last())
+    eligible = (
+        select(
+            Animal.id,
+            Animal.name,
+            Animal.earring_identification,
+            Animal.gender,
+            Animal.birth_date,
+            AnimalGeneticEvaluation.dep,
+            AnimalGeneticEvaluation.inbreeding_coefficient,
+            AnimalGeneticEvaluation.selection_index,
+            AnimalGeneticEvaluation.scrotal_perimeter,
+            AnimalGeneticEvaluation.number_of_offspring,
+            func.row_number().over(partition_by=Animal.gender, order_by=order).label("position"),
+            func.count().over(partition_by=Animal.gender).label("total"),
+        )
+        .outerjoin(AnimalGeneticEvaluation, AnimalGeneticEvaluation.animal_id == Animal.id)
         .where(Animal.herd_id == herd_id)
         .where(Animal.status == "ativo")
-    ).all()
-    
-    males = []
-    females = []
-    
-    for animal in animals:
-        age_months = calculate_animal_age_months(animal.birth_date)
-        
-        # Filtrar por idade mínima e gênero
-        if animal.gender == "M" and age_months >= min_age_male_months:
-            # Buscar avaliação genética se existir
-            evaluation = session.exec(
-                select(AnimalGeneticEvaluation)
-                .where(AnimalGeneticEvaluation.animal_id == animal.id)
-            ).first()
-            
-            males.append(AnimalSelectionInfo(
-                id=animal.id,
-                name=animal.name,
-                earring_identification=animal.earring_identification,
-                gender=animal.gender,
-                birth_date=animal.birth_date,
-                age_months=age_months,
-                dep=evaluation.dep if evaluation else None,
-                inbreeding_coefficient=evaluation.inbreeding_coefficient if evaluation else 0.0,
-                selection_index=evaluation.selection_index if evaluation else None,
-                adjusted_weight=None,
-                scrotal_perimeter=evaluation.scrotal_perimeter if evaluation else None,
-                number_of_offspring=evaluation.number_of_offspring if evaluation else 0
-            ))
-        
-        elif animal.gender == "F" and age_months >= min_age_female_months:
-            evaluation = session.exec(
-                select(AnimalGeneticEvaluation)
-                .where(AnimalGeneticEvaluation.animal_id == animal.id)
-            ).first()
-            
-            females.append(AnimalSelectionInfo(
-                id=animal.id,
-                name=animal.name,
-                earring_identification=animal.earring_identification,
-                gender=animal.gender,
-                birth_date=animal.birth_date,
-                age_months=age_months,
-                dep=evaluation.dep if evaluation else None,
-                inbreeding_coefficient=evaluation.inbreeding_coefficient if evaluation else 0.0,
-                selection_index=evaluation.selection_index if evaluation else None,
-                adjusted_weight=None,
-                number_of_offspring=evaluation.number_of_offspring if evaluation else 0
-            ))
+        .where(or_(
+            and_(Animal.gender == "M", Animal.birth_date <= birth_date_cutoff(min_age_male_months)),
+            and_(Animal.gender == "F", Animal.birth_date <= birth_date_cutoff(min_age_female_months)),
+        ))
+        .subquery()
+    )
+    page = select(*eligible.c).where(eligible.c.position > offset)
+    if limit:
+        page = page.where(eligible.c.position <= offset + limit)
+    rows = session.exec(page.order_by(eligible.c.gender, eligible.c.position)).all()
+    
+    result = {"M": [], "F": []}
+    totals = {"M": 0, "F": 0}
+    for row in rows:
+        totals[row.gender] = row.total
+        result[row.gender].append(AnimalSelectionInfo(
+            id=row.id,
+            name=row.name,
+            earring_identification=row.earring_identification,
+            gender=row.gender,
+            birth_date=row.birth_date,
+            age_months=calculate_animal_age_months(row.birth_date),
+            dep=row.dep,
+            inbreeding_coefficient=row.inbreeding_coefficient or 0.0,
+            selection_index=row.selection_index,
+            adjusted_weight=None,
+            scrotal_perimeter=row.scrotal_perimeter if row.gender == "M" else None,
+            number_of_offspring=row.number_of_offspring or 0
+        ))
     
     return {
         "herd_id": herd_id,
-        "males": males,
-        "females": females
+        "males": result["M"],
+        "females": result["F"],
+        "total_males": totals["M"],
+        "total_females": totals["F"],
     }
 
+def check_herd_access(herd_id: str, current_user: User, session: Session) -> Herd:
+    """Busca o rebanho verificando a permissão do usuário"""
+    herd = session.get(Herd, herd_id)
+    if not herd:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Herd not found")
+    prop = session.get(Property, herd.property_id)
+    if not prop or (prop.producer_id != current_user.id and not current_user.is_admin):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    return herd
+
+@router.get("/evaluate-pair", response_model=dict)
+def evaluate_pair(
+    herd_id: str,
+    sire_id: int,
+    dam_id: int,
+    heritability: Optional[float] = Query(None, description="Padrão: h² estimado por REML para o rebanho (ou 0.3)"),
+    weight_adjustment_days: int = 60,
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+):
+    """
+    Avalia um acasalamento avulso ("e se este reprodutor cobrir esta matriz?"):
+    índice, DEP e endogamia previstos da progênie, com as mesmas fórmulas da
+    simulação, a partir da tabela genética do rebanho e do parentesco em cache.
+    """
+    check_herd_access(herd_id, current_user, session)
+    if heritability is None:
+        heritability = variance_components.default_heritability(session, herd_id, weight_adjustment_days)
+    results, errors = mating_engine.evaluate_pairs(
+        session, herd_id, [(sire_id, dam_id)], heritability, weight_adjustment_days
+    )
+    if errors:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=errors[0])
+    return results[0]
+
+@router.post("/evaluate-pairs", response_model=dict)
+def evaluate_pairs(
+    request: PairEvaluationRequest,
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+):
+    """Avalia até 1000 pares de uma vez (ver /mating/evaluate-pair); pares inválidos vão para errors"""
+    check_herd_access(request.herd_id, current_user, session)
+    heritability = request.heritability
+    if heritability is None:
+        heritability = variance_components.default_heritability(
+            session, request.herd_id, request.weight_adjustment_days
+        )
+    results, errors = mating_engine.evaluate_pairs(
+        session,
+        request.herd_id,
+        [(pair.sire_id, pair.dam_id) for pair in request.pairs],
+        heritability,
+        request.weight_adjustment_days,
+    )
+    return {"herd_id": request.herd_id, "results": results, "errors": errors or None}
+
 @router.post("/calculate-genetic-evaluation/{herd_id}")
 def calculate_genetic_evaluation_for_herd(
     herd_id: str,
-    heritability: float = 0.3,
+    heritability: Optional[float] = Query(None, description="Padrão: h² estimado por REML para o rebanho (ou 0.3)"),
     weight_adjustment_days: int = 60,
+    method: str = Query("simplified", description="simplified (peso relativo à média) ou blup (modelo animal)"),
+    full: bool = Query(False, description="Reavalia todos os animais, mesmo sem alterações desde a última avaliação"),
     current_user: User = Depends(get_current_active_user),
     session: Session = Depends(get_session),
 ):
-    """Calcula avaliação genética para todos os animais do rebanho"""
+    """
+    Calcula avaliação genética para os animais do rebanho.
+    Com method="simplified" (padrão) a DEP é o peso ajustado relativo à média
+    do rebanho, escala para a qual o índice de seleção e a penalização por
+    endogamia da simulação foram calibrados; com method="blup" é a metade do
+    valor genético predito pelo modelo animal (app.core.blup), em kg.
+    Por padrão só reavalia os animais com dados novos ou alterados desde a última
+    avaliação e seus pais e filhos (app.core.evaluation_tracking), além dos
+    animais cuja DEP mudou (no simplificado, por exemplo, quando a média do
+    rebanho muda). Use full=true para reavaliar todos.
+    """
+    if method not in ("blup", "simplified"):
+        raise HTTPException(status_code=400, detail="method deve ser 'blup' ou 'simplified'")
+    if heritability is None:
+        heritability = variance_components.default_heritability(session, herd_id, weight_adjustment_days)
     
     animals = session.exec(
         select(Animal)
         .where(Animal.herd_id == herd_id)
         .where(Animal.status == "ativo")
     ).all()
-    
-    evaluated_count = 0
-    
+    # Os animais só são lidos: desanexados da sessão para não expirarem (e serem
+    # recarregados um a um) nos commits intermediários, como o da endogamia
     for animal in animals:
-        # Calcular métricas genéticas
-        inbreeding = calculate_inbreeding_coefficient(animal, session)
-        dep = calculate_dep(animal, session, weight_adjustment_days)
-        selection_index = calculate_selection_index(animal, session, heritability, weight_adjustment_days)
-        
-        # Buscar número de crias
-        offspring_count = 0
-        if animal.gender == "M":
-            offspring_count = session.exec(
-                select(func.count(ReproductiveManagement.id))
-                .where(ReproductiveManagement.sire_id == animal.id)
-                .where(ReproductiveManagement.parturition_status == "sim")
-            ).first() or 0
-        else:
-            offspring_count = session.exec(
-                select(func.count(ReproductiveManagement.id))
-                .where(ReproductiveManagement.dam_id == animal.id)
-                .where(ReproductiveManagement.parturition_status == "sim")
-            ).first() or 0
-        
-        # Verificar se já existe avaliação
-        existing_eval = session.exec(
-            select(AnimalGeneticEvaluation)
-            .where(AnimalGeneticEvaluation.animal_id == animal.id)
-        ).first()
-        
-        if existing_eval:
-            # Atualizar
-            existing_eval.dep = dep
-            existing_eval.inbreeding_coefficient = inbreeding
-            existing_eval.selection_index = selection_index
-            existing_eval.number_of_offspring = offspring_count
-            existing_eval.last_evaluation_date = date.today()
-            session.add(existing_eval)
-        else:
-            # Criar nova
-            new_eval = AnimalGeneticEvaluation(
-                animal_id=animal.id,
-                herd_id=herd_id,
-                dep=dep,
-                inbreeding_coefficient=inbreeding,
-                selection_index=selection_index,
-                number_of_offspring=offspring_count,
-                last_evaluation_date=date.today()
-            )
-            session.add(new_eval)
-        
-        evaluated_count += 1
+        session.expunge(animal)
+    started_at = datetime.utcnow()
+    settings = evaluation_tracking.evaluation_settings(method, heritability, weight_adjustment_days)
+    
+    # Animais a reavaliar e motivos
+    if full:
+        reasons = {}
+        pending = {animal.id for animal in animals}
+    else:
+        reasons = evaluation_tracking.pending_evaluation(session, animals, settings)
+        changed = set().union(*reasons.values())
+        pending = evaluation_tracking.with_relatives(session, animals, changed)
+        reasons["relatives"] = pending - changed
+    
+    coefficients = {}
+    deps = {}
+    if pending and method == "blup":
+        # Endogamia (Meuwissen & Luo) e valores genéticos de toda a genealogia da propriedade;
+        # o sistema é resolvido inteiro, mas só são gravados os animais cuja DEP mudou
+        for property_id in {animal.property_id for animal in animals}:
+            pedigree, F = compute_inbreeding(session, property_id)
+            coefficients.update({int(a): float(F[i]) for i, a in enumerate(pedigree.ids) if i > 0})
+            deps.update(blup.evaluate_property(
+                session, property_id, heritability, weight_adjustment_days, pedigree=pedigree, inbreeding=F
+            ))
+    
+    # Pesos ajustados (60/120/180 dias) dos animais reavaliados, em uma passada vetorizada, gravados em lote;
+    # idades sem pesagem próxima saem das curvas de crescimento já ajustadas
+    if pending:
+        adjusted_weights.update_herd_adjusted_weights(
+            session, herd_id, pending, curves=growth_curves.load_animal_curves(session, herd_id)
+        )
     
+    if animals and method == "simplified":
+        # DEP simplificado de todo o rebanho em uma passada (pesos ajustados e médias materializadas);
+        # é relativa à média do rebanho, então uma pesagem nova muda a DEP de todos os animais
+        table = mating_engine.build_genetic_table(
+            animals, session, heritability, weight_adjustment_days, use_evaluations=False
+        )
+        deps = {animal.id: float(table.dep[i]) for i, animal in enumerate(animals)}
+    
+    if deps and not full:
+        # Também são gravados os animais fora da lista cuja DEP mudou
+        stored_deps = dict(session.exec(
+            select(AnimalGeneticEvaluation.animal_id, AnimalGeneticEvaluation.dep)
+            .join(Animal, Animal.id == AnimalGeneticEvaluation.animal_id)
+            .where(Animal.herd_id == herd_id)
+            .where(Animal.status == "ativo")
+        ).all())
+        value_changed = {
+            animal.id for animal in animals
+            if animal.id not in pending and animal.id in stored_deps
+            and stored_deps[animal.id] != deps.get(animal.id, 0.0)
+        }
+        reasons["value_changed"] = value_changed
+        pending |= value_changed
+    
+    targets = [animal for animal in animals if animal.id in pending]
+    if targets and method == "simplified":
+        coefficients = get_inbreeding(session, targets)
+    
+    # Número de crias de todo o rebanho em uma consulta agrupada
+    offspring = count_offspring(session, herd_id) if targets else {}
+    
+    rows = []
+    for animal in targets:
+        inbreeding = round(coefficients.get(animal.id, 0.0) * 100, 3)
+        dep = deps.get(animal.id, 0.0)
+        rows.append({
+            "animal_id": animal.id,
+            "herd_id": herd_id,
+            "dep": dep,
+            "inbreeding_coefficient": inbreeding,
+            # I = (DEP × h²) - (F% × 0,01), mesma fórmula de mating_engine.build_genetic_table
+            "selection_index": round(dep * heritability - inbreeding * 0.01, 3),
+            "number_of_offspring": offspring.get(animal.id, 0),
+            "last_evaluation_date": date.today(),
+            "evaluated_at": started_at,
+            "evaluation_settings": settings,
+            "created_at": started_at,
+            "updated_at": started_at,
+        })
+    
+    # Upsert em lote pela chave única animal_id (pesos ajustados e observações são preservados)
+    bulk_upsert(session, AnimalGeneticEvaluation, rows, ["animal_id"], [
+        "herd_id", "dep", "inbreeding_coefficient", "selection_index", "number_of_offspring",
+        "last_evaluation_date", "evaluated_at", "evaluation_settings", "updated_at",
+    ])
+    if rows:
+        bump_herd_version(session, [herd_id])
+    evaluated_count = len(rows)
+    skipped = sorted(animal.id for animal in animals if animal.id not in pending)
     session.commit()
     
     return {
         "message": f"Avaliação genética calculada para {evaluated_count} animais",
-        "herd_id": herd_id
+        "herd_id": herd_id,
+        "full": full,
+        "evaluated": evaluated_count,
+        "skipped": len(skipped),
+        "skipped_animal_ids": skipped,
+        "reasons": {reason: len(ids) for reason, ids in reasons.items()},
     }
 
-@router.post("/simulate", response_model=dict)
+@router.post("/inbreeding/{property_id}")
+def calculate_property_inbreeding(
+    property_id: str,
+    full: bool = False,
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+):
+    """
+    Calcula a endogamia exata (Meuwissen & Luo) de todos os animais da propriedade.
+    Por padrão calcula apenas animais sem coeficiente gravado; use full=true para recalcular tudo.
+    """
+    prop = session.get(Property, property_id)
+    if not prop or (prop.producer_id != current_user.id and not current_user.is_admin):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    coefficients = update_inbreeding(session, property_id, full=full)
+    values = list(coefficients.values())
+    inbred = [f for f in values if f > 0]
+    
+    return {
+        "property_id": property_id,
+        "total_animals": len(values),
+        "inbred_animals": len(inbred),
+        "mean_inbreeding": round(sum(values) / len(values) * 100, 3) if values else 0.0,
+        "max_inbreeding": round(max(values) * 100, 3) if values else 0.0
+    }
+
+@router.get("/diversity/herd/{herd_id}", response_model=dict)
+def get_herd_diversity(
+    herd_id: str,
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+):
+    """
+    Diversidade genética do rebanho: coancestria média, taxa de endogamia por
+    geração, tamanho efetivo (Ne), fundadores efetivos, equivalentes genômicos
+    dos fundadores e completude da genealogia por ano de nascimento
+    (app.core.genetic_diversity), em cache até a próxima alteração de algum
+    rebanho da propriedade.
+    """
+    herd = check_herd_access(herd_id, current_user, session)
+    return {"herd_id": herd_id, **genetic_diversity.get_herd_diversity(session, herd)}
+
+@router.get("/diversity/property/{property_id}", response_model=dict)
+def get_property_diversity(
+    property_id: str,
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+):
+    """Diversidade genética de todos os animais da propriedade (ver /mating/diversity/herd/{herd_id})"""
+    prop = session.get(Property, property_id)
+    if not prop or (prop.producer_id != current_user.id and not current_user.is_admin):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    return {"property_id": property_id, **genetic_diversity.get_property_diversity(session, property_id)}
+
+@router.post("/simulate", response_model=dict, status_code=status.HTTP_202_ACCEPTED)
 def simulate_mating(
     params: SimulationParametersCreate,
     selected_male_ids: List[int] = Query(...),
     selected_female_ids: List[int] = Query(...),
+    seed: Optional[int] = Query(None, description="Semente do NSGA-II (selection_method=nsga2)"),
+    force: bool = Query(False, description="Executa novamente mesmo havendo resultado para os mesmos parâmetros e dados"),
     current_user: User = Depends(get_current_active_user),
     session: Session = Depends(get_session),
 ):
-    """Executa simulação de acasalamentos"""
+    """Envia uma simulação de acasalamentos para execução em segundo plano.
+
+    Retorna imediatamente o ID da simulação, que também é o ID do job:
+    acompanhe em GET /mating/jobs/{job_id} e busque o resultado em
+    GET /mating/jobs/{job_id}/result. Com selection_method="nsga2" o resultado
+    inclui a fronteira de Pareto (ganho genético × endogamia média); as
+    recomendações salvas são as do plano de compromisso (selected=true).
+    
+    Se já existe simulação com os mesmos parâmetros e animais, calculada (ou
+    em execução) sobre a mesma versão dos dados do rebanho, ela é devolvida
+    com cached=true em vez de ser executada de novo (force=true ignora).
+    """
     
     # Verificar permissão
     prop = session.get(Property, params.property_id)
     if not prop or (prop.producer_id != current_user.id and not current_user.is_admin):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
-    # Buscar animais selecionados
-    males = session.exec(
-        select(Animal)
+    # Validar animais selecionados
+    male_ids = session.exec(
+        select(Animal.id)
         .where(Animal.id.in_(selected_male_ids))
         .where(Animal.gender == "M")
     ).all()
     
-    females = session.exec(
-        select(Animal)
+    female_ids = session.exec(
+        select(Animal.id)
         .where(Animal.id.in_(selected_female_ids))
         .where(Animal.gender == "F")
     ).all()
     
-    if not males or not females:
+    if not male_ids or not female_ids:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="É necessário selecionar pelo menos um macho e uma fêmea"
         )
     
-    # Salvar parâmetros da simulação
-    simulation = MatingSimulationParameters(**params.dict())
+    # h² não informado: estimativa REML do rebanho, gravada com a simulação
+    if params.heritability is None:
+        params.heritability = variance_components.default_heritability(
+            session, params.herd_id, params.weight_adjustment_days
+        )
+    
+    # Resultado anterior com os mesmos parâmetros, animais e versão dos dados do rebanho
+    cache_key = jobs.simulation_cache_key(
+        params.dict(), male_ids, female_ids, seed, herd_data_version(session, params.herd_id)
+    )
+    cached = None if force else jobs.find_cached_simulation(session, cache_key)
+    if cached is not None:
+        return {
+            "simulation_id": cached.id,
+            "job_id": cached.id,
+            "status": cached.status,
+            "cached": True,
+            "message": "Resultado de simulação anterior reaproveitado"
+        }
+    
+    # Salvar parâmetros da simulação (registro do job)
+    simulation = MatingSimulationParameters(
+        **params.dict(),
+        status="queued",
+        selected_male_ids=json.dumps(sorted(male_ids)),
+        selected_female_ids=json.dumps(sorted(female_ids)),
+        seed=seed,
+        cache_key=cache_key
+    )
     session.add(simulation)
     session.commit()
     session.refresh(simulation)
     
-    # Executar simulação
-    recommendations_data = run_mating_simulation(
-        males=males,
-        females=females,
-        session=session,
-        heritability=params.heritability,
-        weight_adjustment_days=params.weight_adjustment_days,
-        max_female_percentage_per_male=params.max_female_percentage_per_male
-    )
+    jobs.submit_simulation(simulation.id)
     
-    # Salvar recomendações
-    saved_recommendations = []
-    for rec_data in recommendations_data:
-        recommendation = MatingRecommendation(
-            simulation_id=simulation.id,
-            property_id=params.property_id,
-            herd_id=params.herd_id,
-            sire_id=rec_data['sire'].id,
-            dam_id=rec_data['dam'].id,
-            predicted_offspring_index=rec_data['predicted_index'],
-            predicted_inbreeding=rec_data['predicted_inbreeding'],
-            predicted_dep=rec_data['predicted_dep'],
-            predicted_genetic_gain=rec_data['objective_score']
+    return {
+        "simulation_id": simulation.id,
+        "job_id": simulation.id,
+        "status": simulation.status,
+        "cached": False,
+        "message": "Simulação enviada para processamento"
+    }
+
+def get_simulation_job(job_id: int, current_user: User, session: Session) -> MatingSimulationParameters:
+    """Busca a simulação (job) verificando a permissão do usuário"""
+    simulation = session.get(MatingSimulationParameters, job_id)
+    if not simulation:
+        raise HTTPException(status_code=404, detail="Simulação não encontrada")
+    prop = session.get(Property, simulation.property_id)
+    if not prop or (prop.producer_id != current_user.id and not current_user.is_admin):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    return simulation
+
+def job_status(simulation: MatingSimulationParameters) -> SimulationJobStatus:
+    return SimulationJobStatus(
+        job_id=simulation.id,
+        simulation_id=simulation.id,
+        status=simulation.status,
+        progress=simulation.progress,
+        selection_method=simulation.selection_method,
+        error=simulation.error,
+        created_at=simulation.created_at,
+        started_at=simulation.started_at,
+        finished_at=simulation.finished_at
+    )
+
+@router.get("/jobs/{job_id}", response_model=SimulationJobStatus)
+def get_job_status(
+    job_id: int,
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+):
+    """Status e percentual concluído de uma simulação em segundo plano"""
+    return job_status(get_simulation_job(job_id, current_user, session))
+
+@router.get("/jobs/{job_id}/result", response_model=dict)
+def get_job_result(
+    job_id: int,
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+):
+    """Resultado de uma simulação concluída (recomendações em /mating/recommendations/{simulation_id})"""
+    simulation = get_simulation_job(job_id, current_user, session)
+    if simulation.status != "completed":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Simulação não concluída (status: {simulation.status})"
         )
-        session.add(recommendation)
-        saved_recommendations.append(recommendation)
-    
-    session.commit()
     
+    result = json.loads(simulation.result) if simulation.result else {}
+    if "total_recommendations" not in result:
+        # Simulações antigas, executadas de forma síncrona
+        result["total_recommendations"] = session.exec(
+            select(func.count(MatingRecommendation.id))
+            .where(MatingRecommendation.simulation_id == simulation.id)
+        ).one()
     return {
         "simulation_id": simulation.id,
-        "total_recommendations": len(saved_recommendations),
-        "message": "Simulação executada com sucesso"
+        "job_id": simulation.id,
+        "status": simulation.status,
+        **result
     }
 
-@router.get("/recommendations/{simulation_id}", response_model=List[MatingRecommendationResponse])
-def get_mating_recommendations(
-    simulation_id: int,
+@router.post("/jobs/{job_id}/cancel", response_model=SimulationJobStatus)
+def cancel_job(
+    job_id: int,
     current_user: User = Depends(get_current_active_user),
     session: Session = Depends(get_session),
 ):
-    """Lista recomendações de uma simulação"""
-    
-    recommendations = session.exec(
-        select(MatingRecommendation)
+    """Solicita o cancelamento de uma simulação em fila ou em execução"""
+    simulation = get_simulation_job(job_id, current_user, session)
+    if not jobs.cancel_simulation(session, simulation):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Simulação já finalizada (status: {simulation.status})"
+        )
+    session.refresh(simulation)
+    return job_status(simulation)
+
+# Recomendações lidas por vez ao transmitir listas e exportações
+RECOMMENDATION_STREAM_BATCH = 500
+
+RECOMMENDATION_FIELDS = (
+    "id", "sire_id", "sire_name", "dam_id", "dam_name", "predicted_offspring_index",
+    "predicted_inbreeding", "predicted_genetic_gain", "predicted_dep", "status",
+)
+
+# Ganho usado na ordenação de recomendações sem ganho (ficam no fim da lista)
+_NO_GAIN = -1e300
+
+
+def recommendations_query(
+    simulation_id: int,
+    status_filter: Optional[str] = None,
+    min_inbreeding: Optional[float] = None,
+    max_inbreeding: Optional[float] = None,
+    after: Optional[str] = None,
+):
+    """Recomendações com os nomes de touro e matriz resolvidos por join, em ordem de ganho.
+
+    A ordem (ganho desc, id) permite paginação por cursor: `after` é o cursor
+    da última recomendação da página anterior (ver `recommendation_cursor`).
+    """
+    Sire = aliased(Animal)
+    Dam = aliased(Animal)
+    gain = func.coalesce(MatingRecommendation.predicted_genetic_gain, _NO_GAIN)
+    statement = (
+        select(
+            MatingRecommendation.id,
+            MatingRecommendation.sire_id,
+            Sire.name.label("sire_name"),
+            MatingRecommendation.dam_id,
+            Dam.name.label("dam_name"),
+            MatingRecommendation.predicted_offspring_index,
+            MatingRecommendation.predicted_inbreeding,
+            MatingRecommendation.predicted_genetic_gain,
+            MatingRecommendation.predicted_dep,
+            MatingRecommendation.status,
+        )
+        .outerjoin(Sire, Sire.id == MatingRecommendation.sire_id)
+        .outerjoin(Dam, Dam.id == MatingRecommendation.dam_id)
         .where(MatingRecommendation.simulation_id == simulation_id)
-        .order_by(MatingRecommendation.predicted_genetic_gain.desc())
-    ).all()
-    
-    result = []
-    for rec in recommendations:
-        sire = session.get(Animal, rec.sire_id)
-        dam = session.get(Animal, rec.dam_id)
-        
-        result.append(MatingRecommendationResponse(
-            id=rec.id,
-            sire_id=rec.sire_id,
-            sire_name=sire.name if sire else None,
-            dam_id=rec.dam_id,
-            dam_name=dam.name if dam else None,
-            predicted_offspring_index=rec.predicted_offspring_index,
-            predicted_inbreeding=rec.predicted_inbreeding,
-            predicted_genetic_gain=rec.predicted_genetic_gain,
-            predicted_dep=rec.predicted_dep,
-            status=rec.status
+        .order_by(gain.desc(), MatingRecommendation.id)
+    )
+    if status_filter is not None:
+        statement = statement.where(MatingRecommendation.status == status_filter)
+    if min_inbreeding is not None:
+        statement = statement.where(MatingRecommendation.predicted_inbreeding >= min_inbreeding)
+    if max_inbreeding is not None:
+        statement = statement.where(MatingRecommendation.predicted_inbreeding <= max_inbreeding)
+    if after:
+        try:
+            last_gain, last_id = after.rsplit(":", 1)
+            last_gain, last_id = float(last_gain), int(last_id)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido")
+        statement = statement.where(or_(
+            gain < last_gain,
+            and_(gain == last_gain, MatingRecommendation.id > last_id),
         ))
-    
-    return result
+    return statement
+
+
+def recommendation_cursor(row) -> str:
+    """Cursor de paginação: ganho e id da recomendação"""
+    gain = row.predicted_genetic_gain if row.predicted_genetic_gain is not None else _NO_GAIN
+    return f"{gain!r}:{row.id}"
+
+
+def stream_recommendations(statement, render, head: str = "", separator: str = "", tail: str = ""):
+    """Gera o resultado em partes, lendo as recomendações em lotes.
+
+    Usa uma sessão própria: a da requisição é encerrada antes do fim da transmissão.
+    """
+    with Session(engine) as session:
+        yield head
+        first = True
+        rows = session.exec(statement.execution_options(yield_per=RECOMMENDATION_STREAM_BATCH))
+        for row in rows:
+            yield render(row) if first else separator + render(row)
+            first = False
+        yield tail
+
+
+def _recommendation_json(row) -> str:
+    return json.dumps(dict(zip(RECOMMENDATION_FIELDS, row)), ensure_ascii=False)
+
+
+def _recommendation_csv(row) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow("" if value is None else value for value in row)
+    return buffer.getvalue()
+
+
+@router.get(
+    "/recommendations/{simulation_id}",
+    response_class=JSONResponse,
+    responses={
+        200: {
+            "model": List[MatingRecommendationResponse],
+            "description": "Lista JSON de recomendações (transmitida inteira sem `limit`)",
+            "headers": {
+                "X-Next-Cursor": {
+                    "description": "Cursor da próxima página; ausente na última página ou sem `limit`",
+                    "schema": {"type": "string"},
+                },
+            },
+        },
+    },
+)
+def get_mating_recommendations(
+    simulation_id: int,
+    status_filter: Optional[str] = Query(None, alias="status", description="pending, adopted ou ignored"),
+    min_inbreeding: Optional[float] = Query(None, ge=0, le=100, description="Endogamia prevista mínima (%, 0-100)"),
+    max_inbreeding: Optional[float] = Query(None, ge=0, le=100, description="Endogamia prevista máxima (%, 0-100)"),
+    limit: Optional[int] = Query(None, ge=1, le=5000, description="Tamanho da página; sem limite, a lista é transmitida inteira"),
+    after: Optional[str] = Query(None, description="Cursor retornado no cabeçalho X-Next-Cursor da página anterior"),
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+):
+    """Lista recomendações de uma simulação, da maior para a menor previsão de ganho.
+
+    Com `limit`, retorna uma página e o cursor da próxima no cabeçalho
+    `X-Next-Cursor`; sem `limit`, transmite todas as recomendações.
+    """
+    statement = recommendations_query(simulation_id, status_filter, min_inbreeding, max_inbreeding, after)
+    if limit is None:
+        return StreamingResponse(
+            stream_recommendations(statement, _recommendation_json, "[", ",", "]"),
+            media_type="application/json",
+        )
+
+    rows = session.exec(statement.limit(limit)).all()
+    headers = {"X-Next-Cursor": recommendation_cursor(rows[-1])} if len(rows) == limit else {}
+    return JSONResponse(
+        content=[dict(zip(RECOMMENDATION_FIELDS, row)) for row in rows],
+        headers=headers,
+    )
+
+
+@router.get("/recommendations/{simulation_id}/export")
+def export_mating_recommendations(
+    simulation_id: int,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    status_filter: Optional[str] = Query(None, alias="status", description="pending, adopted ou ignored"),
+    min_inbreeding: Optional[float] = Query(None, ge=0, le=100, description="Endogamia prevista mínima (%, 0-100)"),
+    max_inbreeding: Optional[float] = Query(None, ge=0, le=100, description="Endogamia prevista máxima (%, 0-100)"),
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+):
+    """Exporta as recomendações de uma simulação em CSV ou NDJSON (uma por linha), transmitidas em lotes"""
+    if session.get(MatingSimulationParameters, simulation_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Simulação não encontrada")
+
+    statement = recommendations_query(simulation_id, status_filter, min_inbreeding, max_inbreeding)
+    filename = f"recomendacoes_simulacao_{simulation_id}.{format}"
+    if format == "csv":
+        body = stream_recommendations(statement, _recommendation_csv, head=",".join(RECOMMENDATION_FIELDS) + "\r\n")
+        media_type = "text/csv"
+    else:
+        body = stream_recommendations(statement, lambda row: _recommendation_json(row) + "\n")
+        media_type = "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 @router.post("/recommendations/{recommendation_id}/adopt")
 def adopt_recommendation(
@@ -586,6 +885,7 @@ def batch_create_coverages_from_recommendations(
         select(MatingRecommendation)
         .where(MatingRecommendation.simulation_id == simulation_id)
         .where(MatingRecommendation.status == "adopted")
+        .order_by(MatingRecommendation.id)
     ).all()
     
     if not recommendations:
@@ -594,77 +894,81 @@ def batch_create_coverages_from_recommendations(
             detail="Nenhuma recomendação adotada encontrada para esta simulação"
         )
     
-    created_count = 0
-    errors = []
+    dam_ids = {rec.dam_id for rec in recommendations}
+    animal_ids = dam_ids | {rec.sire_id for rec in recommendations}
+    
+    # Pré-carrega em lote: coberturas já existentes na data, animais e peso mais recente de cada matriz
+    existing = set(session.exec(
+        select(ReproductiveManagement.dam_id, ReproductiveManagement.sire_id)
+        .where(ReproductiveManagement.dam_id.in_(dam_ids))
+        .where(ReproductiveManagement.coverage_date == coverage_date)
+    ).all())
+    found = set(session.exec(select(Animal.id).where(Animal.id.in_(animal_ids))).all())
+    latest = (
+        select(
+            WeightRecord.animal_id,
+            WeightRecord.weight,
+            func.row_number().over(
+                partition_by=WeightRecord.animal_id,
+                order_by=(WeightRecord.measurement_date.desc(), WeightRecord.id.desc()),
+            ).label("position"),
+        )
+        .where(WeightRecord.animal_id.in_(dam_ids))
+        .subquery()
+    )
+    latest_weight = dict(session.exec(
+        select(latest.c.animal_id, latest.c.weight).where(latest.c.position == 1)
+    ).all())
     
+    rows = []
+    errors = []
+    now = datetime.utcnow()
     for rec in recommendations:
-        try:
-            # Verificar se já existe uma cobertura para este par
-            existing = session.exec(
-                select(ReproductiveManagement)
-                .where(ReproductiveManagement.dam_id == rec.dam_id)
-                .where(ReproductiveManagement.sire_id == rec.sire_id)
-                .where(ReproductiveManagement.coverage_date == coverage_date)
-            ).first()
-            
-            if existing:
-                errors.append(f"Cobertura já existe para Matriz {rec.dam_id} x Reprodutor {rec.sire_id}")
-                continue
-            
-            # Buscar informações da matriz
-            dam = session.get(Animal, rec.dam_id)
-            sire = session.get(Animal, rec.sire_id)
-            
-            if not dam or not sire:
-                errors.append(f"Animal não encontrado (Dam: {rec.dam_id}, Sire: {rec.sire_id})")
-                continue
-            
-            # Buscar peso mais recente da matriz (opcional)
-            latest_weight_record = session.exec(
-                select(WeightRecord)
-                .where(WeightRecord.animal_id == rec.dam_id)
-                .order_by(WeightRecord.measurement_date.desc())
-            ).first()
-            
-            dam_weight = latest_weight_record.weight if latest_weight_record else default_dam_weight
-            
-            # Buscar perímetro escrotal mais recente do reprodutor (opcional)
-            # Nota: Perímetro escrotal pode estar em BodyMeasurement ou em observações
-            # Por ora, usar valor padrão None
-            latest_scrotal = None
-            
-            # Criar registro de manejo reprodutivo
-            management = ReproductiveManagement(
-                property_id=rec.property_id,
-                herd_id=rec.herd_id,
-                dam_id=rec.dam_id,
-                coverage_date=coverage_date,
-                dam_weight=dam_weight,
-                dam_body_condition_score=default_dam_body_condition,
-                sire_id=rec.sire_id,
-                sire_scrotal_perimeter=latest_scrotal,
-                parturition_status="em_andamento",
-                observations=f"Criado automaticamente a partir da recomendação #{rec.id}"
-            )
-            
-            session.add(management)
-            created_count += 1
-            
-        except Exception as e:
-            errors.append(f"Erro ao criar cobertura para rec #{rec.id}: {str(e)}")
+        pair = (rec.dam_id, rec.sire_id)
+        if pair in existing:
+            errors.append(f"Cobertura já existe para Matriz {rec.dam_id} x Reprodutor {rec.sire_id}")
             continue
-    
+        if rec.dam_id not in found or rec.sire_id not in found:
+            errors.append(f"Animal não encontrado (Dam: {rec.dam_id}, Sire: {rec.sire_id})")
+            continue
+        existing.add(pair)
+        
+        # Peso mais recente da matriz (opcional); perímetro escrotal ainda não é buscado
+        dam_weight = latest_weight.get(rec.dam_id)
+        rows.append({
+            "property_id": rec.property_id,
+            "herd_id": rec.herd_id,
+            "dam_id": rec.dam_id,
+            "coverage_date": coverage_date,
+            "dam_weight": dam_weight if dam_weight is not None else default_dam_weight,
+            "dam_body_condition_score": default_dam_body_condition,
+            "sire_id": rec.sire_id,
+            "sire_scrotal_perimeter": None,
+            "parturition_status": "em_andamento",
+            "observations": f"Criado automaticamente a partir da recomendação #{rec.id}",
+            "created_at": now,
+            "updated_at": now,
+        })
+    
+    # Todas as coberturas em um único INSERT, na mesma transação
+    if rows:
+        session.execute(insert(ReproductiveManagement.__table__), rows)
+        bump_herd_version(session, {row["herd_id"] for row in rows})
     session.commit()
     
     return {
-        "message": f"{created_count} cobertura(s) criada(s) com sucesso",
-        "created_count": created_count,
+        "message": f"{len(rows)} cobertura(s) criada(s) com sucesso",
+        "created_count": len(rows),
         "errors": errors if errors else None
     }
 
 @router.get("/reports/birth-predictions/{herd_id}", response_model=List[BirthPrediction])
 def get_birth_predictions(
     herd_id: str,
+    coverage_from: Optional[date] = Query(None, description="Coberturas a partir desta data"),
+    coverage_to: Optional[date] = Query(None, description="Coberturas até esta data"),
+    birth_from: Optional[date] = Query(None, description="Partos previstos a partir desta data"),
+    birth_to: Optional[date] = Query(None, description="Partos previstos até esta data"),
     current_user: User = Depends(get_current_active_user),
     session: Session = Depends(get_session),
 ):
@@ -672,39 +976,16 @@ def get_birth_predictions(
     Relatório de Previsão de Partos
     Lista coberturas em andamento com data prevista de parto (cobertura + 152 dias)
     """
-    
-    managements = session.exec(
-        select(ReproductiveManagement)
-        .where(ReproductiveManagement.herd_id == herd_id)
-        .where(ReproductiveManagement.parturition_status == "em_andamento")
-    ).all()
-    
-    predictions = []
-    today = date.today()
-    
-    for mgmt in managements:
-        predicted_date = mgmt.coverage_date + timedelta(days=152)
-        days_until = (predicted_date - today).days
-        
-        dam = session.get(Animal, mgmt.dam_id)
-        sire = session.get(Animal, mgmt.sire_id)
-        
-        predictions.append(BirthPrediction(
-            reproductive_management_id=mgmt.id,
-            dam_id=mgmt.dam_id,
-            dam_name=dam.name if dam else None,
-            sire_id=mgmt.sire_id,
-            sire_name=sire.name if sire else None,
-            coverage_date=mgmt.coverage_date,
-            predicted_birth_date=predicted_date,
-            days_until_birth=days_until
-        ))
-    
-    return predictions
+    return reproductive_reports.birth_predictions(
+        session, herd_id, coverage_from, coverage_to, birth_from, birth_to
+    )
 
 @router.get("/reports/coverage-by-reproducer/{herd_id}", response_model=List[CoverageByReproducer])
 def get_coverage_by_reproducer(
     herd_id: str,
+    coverage_from: Optional[date] = Query(None, description="Coberturas a partir desta data"),
+    coverage_to: Optional[date] = Query(None, description="Coberturas até esta data"),
+    precomputed: bool = Query(False, description="Usa o resumo diário pré-calculado (sem filtro de datas)"),
     current_user: User = Depends(get_current_active_user),
     session: Session = Depends(get_session),
 ):
@@ -712,46 +993,16 @@ def get_coverage_by_reproducer(
     Relatório de Coberturas por Reprodutor
     Consolida coberturas por macho e taxas resultantes
     """
-    
-    # Buscar todos os reprodutores do rebanho
-    reproducers = session.exec(
-        select(Animal)
-        .where(Animal.herd_id == herd_id)
-        .where(Animal.gender == "M")
-        .where(Animal.category.in_(["reprodutor", "marrão"]))
-    ).all()
-    
-    result = []
-    
-    for reproducer in reproducers:
-        # Contar coberturas
-        total_coverages = session.exec(
-            select(func.count(ReproductiveManagement.id))
-            .where(ReproductiveManagement.sire_id == reproducer.id)
-        ).first() or 0
-        
-        total_births = session.exec(
-            select(func.count(ReproductiveManagement.id))
-            .where(ReproductiveManagement.sire_id == reproducer.id)
-            .where(ReproductiveManagement.parturition_status == "sim")
-        ).first() or 0
-        
-        total_ongoing = session.exec(
-            select(func.count(ReproductiveManagement.id))
-            .where(ReproductiveManagement.sire_id == reproducer.id)
-            .where(ReproductiveManagement.parturition_status == "em_andamento")
-        ).first() or 0
-        
-        birth_rate = (total_births / total_coverages * 100) if total_coverages > 0 else 0.0
-        
-        result.append(CoverageByReproducer(
-            sire_id=reproducer.id,
-            sire_name=reproducer.name,
-            total_coverages=total_coverages,
-            total_births=total_births,
-            total_ongoing=total_ongoing,
-            birth_rate=round(birth_rate, 2)
-        ))
-    
-    return result
+    if precomputed and coverage_from is None and coverage_to is None:
+        return reproductive_reports.precomputed_coverage_by_reproducer(session, herd_id)
+    return reproductive_reports.coverage_by_reproducer(session, herd_id, coverage_from, coverage_to)
 
+@router.post("/reports/refresh/{herd_id}")
+def refresh_reproductive_reports(
+    herd_id: str,
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+):
+    """Recalcula o resumo pré-calculado de coberturas por reprodutor (ex.: chamado por um agendamento diário)"""
+    reproducers = reproductive_reports.refresh_coverage_summary(session, herd_id)
+    return {"herd_id": herd_id, "reproducers": reproducers, "refreshed_on": date.today()}
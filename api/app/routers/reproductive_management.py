@@ -5,10 +5,13 @@ from sqlmodel import Session, select
 from pydantic import BaseModel
 from app.core.db import get_session
 from app.core.auth import get_current_active_user
+from app.core import evaluation_tracking, reproductive_kpis
+from app.core.herd_versions import bump_herd_version
 from app.models.reproductive_management import ReproductiveManagement, ReproductiveOffspring
 from app.models.user import User
 from app.models.property import Property
 from app.models.animal import Animal
+from app.models.farm import Herd
 
 router = APIRouter(prefix="/reproductive-management", tags=["reproductive-management"])
 
@@ -110,11 +113,35 @@ def create_reproductive_management(
     # Criar registro
     management = ReproductiveManagement(**management_data.dict())
     
+    bump_herd_version(session, [management.herd_id, dam.herd_id, sire.herd_id])
     session.add(management)
     session.commit()
     session.refresh(management)
     return management
 
+@router.get("/dashboard/{herd_id}")
+def get_reproductive_dashboard(
+    herd_id: str,
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session)
+):
+    """Indicadores reprodutivos do rebanho: geral, por ano, por reprodutor e por matriz.
+
+    Fertilidade, prolificidade, desmame, intervalo entre partos e idade ao
+    primeiro parto (app.core.reproductive_kpis), em cache até a próxima
+    alteração nos dados do rebanho.
+    """
+    herd = session.get(Herd, herd_id)
+    if not herd:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Herd not found")
+    
+    # Verifica permissão
+    prop = session.get(Property, herd.property_id)
+    if not prop or (prop.producer_id != current_user.id and not current_user.is_admin):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    return {"herd_id": herd_id, **reproductive_kpis.get_reproductive_kpis(session, herd_id)}
+
 @router.get("/{management_id}", response_model=ReproductiveManagement)
 def get_reproductive_management(
     management_id: int,
@@ -158,11 +185,17 @@ def update_reproductive_management(
                 detail="Não pode informar dados de parto se parição = não/em andamento"
             )
     
+    # Número de crias dos pais (anteriores e novos) precisa ser reavaliado
+    parents = [obj.sire_id, obj.dam_id]
+    herds = [obj.herd_id]
+    
     # Atualizar campos
     update_data = management_data.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(obj, key, value)
     
+    evaluation_tracking.mark_for_reevaluation(session, parents + [obj.sire_id, obj.dam_id])
+    bump_herd_version(session, herds + [obj.herd_id], parents + [obj.sire_id, obj.dam_id])
     session.add(obj)
     session.commit()
     session.refresh(obj)
@@ -184,6 +217,8 @@ def delete_reproductive_management(
     if not prop or (prop.producer_id != current_user.id and not current_user.is_admin):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
+    evaluation_tracking.mark_for_reevaluation(session, [obj.sire_id, obj.dam_id])
+    bump_herd_version(session, [obj.herd_id], [obj.sire_id, obj.dam_id])
     session.delete(obj)
     session.commit()
     return None
@@ -229,6 +264,7 @@ def add_offspring(
         offspring_id=offspring_data.offspring_id
     )
     
+    bump_herd_version(session, [management.herd_id, offspring.herd_id])
     session.add(offspring_record)
     session.commit()
     session.refresh(offspring_record)
@@ -252,6 +288,8 @@ def remove_offspring(
     if not offspring_record:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Offspring not found")
     
+    management = session.get(ReproductiveManagement, management_id)
+    bump_herd_version(session, [management.herd_id], [offspring_id])
     session.delete(offspring_record)
     session.commit()
     return None
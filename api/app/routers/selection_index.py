@@ -0,0 +1,181 @@
+import json
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from pydantic import BaseModel, Field
+from sqlmodel import Session, select
+
+from app.core import selection_index
+from app.core.auth import get_current_active_user
+from app.core.db import get_session
+from app.models.farm import Herd
+from app.models.mating import SelectionIndexDefinition
+from app.models.property import Property
+from app.models.user import User
+
+router = APIRouter(prefix="/selection-index", tags=["selection-index"])
+
+# ============ SCHEMAS ============
+
+class SelectionIndexTrait(BaseModel):
+    trait: str  # Nome no catálogo (GET /selection-index/traits)
+    economic_weight: float  # Valor econômico por unidade da característica
+    heritability: Optional[float] = Field(None, gt=0, lt=1)  # Padrão: h² do catálogo
+
+class SelectionIndexRequest(BaseModel):
+    traits: List[SelectionIndexTrait] = Field(..., min_length=1, max_length=30)
+    genetic_correlations: Optional[List[List[float]]] = None  # Padrão: correlações fenotípicas do rebanho
+
+# ============ FUNÇÕES AUXILIARES ============
+
+def get_authorized_herd(herd_id: str, current_user: User, session: Session) -> Herd:
+    """Busca o rebanho verificando a permissão do usuário"""
+    herd = session.get(Herd, herd_id)
+    if not herd:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Herd not found")
+    prop = session.get(Property, herd.property_id)
+    if not prop or (prop.producer_id != current_user.id and not current_user.is_admin):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    return herd
+
+def get_definition(session: Session, herd_id: str) -> SelectionIndexDefinition:
+    definition = session.exec(
+        select(SelectionIndexDefinition).where(SelectionIndexDefinition.herd_id == herd_id)
+    ).first()
+    if not definition:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Índice de seleção não definido para o rebanho"
+        )
+    return definition
+
+def definition_response(definition: SelectionIndexDefinition) -> dict:
+    traits = json.loads(definition.traits)
+    return {
+        "herd_id": definition.herd_id,
+        "traits": [
+            {
+                "trait": trait,
+                "description": selection_index.TRAITS.get(trait, (None,))[0],
+                "economic_weight": weight,
+                "heritability": h2,
+                "mean": round(mean, 4),
+                "index_weight": round(b, 6),
+            }
+            for trait, weight, h2, mean, b in zip(
+                traits,
+                json.loads(definition.economic_weights),
+                json.loads(definition.heritabilities),
+                json.loads(definition.means),
+                json.loads(definition.index_weights),
+            )
+        ],
+        "genetic_correlations": json.loads(definition.genetic_correlations) if definition.genetic_correlations else None,
+        "phenotypic_covariance": json.loads(definition.phenotypic_covariance),
+        "genetic_covariance": json.loads(definition.genetic_covariance),
+        "records": definition.records,
+        "computed_at": definition.computed_at,
+    }
+
+# ============ ENDPOINTS ============
+
+@router.get("/traits", response_model=List[dict])
+def list_traits(current_user: User = Depends(get_current_active_user)):
+    """Características disponíveis para o índice, com a herdabilidade padrão"""
+    return [
+        {"trait": trait, "description": description, "default_heritability": h2}
+        for trait, (description, h2) in selection_index.TRAITS.items()
+    ]
+
+@router.put("/{herd_id}", response_model=dict)
+def define_selection_index(
+    herd_id: str,
+    request: SelectionIndexRequest,
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+):
+    """
+    Define (ou recalcula) o índice de seleção multicaracterística do rebanho.
+
+    Estima as covariâncias fenotípica (P) e genética (G) das características
+    nos animais ativos, calcula b = P⁻¹Gw e grava a definição; a classificação
+    (GET /selection-index/{herd_id}/ranking) reutiliza esses parâmetros até a
+    próxima definição.
+    """
+    get_authorized_herd(herd_id, current_user, session)
+    try:
+        components = selection_index.build_index(
+            session,
+            herd_id,
+            [item.trait for item in request.traits],
+            [item.economic_weight for item in request.traits],
+            [item.heritability for item in request.traits],
+            request.genetic_correlations,
+        )
+    except (ValueError, ArithmeticError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    definition = session.exec(
+        select(SelectionIndexDefinition).where(SelectionIndexDefinition.herd_id == herd_id)
+    ).first() or SelectionIndexDefinition(herd_id=herd_id)
+    for key, value in components.items():
+        setattr(definition, key, json.dumps(value) if key != "records" and value is not None else value)
+    definition.computed_at = datetime.utcnow()
+    definition.updated_at = definition.computed_at
+    session.add(definition)
+    session.commit()
+    session.refresh(definition)
+    return definition_response(definition)
+
+@router.get("/{herd_id}", response_model=dict)
+def get_selection_index(
+    herd_id: str,
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+):
+    """Definição do índice de seleção do rebanho"""
+    get_authorized_herd(herd_id, current_user, session)
+    return definition_response(get_definition(session, herd_id))
+
+@router.get("/{herd_id}/ranking", response_model=dict)
+def rank_animals(
+    herd_id: str,
+    gender: Optional[str] = Query(None, description="M ou F"),
+    limit: Optional[int] = Query(None, ge=1),
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+):
+    """
+    Classifica os animais ativos do rebanho pelo índice de seleção definido.
+
+    Os fenótipos são lidos com uma consulta por tabela de origem e o rebanho
+    inteiro é pontuado de uma vez (app.core.selection_index.score). Animais
+    sem alguma característica usam o índice reduzido às medidas disponíveis,
+    com acurácia menor; os sem nenhuma ficam ao final, sem índice.
+    """
+    get_authorized_herd(herd_id, current_user, session)
+    definition = get_definition(session, herd_id)
+    started = time.perf_counter()
+    ranking = selection_index.rank_herd(
+        session,
+        herd_id,
+        json.loads(definition.traits),
+        json.loads(definition.means),
+        json.loads(definition.phenotypic_covariance),
+        json.loads(definition.genetic_covariance),
+        json.loads(definition.economic_weights),
+    )
+    if gender:
+        ranking = [row for row in ranking if row["gender"] == gender]
+    total = len(ranking)
+    if limit:
+        ranking = ranking[:limit]
+    return {
+        "herd_id": herd_id,
+        "computed_at": definition.computed_at,
+        "total": total,
+        "animals": ranking,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
@@ -0,0 +1,91 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlmodel import Session, select
+
+from app.core import variance_components
+from app.core.auth import get_current_active_user
+from app.core.db import get_session
+from app.core.herd_versions import herd_data_version
+from app.models.farm import Herd
+from app.models.mating import VarianceComponentEstimate
+from app.models.property import Property
+from app.models.user import User
+
+router = APIRouter(prefix="/variance-components", tags=["variance-components"])
+
+# ============ FUNÇÕES AUXILIARES ============
+
+def get_authorized_herd(herd_id: str, current_user: User, session: Session) -> Herd:
+    """Busca o rebanho verificando a permissão do usuário"""
+    herd = session.get(Herd, herd_id)
+    if not herd:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Herd not found")
+    prop = session.get(Property, herd.property_id)
+    if not prop or (prop.producer_id != current_user.id and not current_user.is_admin):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    return herd
+
+def estimate_response(estimate: VarianceComponentEstimate, data_version: int) -> dict:
+    return {
+        "id": estimate.id,
+        "trait": estimate.trait,
+        "weight_adjustment_days": estimate.weight_adjustment_days,
+        "status": estimate.status,
+        "heritability": estimate.heritability,
+        "heritability_se": estimate.heritability_se,
+        "additive_variance": estimate.additive_variance,
+        "residual_variance": estimate.residual_variance,
+        "log_likelihood": estimate.log_likelihood,
+        "records": estimate.records,
+        "pedigree_animals": estimate.pedigree_animals,
+        "contemporary_groups": estimate.contemporary_groups,
+        "evaluations": estimate.evaluations,
+        # Dados do rebanho alterados desde a estimação
+        "outdated": estimate.data_version is not None and estimate.data_version != data_version,
+        "error": estimate.error,
+        "started_at": estimate.started_at,
+        "finished_at": estimate.finished_at,
+    }
+
+# ============ ENDPOINTS ============
+
+@router.post("/{herd_id}", response_model=dict, status_code=status.HTTP_202_ACCEPTED)
+def estimate_variance_components(
+    herd_id: str,
+    weight_adjustment_days: int = Query(60, description="Idade de ajuste do peso (60, 120, 180)"),
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+):
+    """
+    Envia para segundo plano a estimação por REML da herdabilidade e dos
+    componentes de variância do peso ajustado, com o modelo animal da
+    avaliação BLUP (genealogia da propriedade, grupos de contemporâneos do
+    rebanho). Acompanhe em GET /variance-components/{herd_id}; concluída, a
+    estimativa passa a ser o h² padrão das simulações e avaliações do rebanho.
+    """
+    herd = get_authorized_herd(herd_id, current_user, session)
+    if weight_adjustment_days <= 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="weight_adjustment_days deve ser positivo")
+    estimate = variance_components.submit_estimate(session, herd.property_id, herd.id, weight_adjustment_days)
+    return {"herd_id": herd.id, **estimate_response(estimate, herd_data_version(session, herd.id))}
+
+@router.get("/{herd_id}", response_model=dict)
+def get_variance_components(
+    herd_id: str,
+    current_user: User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+):
+    """Estimativas do rebanho por característica e o h² padrão usado por simulações e avaliações"""
+    herd = get_authorized_herd(herd_id, current_user, session)
+    data_version = herd_data_version(session, herd.id)
+    estimates: List[VarianceComponentEstimate] = session.exec(
+        select(VarianceComponentEstimate)
+        .where(VarianceComponentEstimate.herd_id == herd.id)
+        .order_by(VarianceComponentEstimate.weight_adjustment_days)
+    ).all()
+    return {
+        "herd_id": herd.id,
+        "default_heritability": variance_components.DEFAULT_HERITABILITY,
+        "estimates": [estimate_response(estimate, data_version) for estimate in estimates],
+    }
@@ -0,0 +1,229 @@
+"""
+Benchmark do caminho crítico do módulo de acasalamento.
+
+Gera rebanhos sintéticos (benchmarks/synthetic_herd.py) em um banco SQLite
+temporário e mede, em cada escala:
+- genetic_evaluation_full: calculate_genetic_evaluation_for_herd com full=true
+- genetic_evaluation_incremental: a mesma chamada sem alterações pendentes
+- eligible_animals: get_eligible_animals
+- mating_simulation: run_mating_simulation com todos os elegíveis
+
+Para cada etapa são registrados o tempo da primeira chamada (caches frios), a
+mediana das repetições seguintes, o número de comandos SQL enviados ao banco e
+o pico de memória Python (tracemalloc, medido em uma execução extra para não
+distorcer os tempos).
+
+Com --output os resultados são gravados em JSON; com --baseline são comparados
+com um resultado anterior, e o script termina com código 1 se alguma etapa
+ficar mais lenta que --tolerance × a referência ou enviar mais comandos SQL.
+
+Uso:
+    python benchmarks/bench_mating.py
+    python benchmarks/bench_mating.py --scales small,medium --output bench.json
+    python benchmarks/bench_mating.py --baseline bench.json --tolerance 1.5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, ".."))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+# Escalas: nascimentos por geração, gerações, fração de acasalamentos entre parentes e pesagens por animal
+SCALES = {
+    "small": {"animals_per_generation": 150, "generations": 4, "inbreeding": 0.1, "weighings": 4},
+    "medium": {"animals_per_generation": 500, "generations": 5, "inbreeding": 0.1, "weighings": 4},
+    "large": {"animals_per_generation": 1500, "generations": 6, "inbreeding": 0.1, "weighings": 5},
+}
+
+HERITABILITY = 0.3
+WEIGHT_ADJUSTMENT_DAYS = 60
+MAX_FEMALE_PERCENTAGE_PER_MALE = 5.0
+
+
+class QueryCounter:
+    """Conta os comandos SQL enviados pelo engine (executemany conta como um)"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+def measure(step, counter: QueryCounter, repeat: int) -> dict:
+    """Tempo frio, mediana das repetições, comandos SQL da primeira chamada e pico de memória"""
+    counter.count = 0
+    start = time.perf_counter()
+    step()
+    cold = time.perf_counter() - start
+    queries = counter.count
+
+    warm = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        step()
+        warm.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    step()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "cold_seconds": round(cold, 4),
+        "warm_seconds": round(statistics.median(warm), 4) if warm else None,
+        "queries": queries,
+        "peak_memory_mb": round(peak / 2 ** 20, 2),
+    }
+
+
+def run_scale(name: str, spec: dict, user, counter: QueryCounter, repeat: int, seed: int) -> dict:
+    from sqlmodel import Session, select
+
+    from app.core.db import engine
+    from app.models.animal import Animal
+    from app.routers import mating
+    from synthetic_herd import create_herd
+
+    start = time.perf_counter()
+    with Session(engine) as session:
+        herd = create_herd(session, name, seed=seed, **spec)
+        session.commit()
+    generation_seconds = time.perf_counter() - start
+
+    def genetic_evaluation(full: bool):
+        def step():
+            with Session(engine) as session:
+                mating.calculate_genetic_evaluation_for_herd(
+                    name, HERITABILITY, WEIGHT_ADJUSTMENT_DAYS, method="blup", full=full,
+                    current_user=user, session=session,
+                )
+        return step
+
+    def eligible_animals():
+        with Session(engine) as session:
+            return mating.get_eligible_animals(
+                name, 6, 8, sort_by=None, limit=None, offset=0, current_user=user, session=session
+            )
+
+    eligible = eligible_animals()
+    male_ids = [animal.id for animal in eligible["males"]]
+    female_ids = [animal.id for animal in eligible["females"]]
+
+    def mating_simulation():
+        with Session(engine) as session:
+            males = session.exec(select(Animal).where(Animal.id.in_(male_ids))).all()
+            females = session.exec(select(Animal).where(Animal.id.in_(female_ids))).all()
+            mating.run_mating_simulation(
+                males, females, session, HERITABILITY, WEIGHT_ADJUSTMENT_DAYS, MAX_FEMALE_PERCENTAGE_PER_MALE
+            )
+
+    steps = {
+        "genetic_evaluation_full": measure(genetic_evaluation(True), counter, repeat),
+        "genetic_evaluation_incremental": measure(genetic_evaluation(False), counter, repeat),
+        "eligible_animals": measure(eligible_animals, counter, repeat),
+        "mating_simulation": measure(mating_simulation, counter, repeat),
+    }
+    return {
+        "herd": herd,
+        "eligible_males": len(male_ids),
+        "eligible_females": len(female_ids),
+        "generation_seconds": round(generation_seconds, 2),
+        "steps": steps,
+    }
+
+
+def print_scale(name: str, result: dict) -> None:
+    herd = result["herd"]
+    print(f"\n{name}: {herd['animals']} animais ({herd['active']} ativos), {herd['weights']} pesagens, "
+          f"{result['eligible_males']} reprodutores × {result['eligible_females']} matrizes elegíveis")
+    for step, values in result["steps"].items():
+        warm = f"{values['warm_seconds']:8.3f}s" if values["warm_seconds"] is not None else "       -"
+        print(f"  {step:<32} frio {values['cold_seconds']:8.3f}s  repetição {warm}  "
+              f"SQL {values['queries']:6d}  memória {values['peak_memory_mb']:8.2f} MB")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Etapas mais lentas que tolerance × referência ou com mais comandos SQL"""
+    regressions = []
+    for scale, result in results.items():
+        for step, values in result["steps"].items():
+            reference = baseline.get(scale, {}).get("steps", {}).get(step)
+            if reference is None:
+                continue
+            for key in ("cold_seconds", "warm_seconds"):
+                if values[key] is not None and reference.get(key) and values[key] > tolerance * reference[key]:
+                    regressions.append(f"{scale}/{step}: {key} {values[key]:.3f}s (referência {reference[key]:.3f}s)")
+            if values["queries"] > reference["queries"]:
+                regressions.append(f"{scale}/{step}: {values['queries']} comandos SQL (referência {reference['queries']})")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="small,medium,large", help=f"escalas separadas por vírgula: {', '.join(SCALES)}")
+    parser.add_argument("--repeat", type=int, default=3, help="repetições após a primeira chamada")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="grava os resultados em JSON")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para comparação")
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    parser.add_argument("--database", help="arquivo SQLite a usar (padrão: temporário, removido ao final)")
+    args = parser.parse_args()
+
+    scales = [scale.strip() for scale in args.scales.split(",") if scale.strip()]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"escalas desconhecidas: {', '.join(unknown)}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.abspath(args.database or os.path.join(directory, "benchmark.db"))
+        if os.path.exists(path):
+            parser.error(f"{path} já existe")
+        # O engine é criado na importação de app.core.db: o banco precisa ser definido antes
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+        os.environ.setdefault("APP_ENV", "benchmark")
+        from sqlmodel import Session
+
+        from app.core.db import engine, init_db
+        from synthetic_herd import create_owner
+
+        init_db()
+        with Session(engine) as session:
+            user = create_owner(session)
+            session.commit()
+            session.refresh(user)
+            session.expunge(user)
+        counter = QueryCounter(engine)
+
+        results = {}
+        for scale in scales:
+            results[scale] = run_scale(scale, SCALES[scale], user, counter, args.repeat, args.seed)
+            print_scale(scale, results[scale])
+        engine.dispose()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressões:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nSem regressões em relação à referência")
+
+
+if __name__ == "__main__":
+    main()
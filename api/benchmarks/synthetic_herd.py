@@ -0,0 +1,271 @@
+"""
+Gerador de rebanhos sintéticos para os benchmarks do módulo de acasalamento.
+
+Simula um rebanho de caprinos/ovinos ao longo de várias gerações com genealogia
+completa, valores genéticos e pesagens:
+
+- cada geração nasce de uma estação de monta anual; os reprodutores são os
+  machos de melhor fenótipo da geração anterior (1 para cada 25 matrizes) e as
+  matrizes são as fêmeas das duas últimas gerações;
+- com probabilidade `inbreeding`, a matriz é escolhida entre as parentes do
+  reprodutor (filhas ou meias-irmãs), o que controla a endogamia do rebanho;
+- valor genético da cria = média dos pais + amostragem mendeliana; o peso segue
+  uma curva linear de ganho diário com efeito genético, de ano e residual;
+- cada animal tem até `weighings` pesagens, a cada `weighing_interval_days`
+  dias a partir do nascimento (10% das pesagens previstas são perdidas).
+
+Ficam ativos os animais das duas últimas gerações, exceto os machos não
+selecionados da penúltima, e os reprodutores em uso; os demais são vendidos.
+Os registros são gravados em lote (INSERT com executemany) e as estatísticas
+de peso do rebanho (app.core.herd_statistics), que os INSERTs em lote não
+atualizam, são recalculadas no fim; esse recálculo faz o commit.
+
+Uso:
+    python benchmarks/synthetic_herd.py caminho.db --animals 500 --generations 5
+"""
+
+import argparse
+import os
+import sys
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# Matrizes por reprodutor na estação de monta
+FEMALES_PER_SIRE = 25
+# Gerações de fêmeas usadas como matrizes
+DAM_GENERATIONS = 2
+# Ganho médio diário (kg/dia) e desvio-padrão genético do ganho
+DAILY_GAIN = 0.12
+GENETIC_SD = 0.015
+RESIDUAL_SD = 0.8
+
+
+def _relatives(sire: int, father: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+    """Matrizes candidatas que são filhas ou meias-irmãs paternas do reprodutor"""
+    daughters = father[candidates] == sire
+    half_sibs = (father[candidates] == father[sire]) & (father[sire] >= 0)
+    return candidates[daughters | half_sibs]
+
+
+def generate_herd(
+    session,
+    property_id: str,
+    herd_id: str,
+    race_id: str,
+    animals_per_generation: int = 500,
+    generations: int = 5,
+    inbreeding: float = 0.1,
+    weighings: int = 4,
+    weighing_interval_days: int = 60,
+    seed: int = 1,
+) -> Dict[str, int]:
+    """Grava animais e pesagens do rebanho sintético; retorna as quantidades geradas"""
+    from sqlalchemy import insert
+    from sqlmodel import func, select
+
+    from app.core import herd_statistics, mating_engine
+    from app.models.animal import Animal
+    from app.models.animal_measurements import WeightRecord
+
+    rng = np.random.default_rng(seed)
+    founders = max(2 * FEMALES_PER_SIRE // 5, animals_per_generation // 2)
+    total = founders + animals_per_generation * generations
+    today = date.today()
+    # A última geração nasce há cerca de um ano, para já estar em idade de reprodução
+    first_season = today - timedelta(days=365 * (generations + 1))
+
+    # Animais ainda não nascidos ficam com geração além da última, fora dos grupos de pais
+    generation = np.full(total, generations + 1, dtype=np.int64)
+    male = np.zeros(total, dtype=bool)
+    father = np.full(total, -1, dtype=np.int64)
+    mother = np.full(total, -1, dtype=np.int64)
+    tbv = np.zeros(total)
+    phenotype = np.zeros(total)
+    birth_day = np.zeros(total, dtype=np.int64)  # dias desde a primeira estação
+    sire_of_last = np.zeros(total, dtype=bool)
+
+    def birth(start: int, count: int, g: int) -> np.ndarray:
+        born = np.arange(start, start + count)
+        generation[born] = g
+        male[born] = rng.random(count) < 0.5
+        birth_day[born] = 365 * g + rng.integers(0, 90, count)
+        return born
+
+    born = birth(0, founders, 0)
+    tbv[born] = rng.normal(0.0, GENETIC_SD, founders)
+    year_effect = rng.normal(0.0, 0.01, generations + 1)
+    phenotype[born] = tbv[born] + year_effect[0] + rng.normal(0.0, GENETIC_SD, founders)
+
+    next_id = founders
+    for g in range(1, generations + 1):
+        pool = np.flatnonzero((generation < g) & (generation >= g - DAM_GENERATIONS) & ~male)
+        young_males = np.flatnonzero((generation == g - 1) & male)
+        if len(pool) == 0 or len(young_males) == 0:
+            break
+        n_sires = min(len(young_males), max(1, -(-len(pool) // FEMALES_PER_SIRE)))
+        sires = young_males[np.argsort(-phenotype[young_males])[:n_sires]]
+        if g == generations:
+            sire_of_last[sires] = True
+
+        born = birth(next_id, animals_per_generation, g)
+        next_id += animals_per_generation
+        dam_choice = rng.choice(pool, len(born))
+        sire_choice = rng.choice(sires, len(born))
+        for k in np.flatnonzero(rng.random(len(born)) < inbreeding):
+            relatives = _relatives(sire_choice[k], father, pool)
+            if len(relatives):
+                dam_choice[k] = rng.choice(relatives)
+        father[born], mother[born] = sire_choice, dam_choice
+        # Amostragem mendeliana sem correção pela endogamia dos pais
+        tbv[born] = 0.5 * (tbv[sire_choice] + tbv[dam_choice]) + rng.normal(0.0, GENETIC_SD * np.sqrt(0.5), len(born))
+        phenotype[born] = tbv[born] + year_effect[g] + rng.normal(0.0, GENETIC_SD, len(born))
+
+    # Animais ativos: duas últimas gerações (sem os machos não selecionados da penúltima) e reprodutores em uso
+    last = generation == generations
+    active = last | sire_of_last | ((generation == generations - 1) & ~male)
+
+    start_id = (session.exec(select(func.max(Animal.id))).one() or 0) + 1
+    now = datetime.utcnow()
+    animal_rows: List[Dict] = []
+    weight_rows: List[Dict] = []
+    for i in range(total):
+        animal_id = start_id + i
+        born_on = first_season + timedelta(days=int(birth_day[i]))
+        if sire_of_last[i]:
+            category = "reprodutor"
+        elif last[i]:
+            category = "cabrito"
+        else:
+            category = "reprodutor" if male[i] else "matriz"
+        animal_rows.append({
+            "id": animal_id,
+            "property_id": property_id,
+            "herd_id": herd_id,
+            "race_id": race_id,
+            "earring_identification": f"{herd_id}-{i + 1:06d}",
+            "name": f"{'M' if male[i] else 'F'}{i + 1}",
+            "birth_date": born_on,
+            "gender": "M" if male[i] else "F",
+            "objective": "reproducao",
+            "entry_reason": "nascimento" if father[i] >= 0 else "compra",
+            "category": category,
+            "childbirth_type": "simples",
+            "father_id": start_id + int(father[i]) if father[i] >= 0 else None,
+            "mother_id": start_id + int(mother[i]) if mother[i] >= 0 else None,
+            "genetic_composition": "PO",
+            "has_beard": False,
+            "has_earring": False,
+            "has_horn": False,
+            "has_supranumerary_teats": False,
+            "status": "ativo" if active[i] else "vendido",
+            "created_at": now,
+            "updated_at": now,
+        })
+
+        birth_weight = 3.0 + rng.normal(0.0, 0.4)
+        gain = DAILY_GAIN + tbv[i] + year_effect[generation[i]]
+        for k in range(weighings):
+            if rng.random() < 0.1:
+                continue
+            age = k * weighing_interval_days + (int(rng.integers(-7, 8)) if k else 0)
+            measured_on = born_on + timedelta(days=age)
+            if measured_on > today:
+                break
+            weight_rows.append({
+                "animal_id": animal_id,
+                "measurement_period": "ao_nascer" if k == 0 else ("desmame" if k == 1 else "outros"),
+                "measurement_date": measured_on,
+                "weight": round(max(0.5, birth_weight + gain * age + rng.normal(0.0, RESIDUAL_SD)), 2),
+                "created_at": now,
+                "updated_at": now,
+            })
+
+    session.execute(insert(Animal.__table__), animal_rows)
+    if weight_rows:
+        session.execute(insert(WeightRecord.__table__), weight_rows)
+    herd_statistics.rebuild_herd_statistics(session, herd_id)
+
+    # Sem as médias materializadas do rebanho o DEP simplificado de todos seria zero
+    active_animals = session.exec(
+        select(Animal).where(Animal.herd_id == herd_id).where(Animal.status == "ativo")
+    ).all()
+    deps = mating_engine._load_deps(active_animals, session, 60, use_evaluations=False)
+    assert np.count_nonzero(deps), f"Rebanho sintético {herd_id} sem DEP diferente de zero"
+    return {
+        "animals": total,
+        "active": int(active.sum()),
+        "active_males": int((active & male).sum()),
+        "active_females": int((active & ~male).sum()),
+        "weights": len(weight_rows),
+    }
+
+
+def create_owner(session, user_id: str = "benchmark", property_id: str = "benchmark", race_id: str = "benchmark"):
+    """Usuário administrador, propriedade e raça donos dos rebanhos sintéticos; retorna o usuário"""
+    from app.models.property import Property
+    from app.models.taxonomy import Race
+    from app.models.user import User
+
+    user = session.get(User, user_id)
+    if user is None:
+        user = User(
+            id=user_id, name="Benchmark", email=f"{user_id}@example.com", password="-",
+            cpf=user_id, phone=user_id, is_admin=True, is_producer=True,
+        )
+        session.add(user)
+    if session.get(Property, property_id) is None:
+        session.add(Property(id=property_id, producer_id=user_id, name="Benchmark", state="PI", city="Teresina"))
+    if session.get(Race, race_id) is None:
+        session.add(Race(id=race_id, name="Sintética"))
+    session.flush()
+    return user
+
+
+def create_herd(session, herd_id: str, property_id: str = "benchmark", race_id: str = "benchmark", **kwargs) -> Dict[str, int]:
+    """Cria o rebanho `herd_id` na propriedade e gera seus animais (argumentos de generate_herd)"""
+    from app.models.farm import Herd
+
+    session.add(Herd(
+        id=herd_id, property_id=property_id, name=f"Rebanho {herd_id}", species="caprino",
+        feeding_management="semi-intensivo", production_type="carne",
+    ))
+    session.flush()
+    return generate_herd(session, property_id, herd_id, race_id, **kwargs)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("database", help="arquivo SQLite a criar/completar")
+    parser.add_argument("--herd", default="sintetico")
+    parser.add_argument("--animals", type=int, default=500, help="nascimentos por geração")
+    parser.add_argument("--generations", type=int, default=5)
+    parser.add_argument("--inbreeding", type=float, default=0.1, help="fração de acasalamentos entre parentes")
+    parser.add_argument("--weighings", type=int, default=4, help="pesagens por animal")
+    parser.add_argument("--interval", type=int, default=60, help="dias entre pesagens")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(args.database)}"
+    os.environ.setdefault("APP_ENV", "benchmark")
+    from sqlmodel import Session
+
+    from app.core.db import engine, init_db
+
+    init_db()
+    with Session(engine) as session:
+        create_owner(session)
+        counts = create_herd(
+            session, args.herd,
+            animals_per_generation=args.animals, generations=args.generations, inbreeding=args.inbreeding,
+            weighings=args.weighings, weighing_interval_days=args.interval, seed=args.seed,
+        )
+        session.commit()
+    print(f"Rebanho {args.herd}: {counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ Demonstra o uso das principais funcionalidades.
 IMPORTANTE: Execute apenas em ambiente de desenvolvimento/teste!
 """
 
+import time
 import requests
 from datetime import date
 import json
@@ -92,6 +93,74 @@ def calculate_genetic_evaluation(herd_id):
         print(f"❌ Erro ao calcular avaliação: {response.text}")
         return False
 
+def get_herd_deps(herd_id):
+    """DEP gravada de cada animal ativo do rebanho (via animais elegíveis sem idade mínima)"""
+    params = {"min_age_male_months": 0, "min_age_female_months": 0}
+    response = requests.get(
+        f"{API_URL}/mating/eligible-animals/{herd_id}",
+        headers=get_headers(),
+        params=params
+    )
+    data = response.json()
+    return {a['id']: a['dep'] for a in data['males'] + data['females']}
+
+def check_incremental_evaluation(herd_id, animal_id, method="simplified"):
+    """Compara a avaliação incremental, após uma pesagem nova, com uma avaliação completa"""
+    url = f"{API_URL}/mating/calculate-genetic-evaluation/{herd_id}"
+    params = {"heritability": 0.3, "weight_adjustment_days": 60, "method": method}
+    requests.post(url, headers=get_headers(), params={**params, "full": True})
+    
+    response = requests.post(
+        f"{API_URL}/animals/{animal_id}/weights",
+        headers=get_headers(),
+        json={"measurement_period": "desmama", "weight": 400.0}
+    )
+    weight_id = response.json()['id']
+    requests.post(url, headers=get_headers(), params=params)
+    incremental = get_herd_deps(herd_id)
+    requests.post(url, headers=get_headers(), params={**params, "full": True})
+    full = get_herd_deps(herd_id)
+    
+    # Desfaz a pesagem de teste
+    requests.delete(f"{API_URL}/animals/{animal_id}/weights/{weight_id}", headers=get_headers())
+    requests.post(url, headers=get_headers(), params={**params, "full": True})
+    
+    mismatches = [a for a in full if incremental.get(a) != full[a]]
+    if mismatches:
+        print(f"❌ Avaliação incremental ({method}) difere da completa em {len(mismatches)} animais")
+        return False
+    print(f"\n✅ Avaliação incremental ({method}) igual à completa ({len(full)} animais)")
+    return True
+
+def check_growth_curve_refit(herd_id, animal_id):
+    """Altera uma pesagem e confere que a curva de crescimento do animal é reajustada"""
+    def animal_curve():
+        response = requests.get(f"{API_URL}/growth-curves/animal/{animal_id}", headers=get_headers())
+        return response.json()['curve']
+    
+    fit_url = f"{API_URL}/growth-curves/{herd_id}/fit"
+    requests.post(fit_url, headers=get_headers())
+    before = animal_curve()
+    
+    weights = requests.get(f"{API_URL}/animals/{animal_id}/weights", headers=get_headers()).json()
+    record = max(weights, key=lambda w: w['measurement_date'])
+    weight_url = f"{API_URL}/animals/{animal_id}/weights/{record['id']}"
+    payload = {"measurement_period": record['measurement_period'], "weight": record['weight'] * 3}
+    requests.put(weight_url, headers=get_headers(), json=payload)
+    requests.post(fit_url, headers=get_headers())
+    after = animal_curve()
+    
+    # Desfaz a alteração de teste
+    requests.put(weight_url, headers=get_headers(), json={**payload, "weight": record['weight']})
+    requests.post(fit_url, headers=get_headers())
+    
+    if before == after:
+        print(f"❌ Curva do animal #{animal_id} não foi reajustada após alterar a pesagem")
+        return False
+    print(f"\n✅ Curva do animal #{animal_id} reajustada: peso adulto "
+          f"{before and before['mature_weight']} → {after and after['mature_weight']}")
+    return True
+
 def simulate_mating(herd_id, property_id, male_ids, female_ids):
     """Executa simulação de acasalamentos"""
     payload = {
@@ -117,15 +186,28 @@ def simulate_mating(herd_id, property_id, male_ids, female_ids):
         params=params
     )
     
-    if response.status_code == 200:
-        data = response.json()
-        print(f"\n✅ Simulação executada!")
-        print(f"  - ID da simulação: {data['simulation_id']}")
-        print(f"  - Total de recomendações: {data['total_recommendations']}")
-        return data['simulation_id']
-    else:
+    if response.status_code != 202:
         print(f"❌ Erro na simulação: {response.text}")
         return None
+    
+    # A simulação roda em segundo plano: acompanhar o job até terminar
+    job_id = response.json()['job_id']
+    while True:
+        job = requests.get(f"{API_URL}/mating/jobs/{job_id}", headers=get_headers()).json()
+        if job['status'] not in ('queued', 'running'):
+            break
+        print(f"  ... {job['status']} ({job['progress']:.0f}%)")
+        time.sleep(1)
+    
+    if job['status'] != 'completed':
+        print(f"❌ Erro na simulação: {job['status']} {job.get('error') or ''}")
+        return None
+    
+    data = requests.get(f"{API_URL}/mating/jobs/{job_id}/result", headers=get_headers()).json()
+    print(f"\n✅ Simulação executada!")
+    print(f"  - ID da simulação: {data['simulation_id']}")
+    print(f"  - Total de recomendações: {data['total_recommendations']}")
+    return data['simulation_id']
 
 def get_recommendations(simulation_id):
     """Lista recomendações de uma simulação"""
@@ -225,6 +307,10 @@ def run_full_test():
     
     # 4. Calcular avaliação genética
     calculate_genetic_evaluation(herd_id)
+    check_growth_curve_refit(herd_id, animals['females'][0]['id'])
+    check_incremental_evaluation(herd_id, animals['females'][0]['id'], method="simplified")
+    check_incremental_evaluation(herd_id, animals['females'][0]['id'], method="blup")
+    calculate_genetic_evaluation(herd_id)
     
     # 5. Executar simulação
     male_ids = [m['id'] for m in animals['males'][:3]]  # Primeiros 3 machos
@@ -34,6 +34,7 @@ import {
   getEligibleAnimals,
   calculateGeneticEvaluation,
   simulateMating,
+  waitForMatingJob,
   getMatingRecommendations,
   adoptRecommendation,
   batchCreateCoverages
@@ -162,7 +163,10 @@ const MatingStepper = () => {
       }, selectedMaleIds, selectedFemaleIds);
       
       setSimulationId(response.simulation_id);
-      message.success(response.message);
+      
+      // A simulação roda em segundo plano: aguardar a conclusão do job
+      await waitForMatingJob(response.job_id);
+      message.success('Simulação executada com sucesso');
       
       // Carregar recomendações
       loadRecommendations(response.simulation_id);
@@ -735,7 +735,7 @@ export async function calculateGeneticEvaluation(herdId, heritability, weightAdj
 }
 
 /**
- * Executa simulação de acasalamentos
+ * Envia simulação de acasalamentos (executada em segundo plano; retorna job_id)
  */
 export async function simulateMating(params, selectedMaleIds, selectedFemaleIds) {
   const queryParams = new URLSearchParams();
@@ -748,6 +748,44 @@ export async function simulateMating(params, selectedMaleIds, selectedFemaleIds)
   });
 }
 
+/**
+ * Status e percentual concluído de uma simulação
+ */
+export async function getMatingJob(jobId) {
+  return apiRequest(`/mating/jobs/${jobId}`);
+}
+
+/**
+ * Resultado de uma simulação concluída
+ */
+export async function getMatingJobResult(jobId) {
+  return apiRequest(`/mating/jobs/${jobId}/result`);
+}
+
+/**
+ * Cancela uma simulação em fila ou em execução
+ */
+export async function cancelMatingJob(jobId) {
+  return apiRequest(`/mating/jobs/${jobId}/cancel`, {
+    method: 'POST',
+  });
+}
+
+/**
+ * Aguarda a conclusão de uma simulação consultando o status periodicamente
+ */
+export async function waitForMatingJob(jobId, onProgress, intervalMs = 1000) {
+  for (;;) {
+    const job = await getMatingJob(jobId);
+    if (onProgress) onProgress(job);
+    if (job.status === 'completed') return getMatingJobResult(jobId);
+    if (job.status === 'failed' || job.status === 'cancelled') {
+      throw new Error(job.error || `Simulação ${job.status === 'failed' ? 'falhou' : 'cancelada'}`);
+    }
+    await new Promise(resolve => setTimeout(resolve, intervalMs));
+  }
+}
+
 /**
  * Lista recomendações de uma simulação
  */